@@ -0,0 +1,203 @@
+"""Vectorized backtests of the bots in app.bots over a price series.
+
+A backtest holds two balances, base asset and traded asset, and replays the
+same rules as the live bots, including their balance checks. Each bot is
+simulated as NumPy array operations: DCA and arbitrage fills are closed-form
+cumulative sums, the grid only visits the bars where the price moves to
+another level (located with one `searchsorted`), and rebalancing jumps from
+one trigger bar to the next with vectorized searches. The balances between
+fills are forward-filled into an equity curve, from which PnL, drawdown and
+turnover are computed.
+"""
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.bots import ArbitrageParams, DcaParams, GridParams, RebalanceParams
+from app.grid import GridState
+
+# (bar index, +1 buy / -1 sell, price, qty) of every fill as parallel arrays, in order
+Fills = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+class Book:
+    """Base and asset balances of a sequential simulation, with the live executor's balance checks"""
+
+    __slots__ = ("cash", "qty", "fills")
+
+    def __init__(self, cash: float, qty: float):
+        self.cash = cash
+        self.qty = qty
+        self.fills: List[Tuple[int, float, float, float]] = []
+
+    def trade(self, bar: int, side: str, price: float, qty: float) -> bool:
+        if side == "buy":
+            if self.cash < price * qty:
+                return False
+            self.cash -= price * qty
+            self.qty += qty
+        else:
+            if self.qty < qty:
+                return False
+            self.qty -= qty
+            self.cash += price * qty
+        self.fills.append((bar, 1.0 if side == "buy" else -1.0, price, qty))
+        return True
+
+    def arrays(self) -> Fills:
+        if not self.fills:
+            return np.empty(0, np.int64), np.empty(0), np.empty(0), np.empty(0)
+        bars, sign, price, qty = zip(*self.fills)
+        return np.array(bars, np.int64), np.array(sign), np.array(price), np.array(qty)
+
+def _balances(n: int, fills: Fills, cash0: float, qty0: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-bar balances after that bar's fills, forward-filled between fills"""
+    bars, sign, price, qty = fills
+    if len(bars) == 0:
+        return np.full(n, cash0), np.full(n, qty0)
+    cash_after = cash0 - np.cumsum(sign * price * qty)
+    qty_after = qty0 + np.cumsum(sign * qty)
+    last = np.searchsorted(bars, np.arange(n), side="right") - 1
+    started = last >= 0
+    last = np.maximum(last, 0)
+    return np.where(started, cash_after[last], cash0), np.where(started, qty_after[last], qty0)
+
+def _grid(prices: np.ndarray, p: GridParams, cash: float, qty: float) -> Fills:
+    lower = p.lower if p.lower is not None else float(prices[0]) * 0.9
+    upper = p.upper if p.upper is not None else float(prices[0]) * 1.1
+    grid = GridState(lower, upper, p.grid_count, p.order_size)
+    book = Book(cash, qty)
+
+    level = np.searchsorted(np.asarray(grid.levels), prices, side="right") - 1
+    grid.position = int(level[0])
+    for bar in (np.flatnonzero(np.diff(level)) + 1).tolist():
+        for side, k in grid.crossings(float(prices[bar])):
+            price = grid.levels[k]
+            fill_qty = grid.order_size / (price if side == "buy" else grid.levels[k - 1])
+            if book.trade(bar, side, price, fill_qty):
+                if side == "buy":
+                    grid.filled[k] = 1
+                else:
+                    grid.filled[k - 1] = 0
+    return book.arrays()
+
+def _dca(prices: np.ndarray, p: DcaParams, cash: float, qty: float) -> Fills:
+    # every bar buys amount_usd until the base balance no longer covers it
+    count = max(0, min(len(prices), int(cash // p.amount_usd)))
+    px = prices[:count]
+    return np.arange(count), np.ones(count), px, p.amount_usd / px
+
+def _hold_range(cash: float, qty: float, target: float, threshold: float) -> Tuple[float, float]:
+    """Prices between which the allocation of fixed balances stays within the threshold.
+
+    The allocation qty*p / (cash + qty*p) grows with p, so each side of the
+    threshold is a single price bound. Slightly widened: callers confirm hits.
+    """
+    if cash <= 0 or qty <= 0:
+        allocation = 1.0 if qty > 0 else 0.0
+        if cash + qty <= 0 or abs(allocation - target) <= threshold:
+            return -np.inf, np.inf
+        return np.inf, -np.inf
+    above, below = target + threshold, target - threshold
+    hi = above * cash / (qty * (1 - above)) if above < 1 else np.inf
+    lo = below * cash / (qty * (1 - below)) if below > 0 else -np.inf
+    return lo * (1 - 1e-9), hi * (1 + 1e-9)
+
+def _rebalance(prices: np.ndarray, p: RebalanceParams, cash: float, qty: float) -> Fills:
+    book = Book(cash, qty)
+    target, threshold = p.target_allocation, p.rebalance_threshold
+    n, bar = len(prices), 0
+    while bar < n:
+        # balances are constant until the next fill: gallop to the first price outside the hold range
+        lo, hi = _hold_range(book.cash, book.qty, target, threshold)
+        window = 64
+        while bar < n:
+            chunk = prices[bar:bar + window]
+            hits = np.flatnonzero((chunk < lo) | (chunk > hi))
+            if len(hits):
+                bar += int(hits[0])
+                break
+            bar += len(chunk)
+            window *= 2
+        if bar >= n:
+            break
+        price = float(prices[bar])
+        value = book.qty * price
+        total = book.cash + value
+        if total != 0 and abs(value / total - target) > threshold:
+            difference = total * target - value
+            if difference > 0:
+                book.trade(bar, "buy", price, difference / price)
+            elif difference < 0:
+                book.trade(bar, "sell", price, -difference / price)
+        bar += 1
+    return book.arrays()
+
+def _arbitrage(prices: np.ndarray, p: ArbitrageParams, cash: float, qty: float) -> Fills:
+    # each hit buys and immediately sells higher, so the base balance never drops below its start
+    if cash < p.arbitrage_amount:
+        hits = np.empty(0, np.int64)
+    else:
+        hits = np.flatnonzero(np.abs(prices * (1 + p.arbitrage_threshold * 0.5) - prices) / prices
+                              > p.arbitrage_threshold)
+    buy = prices[hits]
+    sell = buy * (1 + p.arbitrage_threshold * 0.5)
+    q = p.arbitrage_amount / buy
+    # interleave buy/sell pairs
+    return (np.repeat(hits, 2), np.tile([1.0, -1.0], len(hits)),
+            np.column_stack((buy, sell)).ravel(), np.repeat(q, 2))
+
+SIMULATORS: Dict[str, Callable[..., Fills]] = {
+    "grid": _grid,
+    "dca": _dca,
+    "rebalance": _rebalance,
+    "arbitrage": _arbitrage,
+}
+
+def check_prices(prices) -> np.ndarray:
+    """A 1-D float64 price series fit to backtest; raises ValueError otherwise"""
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    if prices.ndim != 1 or len(prices) < 2:
+        raise ValueError("A backtest needs at least two prices")
+    if not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+        raise ValueError("Prices must be positive numbers")
+    return prices
+
+def run_backtest(bot_type: str, params, prices: np.ndarray, cash: float, qty: float = 0.0,
+                 timestamps: Optional[np.ndarray] = None) -> dict:
+    """Simulate a bot over `prices` from base balance `cash` and asset balance `qty`"""
+    simulate = SIMULATORS.get(bot_type)
+    if simulate is None:
+        raise ValueError(f"No backtest for bot type '{bot_type}'")
+    prices = check_prices(prices)
+
+    started = time.perf_counter()
+    fills = simulate(prices, params, cash, qty)
+    bars, sign, fill_price, fill_qty = fills
+    cash_at, qty_at = _balances(len(prices), fills, cash, qty)
+    equity = cash_at + qty_at * prices
+    initial = cash + qty * float(prices[0])
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak > 0, (peak - equity) / peak, 0.0)
+    traded = float(np.sum(fill_price * fill_qty))
+    buys = int(np.count_nonzero(sign > 0))
+
+    result = {
+        "bars": len(prices),
+        "initial_value": initial,
+        "final_value": float(equity[-1]),
+        "pnl": float(equity[-1]) - initial,
+        "pnl_pct": (float(equity[-1]) - initial) / initial * 100 if initial else 0.0,
+        "buy_and_hold_pnl": initial * (float(prices[-1]) / float(prices[0]) - 1),
+        "max_drawdown_pct": float(drawdown.max()) * 100,
+        "turnover": traded / initial if initial else 0.0,
+        "traded_notional": traded,
+        "trade_count": len(bars),
+        "buys": buys,
+        "sells": len(bars) - buys,
+        "final_base": float(cash_at[-1]),
+        "final_asset": float(qty_at[-1]),
+        "start": int(timestamps[0]) if timestamps is not None and len(timestamps) else None,
+        "end": int(timestamps[-1]) if timestamps is not None and len(timestamps) else None,
+    }
+    result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return result
@@ -1,161 +1,216 @@
-import json
 import asyncio
-from typing import Dict, Any, List, Optional
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Type, Union
+from pydantic import BaseModel, Field, ValidationError, model_validator
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models import Strategy
+from app.registry import LiveStrategy
 from app.executor import TradeExecutor
+from app.holdings import get_holdings
+from app.ledger import ledger
+from app.grid import grid_engine
+from app.settlement import Settlement
+from app.valuation import Valuator
 from app.defi import get_current_price, get_historical_prices
+from app.price_feed import price_feed
+from app.config import PRICE_FEED_MAX_AGE
+from app.metrics import bot_eval_seconds, strategy_failures_total
+
+class GridParams(BaseModel):
+    lower: Optional[float] = Field(None, gt=0)  # unset bounds anchor at +-10% of the first price
+    upper: Optional[float] = Field(None, gt=0)
+    grid_count: int = Field(10, ge=1)
+    order_size: float = Field(100, gt=0)
+
+    @model_validator(mode="after")
+    def _bounds(self):
+        if self.lower is not None and self.upper is not None and self.lower >= self.upper:
+            raise ValueError("lower must be below upper")
+        return self
+
+class DcaParams(BaseModel):
+    amount_usd: float = Field(100, gt=0)
+
+class RebalanceParams(BaseModel):
+    target_allocation: float = Field(0.5, ge=0, le=1)  # share of the portfolio in this asset
+    rebalance_threshold: float = Field(0.05, ge=0)  # allowed deviation before trading
+
+class ArbitrageParams(BaseModel):
+    arbitrage_threshold: float = Field(0.02, gt=0)
+    arbitrage_amount: float = Field(100, gt=0)
+
+class BotType:
+    """A registered bot: its params class and `async evaluate(bot, params, current_price) -> trades`"""
+
+    __slots__ = ("name", "params_cls", "evaluate")
+
+    def __init__(self, name: str, params_cls: Type[BaseModel], evaluate: Callable[..., Awaitable[List[Dict[str, Any]]]]):
+        self.name = name
+        self.params_cls = params_cls
+        self.evaluate = evaluate
+
+BOT_TYPES: Dict[str, BotType] = {}
+
+def register_bot(name: str, params_cls: Type[BaseModel], evaluate: Callable[..., Awaitable[List[Dict[str, Any]]]]):
+    """Add a bot type; no core code needs to change for new bots"""
+    BOT_TYPES[name] = BotType(name, params_cls, evaluate)
+
+def compile_params(bot_type: str, params: Dict[str, Any]) -> BaseModel:
+    """Validate raw params into the bot's params object; raises ValueError with a readable message"""
+    bot = BOT_TYPES.get(bot_type)
+    if bot is None:
+        raise ValueError(f"Unknown bot type '{bot_type}', expected one of: {', '.join(sorted(BOT_TYPES))}")
+    try:
+        return bot.params_cls.model_validate(params)
+    except ValidationError as e:
+        details = "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'params'}: {err['msg']}" for err in e.errors())
+        raise ValueError(f"Invalid {bot_type} params - {details}")
+
+def place_order(strategy: Union[Strategy, LiveStrategy], session: Optional[Session], settlement: Optional[Settlement],
+                side: str, price: float, qty: float, meta: dict,
+                on_fill: Optional[Callable[[], None]] = None) -> Optional[int]:
+    """Execute now, or queue an intent when settling in batch; returns the trade id if already written.
+
+    `on_fill` runs once the trade is final: right away, or after the batch commits.
+    """
+    if settlement is not None:
+        settlement.submit(strategy.owner, strategy.id, strategy.symbol,
+                          side, price, qty, strategy.base_asset, meta, on_fill)
+        return None
+    if ledger.active:
+        ledger.trade(strategy.owner, strategy.id, strategy.symbol,
+                     side, price, qty, strategy.base_asset, meta)
+        if on_fill is not None:
+            on_fill()
+        return None
+    trade = TradeExecutor.execute(
+        session=session,
+        owner=strategy.owner,
+        strategy_id=strategy.id,
+        symbol=strategy.symbol,
+        side=side,
+        price=price,
+        qty=qty,
+        base_asset=strategy.base_asset,
+        meta=meta
+    )
+    if on_fill is not None:
+        on_fill()
+    return trade.id
 
 class TradingBot:
-    def __init__(self, strategy: Strategy, session: Session):
+    def __init__(self, strategy: Union[Strategy, LiveStrategy], session: AsyncSession,
+                 prices: Optional[Dict[str, float]] = None, settlement: Optional[Settlement] = None,
+                 valuator: Optional[Valuator] = None):
         self.strategy = strategy
         self.session = session
-        self.params = json.loads(strategy.params_json or "{}")
+        self.settlement = settlement  # when set, trades are batched into the tick's settlement
+        if isinstance(strategy, LiveStrategy):
+            self.params = strategy.compiled  # validated once by the registry
+        else:
+            self.params = compile_params(strategy.bot_type, strategy.params_json or {})
+        self.prices = prices or {}
+        self.valuator = valuator or Valuator(self.prices)  # shared per tick, so NAV is priced once per owner
+
+    async def _price(self, symbol: str) -> float:
+        """Price from the tick snapshot or the price feed, falling back to a direct fetch"""
+        price = self.prices.get(symbol)
+        if price is None:
+            price = price_feed.latest(symbol, max_age=PRICE_FEED_MAX_AGE)
+        if price is None:
+            price = await get_current_price(symbol)
+        return price
+
+    async def _trade(self, side: str, price: float, qty: float, meta: dict,
+                     on_fill: Optional[Callable[[], None]] = None) -> Optional[int]:
+        if self.settlement is not None or ledger.active:
+            return place_order(self.strategy, None, self.settlement, side, price, qty, meta, on_fill)
+        s = self.strategy
+        trade = await TradeExecutor.execute_async(self.session, s.owner, s.id, s.symbol,
+                                                  side, price, qty, s.base_asset, meta)
+        if on_fill is not None:
+            on_fill()
+        return trade.id
+
+    async def _holdings(self) -> Optional[dict]:
+        if self.settlement is not None:
+            return self.settlement.portfolio(self.strategy.owner)
+        if ledger.active:
+            return ledger.portfolio(self.strategy.owner)
+        return await self.session.run_sync(get_holdings, self.strategy.owner)
         
     async def execute(self) -> List[Dict[str, Any]]:
         """Execute trading logic based on bot type"""
+        started = time.perf_counter()
         try:
-            current_price = await get_current_price(self.strategy.symbol)
+            current_price = await self._price(self.strategy.symbol)
             print(f"[{self.strategy.name}] Current {self.strategy.symbol} price: ${current_price}")
             
-            if self.strategy.bot_type == "grid":
-                return await self._grid_strategy(current_price)
-            elif self.strategy.bot_type == "dca":
-                return await self._dca_strategy(current_price)
-            elif self.strategy.bot_type == "rebalance":
-                return await self._rebalance_strategy(current_price)
-            elif self.strategy.bot_type == "arbitrage":
-                return await self._arbitrage_strategy(current_price)
-            else:
+            bot = BOT_TYPES.get(self.strategy.bot_type)
+            if bot is None:
                 print(f"Unknown bot type: {self.strategy.bot_type}")
                 return []
+            return await bot.evaluate(self, self.params, current_price)
         except Exception as e:
+            strategy_failures_total.inc(self.strategy.bot_type)
             print(f"Error executing {self.strategy.name}: {e}")
             return []
+        finally:
+            bot_eval_seconds.observe(time.perf_counter() - started, self.strategy.bot_type)
 
-    async def _grid_strategy(self, current_price: float) -> List[Dict[str, Any]]:
-        """Grid trading: Buy low, sell high in grid steps"""
-        lower = self.params.get("lower", current_price * 0.9)
-        upper = self.params.get("upper", current_price * 1.1)
-        grid_count = self.params.get("grid_count", 10)
-        order_size = self.params.get("order_size", 100)
-        
+    async def _grid_strategy(self, p: GridParams, current_price: float) -> List[Dict[str, Any]]:
+        """Grid trading: buy each level the price falls through, sell it one level higher"""
+        grid = await self.session.run_sync(lambda s: grid_engine.state(self.strategy, p, current_price, s))
         trades = []
         
-        # Calculate grid levels
-        grid_step = (upper - lower) / grid_count
-        grid_levels = [lower + i * grid_step for i in range(grid_count + 1)]
-        
-        # Find current price position in grid
-        current_level = None
-        for i, level in enumerate(grid_levels):
-            if current_price >= level and (i == len(grid_levels) - 1 or current_price < grid_levels[i + 1]):
-                current_level = i
-                break
-        
-        if current_level is None:
-            return trades
-            
-        # Buy if price is in lower half of grid
-        if current_level < grid_count // 2:
-            buy_price = grid_levels[current_level]
-            qty = order_size / buy_price
-            
-            try:
-                trade = TradeExecutor.execute(
-                    session=self.session,
-                    owner=self.strategy.owner,
-                    strategy_id=self.strategy.id,
-                    symbol=self.strategy.symbol,
-                    side="buy",
-                    price=buy_price,
-                    qty=qty,
-                    base_asset=self.strategy.base_asset,
-                    meta={"bot": "grid", "grid_level": current_level}
-                )
-                trades.append({"action": "buy", "price": buy_price, "qty": qty, "trade_id": trade.id})
-                print(f"[{self.strategy.name}] BUY {qty:.4f} {self.strategy.symbol} at ${buy_price}")
-            except Exception as e:
-                print(f"[{self.strategy.name}] Buy failed: {e}")
-        
-        # Sell if price is in upper half of grid
-        elif current_level > grid_count // 2:
-            sell_price = grid_levels[current_level]
-            qty = order_size / sell_price
+        for side, level in grid.crossings(current_price):
+            price = grid.levels[level]
+            # a sell closes the quantity bought one level below
+            qty = grid.order_size / (price if side == "buy" else grid.levels[level - 1])
             
             try:
-                trade = TradeExecutor.execute(
-                    session=self.session,
-                    owner=self.strategy.owner,
-                    strategy_id=self.strategy.id,
-                    symbol=self.strategy.symbol,
-                    side="sell",
-                    price=sell_price,
-                    qty=qty,
-                    base_asset=self.strategy.base_asset,
-                    meta={"bot": "grid", "grid_level": current_level}
-                )
-                trades.append({"action": "sell", "price": sell_price, "qty": qty, "trade_id": trade.id})
-                print(f"[{self.strategy.name}] SELL {qty:.4f} {self.strategy.symbol} at ${sell_price}")
+                # fill flags move only once the trade is written, so a failed settlement leaves them as they were
+                trade_id = await self._trade(side, price, qty, {"bot": "grid", "grid_level": level, "grid": grid.key},
+                                             partial(grid.mark, side, level))
+                trades.append({"action": side, "price": price, "qty": qty, "trade_id": trade_id})
+                print(f"[{self.strategy.name}] {side.upper()} {qty:.4f} {self.strategy.symbol} at ${price}")
             except Exception as e:
-                print(f"[{self.strategy.name}] Sell failed: {e}")
+                print(f"[{self.strategy.name}] {side.capitalize()} failed: {e}")
         
         return trades
 
-    async def _dca_strategy(self, current_price: float) -> List[Dict[str, Any]]:
+    async def _dca_strategy(self, p: DcaParams, current_price: float) -> List[Dict[str, Any]]:
         """Dollar Cost Averaging: Buy fixed USD amount regularly"""
-        amount_usd = self.params.get("amount_usd", 100)
+        amount_usd = p.amount_usd
         qty = amount_usd / current_price
         
         trades = []
         try:
-            trade = TradeExecutor.execute(
-                session=self.session,
-                owner=self.strategy.owner,
-                strategy_id=self.strategy.id,
-                symbol=self.strategy.symbol,
-                side="buy",
-                price=current_price,
-                qty=qty,
-                base_asset=self.strategy.base_asset,
-                meta={"bot": "dca", "amount_usd": amount_usd}
-            )
-            trades.append({"action": "buy", "price": current_price, "qty": qty, "trade_id": trade.id})
+            trade_id = await self._trade("buy", current_price, qty, {"bot": "dca", "amount_usd": amount_usd})
+            trades.append({"action": "buy", "price": current_price, "qty": qty, "trade_id": trade_id})
             print(f"[{self.strategy.name}] DCA BUY ${amount_usd} worth of {self.strategy.symbol} at ${current_price}")
         except Exception as e:
             print(f"[{self.strategy.name}] DCA buy failed: {e}")
         
         return trades
 
-    async def _rebalance_strategy(self, current_price: float) -> List[Dict[str, Any]]:
+    async def _rebalance_strategy(self, p: RebalanceParams, current_price: float) -> List[Dict[str, Any]]:
         """Portfolio rebalancing: Maintain target allocation percentages"""
-        target_allocation = self.params.get("target_allocation", 0.5)  # 50% in this asset
-        rebalance_threshold = self.params.get("rebalance_threshold", 0.05)  # 5% deviation
+        target_allocation = p.target_allocation
+        rebalance_threshold = p.rebalance_threshold
         
         # Get current portfolio
-        from app.models import Portfolio
-        from sqlmodel import select
-        
-        portfolio = self.session.exec(
-            select(Portfolio).where(Portfolio.owner == self.strategy.owner)
-        ).first()
-        
-        if not portfolio:
+        holdings = await self._holdings()
+        if holdings is None:
             return []
-            
-        holdings = json.loads(portfolio.holdings_json)
-        total_value = 0
         
-        # Calculate total portfolio value
-        for asset, amount in holdings.items():
-            if asset == self.strategy.base_asset:
-                total_value += amount
-            else:
-                try:
-                    asset_price = await get_current_price(asset.lower())
-                    total_value += amount * asset_price
-                except:
-                    pass
+        self.valuator.prices.setdefault(self.strategy.symbol.lower(), current_price)
+        valuation = await self.valuator.value(self.strategy.owner, holdings, self.strategy.base_asset)
+        if valuation["unpriced"]:
+            print(f"[{self.strategy.name}] No price for {', '.join(valuation['unpriced'])}, left out of the portfolio value")
+        total_value = valuation["nav"]
         
         if total_value == 0:
             return []
@@ -175,18 +230,8 @@ class TradingBot:
             if difference > 0:  # Need to buy more
                 qty = difference / current_price
                 try:
-                    trade = TradeExecutor.execute(
-                        session=self.session,
-                        owner=self.strategy.owner,
-                        strategy_id=self.strategy.id,
-                        symbol=self.strategy.symbol,
-                        side="buy",
-                        price=current_price,
-                        qty=qty,
-                        base_asset=self.strategy.base_asset,
-                        meta={"bot": "rebalance", "target_allocation": target_allocation}
-                    )
-                    trades.append({"action": "buy", "price": current_price, "qty": qty, "trade_id": trade.id})
+                    trade_id = await self._trade("buy", current_price, qty, {"bot": "rebalance", "target_allocation": target_allocation})
+                    trades.append({"action": "buy", "price": current_price, "qty": qty, "trade_id": trade_id})
                     print(f"[{self.strategy.name}] REBALANCE BUY {qty:.4f} {self.strategy.symbol} at ${current_price}")
                 except Exception as e:
                     print(f"[{self.strategy.name}] Rebalance buy failed: {e}")
@@ -194,65 +239,35 @@ class TradingBot:
             elif difference < 0:  # Need to sell
                 qty = abs(difference) / current_price
                 try:
-                    trade = TradeExecutor.execute(
-                        session=self.session,
-                        owner=self.strategy.owner,
-                        strategy_id=self.strategy.id,
-                        symbol=self.strategy.symbol,
-                        side="sell",
-                        price=current_price,
-                        qty=qty,
-                        base_asset=self.strategy.base_asset,
-                        meta={"bot": "rebalance", "target_allocation": target_allocation}
-                    )
-                    trades.append({"action": "sell", "price": current_price, "qty": qty, "trade_id": trade.id})
+                    trade_id = await self._trade("sell", current_price, qty, {"bot": "rebalance", "target_allocation": target_allocation})
+                    trades.append({"action": "sell", "price": current_price, "qty": qty, "trade_id": trade_id})
                     print(f"[{self.strategy.name}] REBALANCE SELL {qty:.4f} {self.strategy.symbol} at ${current_price}")
                 except Exception as e:
                     print(f"[{self.strategy.name}] Rebalance sell failed: {e}")
         
         return trades
 
-    async def _arbitrage_strategy(self, current_price: float) -> List[Dict[str, Any]]:
+    async def _arbitrage_strategy(self, p: ArbitrageParams, current_price: float) -> List[Dict[str, Any]]:
         """Arbitrage: Check for price differences between sources (demo)"""
         # This is a demo implementation - in reality you'd check multiple exchanges
         trades = []
         
         # Simulate finding arbitrage opportunity
-        arbitrage_threshold = self.params.get("arbitrage_threshold", 0.02)  # 2%
+        arbitrage_threshold = p.arbitrage_threshold
         simulated_other_price = current_price * (1 + arbitrage_threshold * 0.5)
         
         if abs(simulated_other_price - current_price) / current_price > arbitrage_threshold:
             # Simulate arbitrage trade
-            qty = self.params.get("arbitrage_amount", 100) / current_price
+            qty = p.arbitrage_amount / current_price
             
             try:
                 # Buy at current price
-                buy_trade = TradeExecutor.execute(
-                    session=self.session,
-                    owner=self.strategy.owner,
-                    strategy_id=self.strategy.id,
-                    symbol=self.strategy.symbol,
-                    side="buy",
-                    price=current_price,
-                    qty=qty,
-                    base_asset=self.strategy.base_asset,
-                    meta={"bot": "arbitrage", "type": "buy", "other_price": simulated_other_price}
-                )
-                trades.append({"action": "arbitrage_buy", "price": current_price, "qty": qty, "trade_id": buy_trade.id})
+                buy_trade_id = await self._trade("buy", current_price, qty, {"bot": "arbitrage", "type": "buy", "other_price": simulated_other_price})
+                trades.append({"action": "arbitrage_buy", "price": current_price, "qty": qty, "trade_id": buy_trade_id})
                 
                 # Sell at higher price (simulated)
-                sell_trade = TradeExecutor.execute(
-                    session=self.session,
-                    owner=self.strategy.owner,
-                    strategy_id=self.strategy.id,
-                    symbol=self.strategy.symbol,
-                    side="sell",
-                    price=simulated_other_price,
-                    qty=qty,
-                    base_asset=self.strategy.base_asset,
-                    meta={"bot": "arbitrage", "type": "sell", "original_price": current_price}
-                )
-                trades.append({"action": "arbitrage_sell", "price": simulated_other_price, "qty": qty, "trade_id": sell_trade.id})
+                sell_trade_id = await self._trade("sell", simulated_other_price, qty, {"bot": "arbitrage", "type": "sell", "original_price": current_price})
+                trades.append({"action": "arbitrage_sell", "price": simulated_other_price, "qty": qty, "trade_id": sell_trade_id})
                 
                 print(f"[{self.strategy.name}] ARBITRAGE: Buy at ${current_price}, Sell at ${simulated_other_price}")
             except Exception as e:
@@ -260,7 +275,15 @@ class TradingBot:
         
         return trades
 
-async def run_bot(strategy: Strategy, session: Session) -> List[Dict[str, Any]]:
+register_bot("grid", GridParams, TradingBot._grid_strategy)
+register_bot("dca", DcaParams, TradingBot._dca_strategy)
+register_bot("rebalance", RebalanceParams, TradingBot._rebalance_strategy)
+register_bot("arbitrage", ArbitrageParams, TradingBot._arbitrage_strategy)
+
+async def run_bot(strategy: Union[Strategy, LiveStrategy], session: AsyncSession,
+                  prices: Optional[Dict[str, float]] = None,
+                  settlement: Optional[Settlement] = None,
+                  valuator: Optional[Valuator] = None) -> List[Dict[str, Any]]:
     """Run a single trading bot"""
-    bot = TradingBot(strategy, session)
+    bot = TradingBot(strategy, session, prices, settlement, valuator)
     return await bot.execute()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""Bulk strategy writes: many creates or status changes in one transaction.
+
+Items are validated one by one and reported one by one; the valid ones are
+written together, a create batch as one multi-row INSERT ... RETURNING and a
+status batch as one UPDATE ... RETURNING, and the registry is updated after
+the commit. Both functions take a sync Session, so routes run them through
+`AsyncSession.run_sync` and MCP tools call them directly.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, update
+from sqlmodel import Session
+from app.models import Strategy, hash_owner
+from app.schedule import parse_cron
+from app.registry import registry
+from app.bots import compile_params
+from app.config import BULK_MAX_ITEMS
+
+STATUSES = ("live", "paused", "draft")
+REQUIRED = ("name", "owner", "bot_type", "symbol")
+
+def check_strategy(item: Dict[str, Any]):
+    """Raise ValueError for a schedule or params no bot could run"""
+    interval = item.get("interval_seconds")
+    if interval is not None and not isinstance(interval, int):
+        raise ValueError("interval_seconds must be an integer")
+    if interval is not None and interval < 1:
+        raise ValueError("interval_seconds must be at least 1")
+    if item.get("cron"):
+        try:
+            parse_cron(item["cron"])
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression: {e}")
+    compile_params(item["bot_type"], item.get("params") or {})
+
+def _check_size(count: int):
+    if count > BULK_MAX_ITEMS:
+        raise ValueError(f"{count} items exceed BULK_MAX_ITEMS ({BULK_MAX_ITEMS})")
+
+def _detach(session: Session, rows: List[Strategy]):
+    # detached rows keep their loaded values through the commit instead of reloading one by one
+    for st in rows:
+        session.expunge(st)
+
+def create_strategies(session: Session, items: List[Dict[str, Any]], status: str = "draft") -> List[dict]:
+    """Insert every valid item with `status`; one result per item, in order"""
+    _check_size(len(items))
+    if status not in STATUSES:
+        raise ValueError(f"Invalid status. Must be one of: {', '.join(STATUSES)}")
+    results: List[dict] = [{"index": i, "ok": False, "id": None, "status": None, "error": None}
+                           for i in range(len(items))]
+    rows, positions = [], []
+    now = datetime.now(timezone.utc)
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i]["error"] = "expected an object"
+            continue
+        missing = [field for field in REQUIRED if not item.get(field)]
+        if missing:
+            results[i]["error"] = f"missing {', '.join(missing)}"
+            continue
+        try:
+            check_strategy(item)
+        except (ValueError, TypeError) as e:
+            results[i]["error"] = str(e)
+            continue
+        rows.append({"name": item["name"], "owner": item["owner"], "owner_hash": hash_owner(item["owner"]),
+                     "bot_type": item["bot_type"],
+                     "symbol": item["symbol"], "base_asset": item.get("base_asset") or "USDC",
+                     "params_json": item.get("params") or {}, "status": status,
+                     "interval_seconds": item.get("interval_seconds"), "cron": item.get("cron"),
+                     "created_at": now, "updated_at": now})
+        positions.append(i)
+    if rows:
+        # RETURNING rows come back in parameter order, lined up with `positions`
+        created = session.scalars(insert(Strategy).returning(Strategy, sort_by_parameter_order=True), rows).all()
+        _detach(session, created)
+        session.commit()
+        for i, st in zip(positions, created):
+            results[i].update(ok=True, id=st.id, status=st.status, strategy=st)
+            registry.upsert(st)
+    return results
+
+def set_statuses(session: Session, ids: List[int], status: str) -> List[dict]:
+    """Move every existing strategy in `ids` to `status`; one result per id, in order"""
+    _check_size(len(ids))
+    if status not in STATUSES:
+        raise ValueError(f"Invalid status. Must be one of: {', '.join(STATUSES)}")
+    updated: Dict[int, Strategy] = {}
+    if ids:
+        rows = session.scalars(update(Strategy).where(Strategy.id.in_(set(ids)))
+                               .values(status=status, updated_at=datetime.now(timezone.utc))
+                               .returning(Strategy)).all()
+        _detach(session, rows)
+        session.commit()
+        updated = {st.id: st for st in rows}
+        for st in rows:
+            registry.upsert(st)
+    results: List[dict] = []
+    for i, sid in enumerate(ids):
+        st: Optional[Strategy] = updated.get(sid)
+        if st is None:
+            results.append({"index": i, "ok": False, "id": sid, "error": "Strategy not found"})
+        elif status == "live" and sid in registry.invalid:
+            results.append({"index": i, "ok": False, "id": sid, "status": status,
+                            "error": "Live, but not scheduled: its params or bot type are no longer valid"})
+        else:
+            results.append({"index": i, "ok": True, "id": sid, "status": status, "error": None})
+    return results
@@ -4,5 +4,43 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DB_URL = os.getenv("DB_URL")
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL") or None  # default: DB_URL with its async driver (aiosqlite / asyncpg)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a pooled connection is replaced
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 CRON_SECONDS = int(os.getenv("CRON_SECONDS", "60"))
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "100"))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "15"))
+PRICE_CACHE_STALE_SECONDS = float(os.getenv("PRICE_CACHE_STALE_SECONDS", "60"))
+PRICE_CACHE_SIZE = int(os.getenv("PRICE_CACHE_SIZE", "4096"))
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "./price_history")
+PRICE_STORE_REFRESH_SECONDS = int(os.getenv("PRICE_STORE_REFRESH_SECONDS", "300"))
+PRICE_FEED_ENABLED = os.getenv("PRICE_FEED_ENABLED", "true").lower() == "true"
+PRICE_FEED_SECONDS = float(os.getenv("PRICE_FEED_SECONDS", "5"))
+PRICE_FEED_WINDOW = int(os.getenv("PRICE_FEED_WINDOW", "720"))
+PRICE_FEED_MAX_AGE = float(os.getenv("PRICE_FEED_MAX_AGE", "30"))
+PRICE_SOURCE = os.getenv("PRICE_SOURCE", "defillama")  # "defillama", "local" or "replay"
+PRICE_SOURCE_URL = os.getenv("PRICE_SOURCE_URL") or None
+PRICE_REPLAY_FILE = os.getenv("PRICE_REPLAY_FILE") or None
+PRICE_REPLAY_SPEED = float(os.getenv("PRICE_REPLAY_SPEED", "1"))
+TICK_CONCURRENCY = int(os.getenv("TICK_CONCURRENCY", "32"))
+EMBEDDED_CRON = os.getenv("EMBEDDED_CRON", "true").lower() == "true"
+WORKER_SHARDS = int(os.getenv("WORKER_SHARDS", "64"))
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "30"))
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "tick")  # "tick": one global job, "timer": per-strategy schedules
+SCHEDULER_SYNC_SECONDS = int(os.getenv("SCHEDULER_SYNC_SECONDS", "30"))
+REGISTRY_SYNC_SECONDS = float(os.getenv("REGISTRY_SYNC_SECONDS", "10"))
+REGISTRY_SYNC_MARGIN_SECONDS = float(os.getenv("REGISTRY_SYNC_MARGIN_SECONDS", "60"))  # re-read window below the high-water mark
+SETTLEMENT_MODE = os.getenv("SETTLEMENT_MODE", "batch")  # "batch": one transaction per tick, "immediate": commit per trade, "ledger": in memory
+EVAL_MODE = os.getenv("EVAL_MODE", "bot")  # "bot": one TradingBot per strategy, "kernel": vectorized per (bot_type, symbol)
+LEDGER_JOURNAL_PATH = os.getenv("LEDGER_JOURNAL_PATH", "./ledger.journal")
+LEDGER_FSYNC_SECONDS = float(os.getenv("LEDGER_FSYNC_SECONDS", "0.05"))
+LEDGER_FLUSH_SECONDS = float(os.getenv("LEDGER_FLUSH_SECONDS", "1"))
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", "100"))  # balance events per owner between holdings snapshots
+OPTIMIZER_WORKERS = int(os.getenv("OPTIMIZER_WORKERS", str(os.cpu_count() or 1)))
+OPTIMIZER_BATCH_SIZE = int(os.getenv("OPTIMIZER_BATCH_SIZE", "8"))  # parameter sets per worker task
+OPTIMIZER_MAX_COMBINATIONS = int(os.getenv("OPTIMIZER_MAX_COMBINATIONS", "10000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # rows fetched and sent per chunk of a streamed export
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))  # items per bulk strategy request or MCP call
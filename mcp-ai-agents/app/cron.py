@@ -1,11 +1,26 @@
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from app.db import engine
+from app.db import async_session
 from sqlmodel import Session, select
-from app.models import Strategy
+from app.models import Holding
 from app.bots import run_bot
-from app.config import CRON_SECONDS
+from app.settlement import Settlement
+from app.valuation import Valuator
+from app.kernel import KERNELS, kernel
+from app.ledger import ledger
+from app.defi import get_current_prices
+from app.price_feed import price_feed
+from app.schedule import TimerScheduler
+from app.registry import LiveStrategy, registry
+from app.metrics import skipped_ticks_total, strategy_failures_total, tick_seconds
+from app.config import (CRON_SECONDS, PRICE_FEED_MAX_AGE, TICK_CONCURRENCY, SCHEDULER_MODE,
+                        SCHEDULER_SYNC_SECONDS, REGISTRY_SYNC_SECONDS, SETTLEMENT_MODE, EVAL_MODE)
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
 import asyncio
 import logging
+import time
+from datetime import datetime, timezone
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,26 +28,50 @@ logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
-async def run_tick():
-    """Main cron job that runs all live trading strategies"""
-    try:
-        logger.info("Starting trading tick...")
-        
-        with Session(engine) as session:
-            # Get all live strategies
-            strategies = session.exec(select(Strategy).where(Strategy.status == "live")).all()
-            
-            if not strategies:
-                logger.info("No live strategies found")
-                return
-            
-            logger.info(f"Running {len(strategies)} live strategies")
-            
-            # Run each strategy
+def _tick_symbols(session: Session, strategies: List[LiveStrategy]) -> Set[str]:
+    """Every symbol the tick will price: strategy symbols plus rebalance owners' holdings"""
+    symbols = {st.symbol for st in strategies}
+    rebalance = [st for st in strategies if st.bot_type == "rebalance"]
+    if rebalance:
+        owners = {st.owner for st in rebalance}
+        base_assets = {st.base_asset for st in rebalance}
+        if ledger.active:
+            assets = {asset for owner in owners for asset in (ledger.portfolio(owner) or {})}
+        else:
+            assets = session.exec(select(Holding.asset).where(Holding.owner.in_(owners)).distinct()).all()
+        symbols.update(asset.lower() for asset in assets if asset not in base_assets)
+    return symbols
+
+async def _tick_prices(symbols: Set[str]) -> Dict[str, float]:
+    """Feed prices first, then one batched fetch for whatever the feed does not cover"""
+    prices = price_feed.snapshot(symbols, max_age=PRICE_FEED_MAX_AGE)
+    missing = symbols - prices.keys()
+    if missing:
+        prices.update(await get_current_prices(missing))
+    logger.info(f"Priced {len(prices)}/{len(symbols)} symbols")
+    return prices
+
+def _run_groups(session: Session, by_group: Dict[Tuple[str, str], List[LiveStrategy]],
+                prices: Dict[str, float], settlement: Optional[Settlement] = None):
+    for (bot_type, symbol), group in by_group.items():
+        if symbol not in prices:
+            logger.warning(f"No price for {symbol}, skipping {len(group)} {bot_type} strategies")
+            continue
+        kernel.run(bot_type, symbol, group, prices[symbol], session, settlement)
+
+async def _run_owner(strategies: List[LiveStrategy], prices: Dict[str, float], semaphore: asyncio.Semaphore,
+                     settlement: Optional[Settlement] = None, valuator: Optional[Valuator] = None):
+    """Run one owner's strategies in order on a session of their own.
+
+    Strategies of the same owner share a Portfolio, so they never run
+    concurrently; different owners run in parallel up to the semaphore.
+    """
+    async with semaphore:
+        async with async_session() as session:
             for strategy in strategies:
                 try:
                     logger.info(f"Executing strategy: {strategy.name} ({strategy.bot_type})")
-                    trades = await run_bot(strategy, session)
+                    trades = await run_bot(strategy, session, prices, settlement, valuator)
                     
                     if trades:
                         logger.info(f"Strategy {strategy.name} executed {len(trades)} trades")
@@ -42,27 +81,133 @@ async def run_tick():
                         logger.info(f"Strategy {strategy.name} - no trades executed")
                         
                 except Exception as e:
+                    strategy_failures_total.inc(strategy.bot_type)
                     logger.error(f"Error executing strategy {strategy.name}: {e}")
-                    continue
-            
-            logger.info("Trading tick completed")
+                    await session.rollback()
+
+async def run_strategies(strategies: List[LiveStrategy]):
+    """Price and run a set of strategies, one task per owner"""
+    started = time.perf_counter()
+    by_owner: Dict[str, List[LiveStrategy]] = defaultdict(list)
+    by_group: Dict[Tuple[str, str], List[LiveStrategy]] = defaultdict(list)
+    for strategy in strategies:
+        if EVAL_MODE == "kernel" and strategy.bot_type in KERNELS:
+            by_group[(strategy.bot_type, strategy.symbol)].append(strategy)
+        else:
+            by_owner[strategy.owner].append(strategy)
+
+    # In batch mode bots only emit intents; everything is written in one transaction at the end.
+    # In ledger mode trades go to the in-memory ledger, which writes behind on its own.
+    settlement = Settlement() if SETTLEMENT_MODE == "batch" else None
+    # DB work runs on the async engine, so HTTP requests keep being served while a tick waits on it
+    async with async_session() as session:
+        symbols = await session.run_sync(_tick_symbols, strategies)
+        if settlement is not None:
+            await session.run_sync(settlement.load, {st.owner for st in strategies})
+    prices = await _tick_prices(symbols)
+    
+    # Kernel mode: one vectorized pass per (bot_type, symbol) group, ahead of the per-owner bots
+    if by_group:
+        async with async_session() as session:
+            await session.run_sync(_run_groups, by_group, prices, settlement)
+    
+    valuator = Valuator(prices)
+    
+    semaphore = asyncio.Semaphore(TICK_CONCURRENCY)
+    await asyncio.gather(*(_run_owner(group, prices, semaphore, settlement, valuator) for group in by_owner.values()))
+    if settlement is not None:
+        async with async_session() as session:
+            settled = await session.run_sync(settlement.flush)
+        if settled:
+            logger.info(f"Settled {settled} trades")
+    tick_seconds.observe(time.perf_counter() - started, SCHEDULER_MODE)
+
+async def run_tick(shards: Optional[Set[int]] = None, shard_count: int = 1):
+    """Main cron job that runs all live trading strategies.
+
+    Sharded workers pass the shards they hold; a strategy belongs to shard
+    `owner_hash % shard_count`, so all of an owner's strategies run in one worker.
+    """
+    try:
+        logger.info("Starting trading tick...")
+        
+        # Live strategies come from the registry; the DB is only asked for what changed
+        if shards is not None:
+            registry.set_shards(shards, shard_count)
+        async with async_session() as session:
+            await session.run_sync(registry.maybe_sync, REGISTRY_SYNC_SECONDS)
+        if shards is not None and not shards:
+            logger.info("No shards held")
+            return
+        strategies = registry.live()
+        
+        if not strategies:
+            logger.info("No live strategies found")
+            return
+        
+        logger.info(f"Running {len(strategies)} live strategies")
+        await run_strategies(strategies)
+        logger.info("Trading tick completed")
             
     except Exception as e:
         logger.error(f"Error in trading tick: {e}")
 
+async def run_due(strategy_ids: List[int]):
+    """Run the strategies the timer scheduler found due"""
+    strategies = [st for st in map(registry.get, strategy_ids) if st is not None]
+    if strategies:
+        await run_strategies(strategies)
+
+timer_scheduler = TimerScheduler(run_due, default_interval=CRON_SECONDS)
+
+def follow_registry(timer: TimerScheduler):
+    """Reschedule incrementally whenever a write path updates the registry"""
+    def on_change(sid: int, entry: Optional[LiveStrategy]):
+        if entry is None:
+            timer.unschedule(sid)
+        else:
+            timer.schedule(sid, entry.interval_seconds, entry.cron)
+    registry.subscribe(on_change)
+
+async def sync_schedules(timer: TimerScheduler = timer_scheduler):
+    """Backstop: sync the registry with the DB and reconcile the timer with it"""
+    try:
+        async with async_session() as session:
+            await session.run_sync(registry.sync)
+        timer.sync({st.id: (st.interval_seconds, st.cron) for st in registry.live()})
+    except Exception as e:
+        logger.error(f"Error syncing strategy schedules: {e}")
+
+def _on_job_skipped(event):
+    skipped_ticks_total.inc(event.job_id)
+
 def start_cron():
     """Start the cron scheduler"""
     try:
-        scheduler.add_job(
-            run_tick, 
-            "interval", 
-            seconds=CRON_SECONDS, 
-            id="trading_tick",
-            max_instances=1,  # Prevent overlapping executions
-            coalesce=True     # Skip missed executions
-        )
+        scheduler.add_listener(_on_job_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+        if SCHEDULER_MODE == "timer":
+            follow_registry(timer_scheduler)
+            scheduler.add_job(
+                sync_schedules,
+                "interval",
+                seconds=SCHEDULER_SYNC_SECONDS,
+                next_run_time=datetime.now(timezone.utc),  # load schedules right away
+                id="schedule_sync",
+                max_instances=1,
+                coalesce=True
+            )
+            timer_scheduler.task = asyncio.create_task(timer_scheduler.run())
+        else:
+            scheduler.add_job(
+                run_tick, 
+                "interval", 
+                seconds=CRON_SECONDS, 
+                id="trading_tick",
+                max_instances=1,  # Prevent overlapping executions
+                coalesce=True     # Skip missed executions
+            )
         scheduler.start()
-        logger.info(f"Cron scheduler started - running every {CRON_SECONDS} seconds")
+        logger.info(f"Cron scheduler started - {SCHEDULER_MODE} mode, default cadence {CRON_SECONDS} seconds")
     except Exception as e:
         logger.error(f"Failed to start cron scheduler: {e}")
 
@@ -70,6 +215,9 @@ def stop_cron():
     """Stop the cron scheduler"""
     try:
         scheduler.shutdown()
+        if timer_scheduler.task is not None:
+            timer_scheduler.task.cancel()
+            timer_scheduler.task = None
         logger.info("Cron scheduler stopped")
     except Exception as e:
         logger.error(f"Error stopping cron scheduler: {e}")
\ No newline at end of file
@@ -1,11 +1,124 @@
-from sqlmodel import SQLModel, create_engine, Session
-from app.config import DB_URL
+from sqlalchemy import JSON, inspect, make_url, text, update
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import (DB_URL, ASYNC_DB_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                        DB_POOL_RECYCLE)
 
-engine = create_engine(DB_URL, echo=False)
+def _pool_args(url: URL) -> dict:
+    """Pool sizing for queue pools; in-memory SQLite uses a single-connection pool that takes none"""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT, "pool_recycle": DB_POOL_RECYCLE}
+
+def _async_url(url: URL) -> URL:
+    """DB_URL with the matching asyncio driver"""
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    return url
+
+_url = make_url(DB_URL)
+engine = create_engine(_url, echo=False, **_pool_args(_url))
+
+# Async routes and the tick use this engine; sync helpers run on it through AsyncSession.run_sync
+_async = make_url(ASYNC_DB_URL) if ASYNC_DB_URL else _async_url(_url)
+async_engine = create_async_engine(_async, echo=False, **_pool_args(_async))
+
+def _add_missing_columns():
+    """create_all never alters existing tables; add nullable columns introduced since"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
+def _add_missing_indexes():
+    """create_all skips indexes of tables that already exist; build the ones declared since"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+
+def _convert_json_columns():
+    """Postgres: turn JSON documents still stored as text into JSONB (other backends store JSON as text)"""
+    if engine.dialect.name != "postgresql":
+        return
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if isinstance(column.type, JSON) and column.name in existing \
+                        and not isinstance(existing[column.name], JSON):
+                    conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} '
+                                      f'TYPE JSONB USING {column.name}::jsonb'))
+
+def _backfill_owner_hash():
+    """Fill Strategy.owner_hash for rows written before the column existed"""
+    from app.models import Strategy, hash_owner
+    with Session(engine) as session:
+        owners = session.exec(select(Strategy.owner).where(Strategy.owner_hash.is_(None)).distinct()).all()
+        for owner in owners:
+            session.execute(update(Strategy).where(Strategy.owner == owner, Strategy.owner_hash.is_(None))
+                            .values(owner_hash=hash_owner(owner)))
+        session.commit()
+
+def _convert_timestamp_columns():
+    """Postgres: turn naive TIMESTAMP columns (older SQLModel created them) into TIMESTAMPTZ, read as UTC"""
+    from app.models import UtcDateTime
+    if engine.dialect.name != "postgresql":
+        return
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if isinstance(column.type, UtcDateTime) and column.name in existing \
+                        and not getattr(existing[column.name], "timezone", True):
+                    conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} '
+                                      f"TYPE TIMESTAMPTZ USING {column.name} AT TIME ZONE 'UTC'"))
 
 def init_db():
+    from app.holdings import migrate_holdings_json
+    from app.events import seed_snapshots
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _add_missing_indexes()
+    _convert_timestamp_columns()
+    _backfill_owner_hash()
+    with Session(engine) as session:
+        migrate_holdings_json(session)
+    _convert_json_columns()
+    with Session(engine) as session:
+        seed_snapshots(session)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def async_session() -> AsyncSession:
+    # objects stay loaded after commit: an expired attribute cannot be lazy-loaded outside run_sync
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+async def get_async_session():
+    async with async_session() as session:
+        yield session
@@ -1,20 +1,73 @@
-import httpx
+import time
+import numpy as np
 from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+from app.config import (PRICE_BATCH_SIZE, PRICE_CACHE_TTL, PRICE_CACHE_STALE_SECONDS, PRICE_CACHE_SIZE,
+                        PRICE_STORE_DIR, PRICE_STORE_REFRESH_SECONDS, PRICE_SOURCE, PRICE_SOURCE_URL,
+                        PRICE_REPLAY_FILE, PRICE_REPLAY_SPEED)
+from app.metrics import price_fetch_seconds
+from app.price_cache import PriceCache
+from app.price_store import PriceStore
+from app.price_sources import PriceSource, _coin_id, make_price_source
 
-http_client = httpx.AsyncClient(timeout=25)
+price_source: PriceSource = make_price_source(
+    PRICE_SOURCE, url=PRICE_SOURCE_URL, replay_file=PRICE_REPLAY_FILE,
+    replay_speed=PRICE_REPLAY_SPEED, chunk_size=PRICE_BATCH_SIZE,
+)
 
-def _coin_id(symbol: str) -> str:
-    return f"coin:{symbol}"
+price_cache = PriceCache(ttl=PRICE_CACHE_TTL, stale_ttl=PRICE_CACHE_STALE_SECONDS, max_size=PRICE_CACHE_SIZE)
+price_store = PriceStore(PRICE_STORE_DIR)
+
+def set_price_source(source: PriceSource) -> PriceSource:
+    """Swap the price source (e.g. a ReplaySource for load tests); returns the previous one"""
+    global price_source
+    previous, price_source = price_source, source
+    price_cache.clear()
+    return previous
+
+async def _load_prices(coin_ids: List[str]) -> Dict[str, float]:
+    """Upstream loader for the price cache"""
+    started = time.perf_counter()
+    try:
+        return await price_source.current(coin_ids)
+    finally:
+        elapsed = time.perf_counter() - started
+        for cid in coin_ids:
+            price_fetch_seconds.observe(elapsed, cid.split(":", 1)[-1])
 
 async def get_current_price(symbol: str) -> float:
-    url = f"https://coins.llama.fi/prices/current/{_coin_id(symbol)}"
-    r = await http_client.get(url)
-    r.raise_for_status()
-    return float(r.json()["coins"][_coin_id(symbol)]["price"])
-
-async def get_historical_prices(symbol: str, hours: int = 24):
-    start = int(datetime.now(timezone.utc).timestamp()) - hours * 3600
-    url = f"https://coins.llama.fi/chart/{_coin_id(symbol)}?start={start}"
-    r = await http_client.get(url)
-    r.raise_for_status()
-    return r.json().get("coins", {}).get(_coin_id(symbol), {}).get("prices", [])
\ No newline at end of file
+    return await price_cache.get(_coin_id(symbol), _load_prices)
+
+async def get_current_prices(symbols: Iterable[str]) -> Dict[str, float]:
+    """Price many symbols at once: one comma-joined request per chunk of uncached symbols.
+
+    Symbols the upstream does not know, or whose chunk failed, are left out of the
+    returned snapshot so callers can decide how to fall back.
+    """
+    by_coin = {_coin_id(s): s for s in symbols}
+    prices = await price_cache.get_many(by_coin, _load_prices)
+    return {by_coin[cid]: price for cid, price in prices.items()}
+
+async def get_historical_prices(symbol: str, hours: int = 24) -> Tuple[np.ndarray, np.ndarray]:
+    """(timestamps, prices) for the last `hours`, as views into the on-disk price store.
+
+    Only the gap since the last stored point is fetched from upstream, and not
+    more often than every PRICE_STORE_REFRESH_SECONDS; a window reaching further
+    back than the stored history triggers a one-off backfill.
+    """
+    now = int(datetime.now(timezone.utc).timestamp())
+    start = now - hours * 3600
+    async with price_store.lock(symbol):
+        covered = price_store.covered_from(symbol)
+        last = price_store.last_timestamp(symbol)
+        if covered is None or covered > start:
+            fetch_from = start
+        elif last is None or now - last >= PRICE_STORE_REFRESH_SECONDS:
+            fetch_from = start if last is None else last + 1
+        else:
+            fetch_from = None
+        if fetch_from is not None:
+            points = await price_source.chart(_coin_id(symbol), fetch_from)
+            price_store.merge(symbol, [p["timestamp"] for p in points], [p["price"] for p in points])
+            price_store.mark_covered(symbol, fetch_from)
+    return price_store.window(symbol, start)
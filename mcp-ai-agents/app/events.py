@@ -0,0 +1,104 @@
+"""Event-sourced balance history.
+
+Every balance change is appended as a BalanceEvent in the same transaction
+that changes the Holding rows, numbered per owner by `Portfolio.event_seq`.
+Whenever an owner's sequence crosses a multiple of SNAPSHOT_EVERY, their
+holdings are snapshotted, so rebuilding a portfolio at any point in time
+replays at most the events since the nearest earlier snapshot.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, update
+from sqlmodel import Session, select
+from app.models import BalanceEvent, Holding, HoldingsSnapshot, Portfolio
+from app.config import SNAPSHOT_EVERY
+
+# (kind, changes, trade_id, created_at)
+Event = Tuple[str, Dict[str, float], Optional[int], datetime]
+
+def trade_changes(symbol: str, side: str, price: float, qty: float, base_asset: str) -> Dict[str, float]:
+    """Balance deltas of one fill"""
+    if side == "buy":
+        return {base_asset: -price * qty, symbol.upper(): qty}
+    return {symbol.upper(): -qty, base_asset: price * qty}
+
+def apply_event(holdings: Dict[str, float], kind: str, changes: Dict[str, float]) -> Dict[str, float]:
+    if kind == "set":
+        return dict(changes)
+    for asset, amount in changes.items():
+        holdings[asset] = holdings.get(asset, 0.0) + amount
+    return holdings
+
+def record(session: Session, owner: str, events: List[Event]) -> int:
+    """Append events for an owner whose Portfolio row exists; returns their last seq.
+
+    Must run after the Holding rows were changed in the same transaction, since
+    a snapshot taken here reads them.
+    """
+    if not events:
+        return 0
+    last = session.execute(update(Portfolio).where(Portfolio.owner == owner)
+                           .values(event_seq=func.coalesce(Portfolio.event_seq, 0) + len(events),
+                                   updated_at=datetime.now(timezone.utc))
+                           .returning(Portfolio.event_seq)
+                           .execution_options(synchronize_session=False)).scalars().all()
+    if not last:
+        raise ValueError(f"No portfolio for {owner}")
+    last = max(last)  # duplicate portfolio rows from older versions move together
+    first = last - len(events) + 1
+    session.execute(insert(BalanceEvent), [{
+        "owner": owner, "seq": first + i, "kind": kind, "changes_json": changes,
+        "trade_id": trade_id, "created_at": created_at,
+    } for i, (kind, changes, trade_id, created_at) in enumerate(events)])
+
+    if last // SNAPSHOT_EVERY > (first - 1) // SNAPSHOT_EVERY:
+        holdings = dict(session.exec(select(Holding.asset, Holding.amount).where(Holding.owner == owner)).all())
+        session.execute(insert(HoldingsSnapshot), [{
+            "owner": owner, "seq": last, "holdings_json": holdings, "created_at": events[-1][3],
+        }])
+    return last
+
+def seed_snapshots(session: Session) -> int:
+    """Give every portfolio without history a starting snapshot of its current holdings"""
+    has_snapshot = select(HoldingsSnapshot.owner).distinct()
+    portfolios = session.exec(select(Portfolio).where(Portfolio.owner.not_in(has_snapshot))
+                              .order_by(Portfolio.id)).all()
+    seeded = set()
+    for pf in portfolios:
+        if pf.owner in seeded:
+            continue
+        seeded.add(pf.owner)
+        if session.exec(select(BalanceEvent.id).where(BalanceEvent.owner == pf.owner)).first() is not None:
+            continue  # history starts with its own events
+        holdings = dict(session.exec(select(Holding.asset, Holding.amount).where(Holding.owner == pf.owner)).all())
+        session.add(HoldingsSnapshot(owner=pf.owner, seq=pf.event_seq or 0,
+                                     holdings_json=holdings, created_at=pf.updated_at))
+    session.commit()
+    return len(seeded)
+
+def rebuild(session: Session, owner: str, at: Optional[datetime] = None) -> Optional[dict]:
+    """Holdings of an owner as of `at` (default: now) from the nearest snapshot plus later events.
+
+    Returns None when the owner has no history that early.
+    """
+    snap_q = select(HoldingsSnapshot).where(HoldingsSnapshot.owner == owner)
+    event_q = select(BalanceEvent).where(BalanceEvent.owner == owner)
+    if at is not None:
+        snap_q = snap_q.where(HoldingsSnapshot.created_at <= at)
+        event_q = event_q.where(BalanceEvent.created_at <= at)
+    snapshot = session.exec(snap_q.order_by(HoldingsSnapshot.seq.desc()).limit(1)).first()
+
+    holdings: Dict[str, float] = dict(snapshot.holdings_json) if snapshot else {}
+    base_seq = snapshot.seq if snapshot else 0
+    events = session.exec(event_q.where(BalanceEvent.seq > base_seq).order_by(BalanceEvent.seq)).all()
+    if snapshot is None and (not events or events[0].seq != 1):
+        return None
+
+    seq = base_seq
+    as_of = snapshot.created_at if snapshot else None
+    for event in events:
+        holdings = apply_event(holdings, event.kind, event.changes_json)
+        seq = event.seq
+        as_of = event.created_at
+    return {"holdings": holdings, "seq": seq, "snapshot_seq": base_seq,
+            "events_replayed": len(events), "as_of": as_of}
@@ -1,51 +1,88 @@
-import json
-from datetime import datetime, timezone
+import time
 from fastapi import HTTPException
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models import Portfolio, Trade
+from app.holdings import credit, debit, ensure_portfolio
+from app.events import record, trade_changes
+from app.metrics import trade_execute_seconds, trade_failures_total, trades_total
 
 class TradeExecutor:
     @staticmethod
-    def _get_holdings(session: Session, owner: str) -> dict:
-        pf = session.exec(select(Portfolio).where(Portfolio.owner == owner)).first()
-        if not pf:
-            pf = Portfolio(owner=owner)
-            session.add(pf); session.commit(); session.refresh(pf)
-        return json.loads(pf.holdings_json)
+    def _debit(session: Session, owner: str, asset: str, amount: float):
+        """Conditional in-database debit; creates a default portfolio on an owner's first trade"""
+        if debit(session, owner, asset, amount):
+            return
+        if session.exec(select(Portfolio.id).where(Portfolio.owner == owner)).first() is None:
+            ensure_portfolio(session, owner)
+            if debit(session, owner, asset, amount):
+                return
+        trade_failures_total.inc("insufficient_balance")
+        raise HTTPException(400, f"Insufficient {asset}")
 
     @staticmethod
-    def _save_holdings(session: Session, owner: str, holdings: dict):
-        pf = session.exec(select(Portfolio).where(Portfolio.owner == owner)).first()
-        pf.holdings_json = json.dumps(holdings)
-        pf.updated_at = datetime.now(timezone.utc)
-        session.add(pf); session.commit()
-
-    @classmethod
-    def execute(cls, session: Session, owner: str, strategy_id: int,
-                symbol: str, side: str, price: float, qty: float,
-                base_asset: str = "USDC", meta: dict = None) -> Trade:
-        holdings = cls._get_holdings(session, owner)
-        meta = meta or {}
-
+    def apply(holdings: dict, symbol: str, side: str, price: float, qty: float,
+              base_asset: str = "USDC") -> float:
+        """Move balances for one fill in place and return its notional; raises on insufficient balance"""
         if side == "buy":
             cost = price * qty
             if holdings.get(base_asset, 0.0) < cost:
+                trade_failures_total.inc("insufficient_balance")
                 raise HTTPException(400, f"Insufficient {base_asset}")
             holdings[base_asset] -= cost
             holdings[symbol.upper()] = holdings.get(symbol.upper(), 0.0) + qty
-            notional = cost
-        else:
-            if holdings.get(symbol.upper(), 0.0) < qty:
-                raise HTTPException(400, f"Insufficient {symbol.upper()}")
-            holdings[symbol.upper()] -= qty
-            proceeds = price * qty
-            holdings[base_asset] += proceeds
-            notional = proceeds
+            return cost
+        if holdings.get(symbol.upper(), 0.0) < qty:
+            trade_failures_total.inc("insufficient_balance")
+            raise HTTPException(400, f"Insufficient {symbol.upper()}")
+        holdings[symbol.upper()] -= qty
+        proceeds = price * qty
+        holdings[base_asset] = holdings.get(base_asset, 0.0) + proceeds
+        return proceeds
 
-        cls._save_holdings(session, owner, holdings)
+    @classmethod
+    def execute(cls, session: Session, owner: str, strategy_id: int,
+                symbol: str, side: str, price: float, qty: float,
+                base_asset: str = "USDC", meta: dict = None) -> Trade:
+        started = time.perf_counter()
+        meta = meta or {}
+        asset = symbol.upper()
 
-        tr = Trade(owner=owner, strategy_id=strategy_id, symbol=symbol.upper(),
-                   side=side, price=price, qty=qty, notional=notional,
-                   meta_json=json.dumps(meta))
-        session.add(tr); session.commit(); session.refresh(tr)
+        # balances move with conditional UPDATEs, so there is nothing to read first
+        notional = price * qty
+        try:
+            if side == "buy":
+                cls._debit(session, owner, base_asset, notional)
+                credit(session, owner, asset, qty)
+            else:
+                cls._debit(session, owner, asset, qty)
+                credit(session, owner, base_asset, notional)
+            # "read" is the balance check: the guarded UPDATEs replaced the holdings SELECT
+            guarded = time.perf_counter()
+            tr = Trade(owner=owner, strategy_id=strategy_id, symbol=asset,
+                       side=side, price=price, qty=qty, notional=notional,
+                       meta_json=meta)
+            session.add(tr)
+            session.flush()
+            record(session, owner, [("trade", trade_changes(symbol, side, price, qty, base_asset),
+                                     tr.id, tr.created_at)])
+            commit_started = time.perf_counter()
+            session.commit(); session.refresh(tr)
+        except Exception:
+            session.rollback()
+            raise
+        commit_seconds = time.perf_counter() - commit_started
+
+        trade_execute_seconds.observe(guarded - started, "read")
+        trade_execute_seconds.observe(commit_started - guarded, "write")
+        trade_execute_seconds.observe(commit_seconds, "commit")
+        trades_total.inc(side)
         return tr
+
+    @classmethod
+    async def execute_async(cls, session: AsyncSession, owner: str, strategy_id: int,
+                            symbol: str, side: str, price: float, qty: float,
+                            base_asset: str = "USDC", meta: dict = None) -> Trade:
+        """`execute` on an AsyncSession: the same statements, awaited instead of blocking the loop"""
+        return await session.run_sync(lambda s: cls.execute(s, owner, strategy_id, symbol, side,
+                                                            price, qty, base_asset, meta))
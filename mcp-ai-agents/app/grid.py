@@ -0,0 +1,117 @@
+"""Grid engine: precomputed levels and per-level fill state for grid strategies.
+
+Each strategy's levels are built once into an array and only rebuilt when its
+grid params change. A tick locates the price with bisection, and only the
+levels crossed since the previous tick produce orders: a level crossed on the
+way down is bought (unless already filled), and a filled level is sold when
+the price crosses the level above it on the way up. A tick without crossings
+costs O(log levels), whatever the size of the grid.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import Session, select
+from app.models import Trade
+from app.registry import LiveStrategy, registry
+
+class GridState:
+    """Levels, fill flags and last position of one strategy's grid"""
+
+    __slots__ = ("key", "lower", "upper", "count", "order_size", "levels", "filled", "position")
+
+    def __init__(self, lower: float, upper: float, count: int, order_size: float):
+        self.lower = lower
+        self.upper = upper
+        self.count = count
+        self.order_size = order_size
+        self.key = f"{lower}:{upper}:{count}"
+        step = (upper - lower) / count
+        self.levels = array("d", (lower + i * step for i in range(count + 1)))
+        self.filled = bytearray(count + 1)  # 1 while the buy at that level has not been sold
+        self.position: Optional[int] = None  # level index at or below the last price, -1 below the grid
+
+    def locate(self, price: float) -> int:
+        return bisect_right(self.levels, price) - 1
+
+    def crossings(self, price: float) -> List[Tuple[str, int]]:
+        """("buy", level) / ("sell", level) orders for the levels crossed since the last tick.
+
+        A sell at level k closes the position bought at level k - 1. The caller
+        records fills with `mark` once an order is written.
+        """
+        new = self.locate(price)
+        old, self.position = self.position, new
+        if old is None or new == old:
+            return []
+        if new < old:
+            # price fell below levels new+1..old, nearest first; the top level has nothing above to sell at
+            return [("buy", k) for k in range(old, new, -1) if 0 <= k < self.count and not self.filled[k]]
+        # price rose above levels old+1..new: sell the fills one level below each
+        return [("sell", k) for k in range(old + 1, new + 1) if k >= 1 and self.filled[k - 1]]
+
+    def mark(self, side: str, level: int):
+        """Record a fill: a buy holds its level, a sell releases the level below"""
+        if side == "buy":
+            self.filled[level] = 1
+        else:
+            self.filled[level - 1] = 0
+
+class GridEngine:
+    def __init__(self):
+        self.states: Dict[int, GridState] = {}
+
+    def drop(self, sid: int):
+        self.states.pop(sid, None)
+
+    def state(self, strategy, params, price: float, session: Session) -> GridState:
+        """The strategy's grid, built on first use and rebuilt when its GridParams change"""
+        state = self.states.get(strategy.id)
+        if state is not None and state.count == params.grid_count and state.order_size == params.order_size \
+                and params.lower in (None, state.lower) and params.upper in (None, state.upper):
+            return state
+
+        lower, upper, fills = self._recover(strategy.id, params, session)
+        if lower is None:
+            # unset bounds are anchored on the first price seen, not re-centred every tick
+            lower = params.lower if params.lower is not None else price * 0.9
+            upper = params.upper if params.upper is not None else price * 1.1
+        state = GridState(lower, upper, params.grid_count, params.order_size)
+        for level in fills:
+            state.filled[level] = 1
+        self.states[strategy.id] = state
+        return state
+
+    @staticmethod
+    def _recover(sid: int, params, session: Session) -> Tuple[Optional[float], Optional[float], List[int]]:
+        """Rebuild fill flags from this strategy's own grid trades after a restart"""
+        rows = session.exec(select(Trade.side, Trade.meta_json).where(Trade.strategy_id == sid)
+                            .order_by(Trade.id)).all()
+        trades = []
+        for side, meta_json in rows:
+            meta = meta_json or {}
+            if meta.get("bot") == "grid" and "grid" in meta:
+                trades.append((side, meta["grid"], meta["grid_level"]))
+        if not trades:
+            return None, None, []
+        key = trades[-1][1]
+        lower, upper, count = key.split(":")
+        lower, upper = float(lower), float(upper)
+        if int(count) != params.grid_count or params.lower not in (None, lower) or params.upper not in (None, upper):
+            return None, None, []  # the grid has changed since those trades
+        filled = set()
+        for side, trade_key, level in trades:
+            if trade_key != key:
+                continue
+            if side == "buy":
+                filled.add(level)
+            else:
+                filled.discard(level - 1)
+        return lower, upper, sorted(filled)
+
+grid_engine = GridEngine()
+
+def _forget_stopped(sid: int, entry: Optional[LiveStrategy]):
+    if entry is None:
+        grid_engine.drop(sid)
+
+registry.subscribe(_forget_stopped)
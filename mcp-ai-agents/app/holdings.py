@@ -0,0 +1,124 @@
+"""Per-asset balances in the `holding` table.
+
+Balances change through single UPDATE statements evaluated by the database
+(`amount = amount - :qty WHERE amount >= :qty`), so concurrent trades of one
+owner never need a prior SELECT or a lock on a whole portfolio row.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Text, cast, delete, insert, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from app.models import DEFAULT_HOLDINGS, Holding, Portfolio
+from app.events import record
+
+logger = logging.getLogger(__name__)
+
+def get_holdings(session: Session, owner: str) -> Optional[Dict[str, float]]:
+    """{asset: amount} for one owner, or None if they have no portfolio"""
+    rows = session.exec(select(Holding.asset, Holding.amount).where(Holding.owner == owner)).all()
+    if rows:
+        return {asset: amount for asset, amount in rows}
+    if session.exec(select(Portfolio.id).where(Portfolio.owner == owner)).first() is None:
+        return None
+    return {}
+
+def holdings_for(session: Session, owners: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """{owner: {asset: amount}} for many owners in one query; owners without rows are left out"""
+    result: Dict[str, Dict[str, float]] = defaultdict(dict)
+    rows = session.exec(select(Holding.owner, Holding.asset, Holding.amount)
+                        .where(Holding.owner.in_(list(owners)))).all()
+    for owner, asset, amount in rows:
+        result[owner][asset] = amount
+    return dict(result)
+
+def ensure_portfolio(session: Session, owner: str) -> Portfolio:
+    """The owner's Portfolio row, created with DEFAULT_HOLDINGS if missing (not committed)"""
+    pf = session.exec(select(Portfolio).where(Portfolio.owner == owner)).first()
+    if pf is None:
+        pf = Portfolio(owner=owner)
+        session.add(pf)
+        add_amounts(session, [(owner, asset, amount) for asset, amount in DEFAULT_HOLDINGS.items()])
+        record(session, owner, [("set", dict(DEFAULT_HOLDINGS), None, pf.updated_at)])
+    return pf
+
+def set_holdings(session: Session, owner: str, holdings: Dict[str, float]):
+    """Replace every balance of an owner whose Portfolio row exists (not committed)"""
+    session.execute(delete(Holding).where(Holding.owner == owner))
+    if holdings:
+        session.execute(insert(Holding), [{"owner": owner, "asset": asset, "amount": amount}
+                                          for asset, amount in holdings.items()])
+    record(session, owner, [("set", dict(holdings), None, datetime.now(timezone.utc))])
+
+def debit(session: Session, owner: str, asset: str, amount: float) -> bool:
+    """Subtract `amount` only if the balance covers it; False when it does not"""
+    result = session.execute(update(Holding)
+                             .where(Holding.owner == owner, Holding.asset == asset, Holding.amount >= amount)
+                             .values(amount=Holding.amount - amount)
+                             .execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+def add_amounts(session: Session, changes: List[Tuple[str, str, float]]):
+    """Atomically add (owner, asset, amount) deltas, creating missing rows"""
+    if not changes:
+        return
+    params = [{"owner": owner, "asset": asset, "amount": amount} for owner, asset, amount in changes]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(Holding)
+        stmt = stmt.on_conflict_do_update(index_elements=["owner", "asset"],
+                                          set_={"amount": Holding.amount + stmt.excluded.amount})
+        session.execute(stmt, params)
+        return
+    for p in params:
+        result = session.execute(update(Holding)
+                                 .where(Holding.owner == p["owner"], Holding.asset == p["asset"])
+                                 .values(amount=Holding.amount + p["amount"])
+                                 .execution_options(synchronize_session=False))
+        if result.rowcount == 0:
+            session.execute(insert(Holding), [p])
+
+def credit(session: Session, owner: str, asset: str, amount: float):
+    add_amounts(session, [(owner, asset, amount)])
+
+def _clear_holdings_json(session: Session, pid: int):
+    # an untyped literal, valid whether the column is still text or already JSON
+    session.execute(text("UPDATE portfolio SET holdings_json = '{}' WHERE id = :id"), {"id": pid})
+
+def migrate_holdings_json(session: Session) -> int:
+    """Move balances out of Portfolio.holdings_json into Holding rows; safe to run repeatedly.
+
+    A migrated portfolio is left with holdings_json {}, so only rows written
+    by older code are picked up. The column is read as text, and values that
+    are not a JSON object are logged and cleared: init_db turns the column
+    into native JSON next, which they would not survive.
+    """
+    raw = cast(Portfolio.holdings_json, Text)
+    legacy = session.exec(select(Portfolio.id, Portfolio.owner, raw).where(raw != "{}").order_by(Portfolio.id)).all()
+    migrated = 0
+    seen = set(session.exec(select(Holding.owner).distinct()).all())
+    for pid, owner, holdings_json in legacy:
+        if owner in seen:
+            # duplicate portfolio rows: older code only ever read the first one
+            logger.warning(f"Portfolio {pid} ({owner}) is a duplicate, its holdings_json is not migrated")
+            _clear_holdings_json(session, pid)
+            continue
+        seen.add(owner)
+        try:
+            holdings = json.loads(holdings_json or "{}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Portfolio {pid} ({owner}) has unreadable holdings_json, cleared: {e}: {holdings_json!r}")
+            _clear_holdings_json(session, pid)
+            continue
+        if not isinstance(holdings, dict):
+            logger.error(f"Portfolio {pid} ({owner}) holdings_json is not an object, cleared: {holdings_json!r}")
+            _clear_holdings_json(session, pid)
+            continue
+        add_amounts(session, [(owner, asset, float(amount)) for asset, amount in holdings.items()])
+        _clear_holdings_json(session, pid)
+        migrated += 1
+    session.commit()
+    return migrated
@@ -0,0 +1,141 @@
+"""Vectorized evaluation of strategies that share a bot type and symbol (EVAL_MODE=kernel).
+
+Live strategies are grouped by (bot_type, symbol) and their params are
+packed into NumPy arrays, kept until the registry reports a change. One
+pass over a group's arrays decides every strategy at the tick's price, so
+strategies with nothing to do cost no Python at all. Only the resulting
+orders are placed, through the same path as TradingBot (settlement, ledger
+or executor).
+
+- dca: every strategy buys amount_usd / price.
+- grid: the level index of every grid is computed at once; only grids whose
+  index moved (or whose price sits on a level boundary, where float rounding
+  could disagree with bisection) go through `GridState.crossings`, so fill
+  state and orders are exactly those of the per-bot path.
+"""
+import logging
+import time
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from sqlmodel import Session
+from app.bots import place_order
+from app.grid import GridState, grid_engine
+from app.registry import LiveStrategy, registry
+from app.settlement import Settlement
+from app.metrics import kernel_eval_seconds, strategy_failures_total
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = -2  # grid position before its first price
+
+class Pack:
+    """A group's strategies in a fixed order with their params as parallel arrays"""
+
+    __slots__ = ("ids", "strategies", "arrays", "states")
+
+    def __init__(self, strategies: List[LiveStrategy]):
+        self.strategies = strategies
+        self.ids = np.fromiter((st.id for st in strategies), dtype=np.int64, count=len(strategies))
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.states: List[GridState] = []
+
+def _pack_dca(pack: Pack, price: float, session: Session):
+    pack.arrays["amount_usd"] = np.fromiter((st.compiled.amount_usd for st in pack.strategies),
+                                            dtype=np.float64, count=len(pack.strategies))
+
+def _pack_grid(pack: Pack, price: float, session: Session):
+    pack.states = [grid_engine.state(st, st.compiled, price, session) for st in pack.strategies]
+    n = len(pack.states)
+    pack.arrays["lower"] = np.fromiter((g.lower for g in pack.states), dtype=np.float64, count=n)
+    pack.arrays["step"] = np.fromiter(((g.upper - g.lower) / g.count for g in pack.states), dtype=np.float64, count=n)
+    pack.arrays["count"] = np.fromiter((g.count for g in pack.states), dtype=np.int64, count=n)
+    pack.arrays["position"] = np.fromiter((UNKNOWN if g.position is None else g.position for g in pack.states),
+                                          dtype=np.int64, count=n)
+
+Order = Tuple[int, str, float, float, dict]  # (strategy index, side, price, qty, meta)
+
+def _dca_orders(pack: Pack, price: float) -> List[Order]:
+    qty = pack.arrays["amount_usd"] / price
+    return [(i, "buy", price, q, {"bot": "dca", "amount_usd": a})
+            for i, (q, a) in enumerate(zip(qty.tolist(), pack.arrays["amount_usd"].tolist()))]
+
+def _grid_orders(pack: Pack, price: float) -> List[Order]:
+    a = pack.arrays
+    f = (price - a["lower"]) / a["step"]
+    level = np.clip(np.floor(f), -1, a["count"]).astype(np.int64)
+    frac = f - np.floor(f)
+    moved = (level != a["position"]) | (frac < 1e-9) | (frac > 1 - 1e-9)
+
+    orders = []
+    for i in np.flatnonzero(moved).tolist():
+        grid = pack.states[i]
+        for side, k in grid.crossings(price):
+            level_price = grid.levels[k]
+            qty = grid.order_size / (level_price if side == "buy" else grid.levels[k - 1])
+            orders.append((i, side, level_price, qty, {"bot": "grid", "grid_level": k, "grid": grid.key}))
+        a["position"][i] = grid.position
+    return orders
+
+def _grid_filled(pack: Pack, order: Order):
+    i, side, _, _, meta = order
+    pack.states[i].mark(side, meta["grid_level"])
+
+# bot_type -> (pack builder, order kernel, fill callback)
+KERNELS: Dict[str, Tuple[Callable, Callable, Optional[Callable]]] = {
+    "dca": (_pack_dca, _dca_orders, None),
+    "grid": (_pack_grid, _grid_orders, _grid_filled),
+}
+
+class Kernel:
+    def __init__(self):
+        self.packs: Dict[Tuple[str, str], Pack] = {}
+
+    def invalidate(self, sid: int = None, entry: Optional[LiveStrategy] = None):
+        """Drop every pack; any registry change may add, remove or re-parametrize a member"""
+        self.packs.clear()
+
+    def _pack(self, bot_type: str, symbol: str, strategies: List[LiveStrategy], price: float,
+              session: Session) -> Pack:
+        pack = self.packs.get((bot_type, symbol))
+        if pack is not None and len(pack.ids) == len(strategies) and \
+                all(a is b for a, b in zip(pack.strategies, strategies)):
+            return pack
+        pack = Pack(strategies)
+        KERNELS[bot_type][0](pack, price, session)
+        self.packs[(bot_type, symbol)] = pack
+        return pack
+
+    def run(self, bot_type: str, symbol: str, strategies: List[LiveStrategy], price: float,
+            session: Session, settlement: Optional[Settlement] = None) -> int:
+        """Evaluate one group and place its orders; returns the number of orders accepted"""
+        started = time.perf_counter()
+        _, orders_for, on_fill = KERNELS[bot_type]
+        try:
+            pack = self._pack(bot_type, symbol, strategies, price, session)
+            orders = orders_for(pack, price)
+        except Exception as e:
+            strategy_failures_total.inc(bot_type, amount=len(strategies))
+            logger.error(f"Kernel evaluation of {len(strategies)} {bot_type} strategies on {symbol} failed: {e}")
+            self.packs.pop((bot_type, symbol), None)
+            return 0
+        finally:
+            kernel_eval_seconds.observe(time.perf_counter() - started, bot_type)
+
+        accepted = 0
+        for order in orders:
+            i, side, order_price, qty, meta = order
+            try:
+                place_order(pack.strategies[i], session, settlement, side, order_price, qty, meta,
+                            partial(on_fill, pack, order) if on_fill is not None else None)
+            except Exception as e:
+                logger.debug(f"Strategy {pack.strategies[i].id} {side} rejected: {e}")
+                continue
+            accepted += 1
+        if orders:
+            logger.info(f"Kernel {bot_type}/{symbol}: {len(strategies)} strategies, "
+                        f"{accepted}/{len(orders)} orders accepted")
+        return accepted
+
+kernel = Kernel()
+registry.subscribe(kernel.invalidate)
@@ -0,0 +1,286 @@
+"""In-memory portfolio ledger (SETTLEMENT_MODE=ledger).
+
+Balances live in memory and trades are checked and applied there. Every
+mutation is appended to a local journal, with fsyncs batched every
+LEDGER_FSYNC_SECONDS. A background task writes the changes behind, every
+LEDGER_FLUSH_SECONDS: Trade rows, the absolute Holding rows of owners that
+changed, and the journal sequence number they cover (`ledgercheckpoint`),
+all in one transaction. On restart the ledger is rebuilt from the DB plus
+the journal records after that checkpoint.
+
+The ledger is the authority for balances, so exactly one process may run in
+this mode: the API with EMBEDDED_CRON, not app.worker.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+from app.db import engine
+from app.models import DEFAULT_HOLDINGS, Holding, LedgerCheckpoint, Portfolio, Trade
+from app.executor import TradeExecutor
+from app.events import record as record_events, trade_changes
+from app.metrics import settlement_seconds, trades_total
+from app.config import LEDGER_JOURNAL_PATH, LEDGER_FSYNC_SECONDS, LEDGER_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class Ledger:
+    def __init__(self, journal_path: str):
+        self.journal_path = journal_path
+        self.flushing_path = journal_path + ".flushing"  # records being written to the DB
+        self.active = False
+        self.holdings: Dict[str, Dict[str, float]] = {}
+        self.updated_at: Dict[str, datetime] = {}
+        self.seq = 0          # last journal record written
+        self.synced_seq = 0   # last record known to be on disk
+        self.flushed_seq = 0  # last record whose effects are committed to the DB
+        self.pending: List[dict] = []  # journal records not yet in the DB
+        self.dirty: Set[str] = set()
+        self._journal = None
+        self._io_lock = asyncio.Lock()  # fsync vs. journal rotation
+        self._tasks: List[asyncio.Task] = []
+
+    def portfolio(self, owner: str) -> Optional[Dict[str, float]]:
+        return self.holdings.get(owner)
+
+    def owners(self) -> List[str]:
+        return list(self.holdings)
+
+    def _append(self, record: dict) -> int:
+        self.seq += 1
+        record["seq"] = self.seq
+        self._journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return self.seq
+
+    def _apply(self, record: dict):
+        """Apply a journal record to memory; also used when replaying"""
+        owner = record["owner"]
+        if record["op"] == "set":
+            self.holdings[owner] = dict(record["holdings"])
+        else:
+            # apply() checks before it mutates, so a rejected trade leaves no trace
+            holdings = self.holdings.get(owner)
+            holdings = dict(DEFAULT_HOLDINGS) if holdings is None else holdings
+            TradeExecutor.apply(holdings, record["symbol"], record["side"], record["price"], record["qty"], record["base"])
+            self.holdings[owner] = holdings
+        self.pending.append(record)
+        self.updated_at[owner] = datetime.fromisoformat(record["ts"])
+        self.dirty.add(owner)
+
+    def create(self, owner: str) -> Dict[str, float]:
+        """Holdings of an owner, giving newcomers the default portfolio"""
+        if owner not in self.holdings:
+            self.set(owner, dict(DEFAULT_HOLDINGS))
+        return self.holdings[owner]
+
+    def set(self, owner: str, holdings: Dict[str, float]):
+        record = {"op": "set", "owner": owner, "holdings": holdings, "ts": datetime.now(timezone.utc).isoformat()}
+        self._apply(record)
+        self._append(record)
+
+    def trade(self, owner: str, strategy_id: int, symbol: str, side: str, price: float, qty: float,
+              base_asset: str = "USDC", meta: dict = None) -> Trade:
+        """Check and apply a fill in memory; raises like TradeExecutor on insufficient balance.
+
+        The returned Trade has no id until the write-behind flush inserts it.
+        """
+        if owner not in self.holdings:
+            self.create(owner)
+        record = {"op": "trade", "owner": owner, "strategy_id": strategy_id, "symbol": symbol, "side": side,
+                  "price": price, "qty": qty, "notional": price * qty, "base": base_asset, "meta": meta or {},
+                  "ts": datetime.now(timezone.utc).isoformat()}
+        self._apply(record)
+        self._append(record)
+        trades_total.inc(side)
+        return Trade(owner=owner, strategy_id=strategy_id, symbol=symbol.upper(), side=side, price=price,
+                     qty=qty, notional=price * qty, meta_json=meta or {},
+                     created_at=self.updated_at[owner])
+
+    @staticmethod
+    def _read_journal(path: str) -> List[dict]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring torn record at the end of {path}")
+                    break
+        return records
+
+    async def sync(self):
+        """fsync everything appended so far"""
+        async with self._io_lock:
+            if self._journal is None or self.synced_seq == self.seq:
+                return
+            seq = self.seq
+            self._journal.flush()
+            await asyncio.to_thread(os.fsync, self._journal.fileno())
+            self.synced_seq = seq
+
+    def _rotate(self):
+        """Move the current journal aside for a flush and start a new one"""
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal.close()
+        if os.path.exists(self.flushing_path):
+            # a previous flush failed: its records are still pending, keep them together
+            with open(self.flushing_path, "ab") as dst, open(self.journal_path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.flushing_path)
+        self._journal = open(self.journal_path, "a")
+        self.synced_seq = self.seq
+
+    def recover(self):
+        """Rebuild from the DB plus journal records newer than the DB checkpoint"""
+        with Session(engine) as session:
+            checkpoint = session.get(LedgerCheckpoint, 1)
+            base_seq = checkpoint.seq if checkpoint else 0
+            self.holdings = {}
+            for owner, updated_at in session.exec(select(Portfolio.owner, Portfolio.updated_at)).all():
+                self.holdings.setdefault(owner, {})
+                self.updated_at[owner] = updated_at
+            for owner, asset, amount in session.exec(select(Holding.owner, Holding.asset, Holding.amount)).all():
+                self.holdings.setdefault(owner, {})[asset] = amount
+
+        self.seq = self.flushed_seq = base_seq
+        self.pending, self.dirty = [], set()
+        replay = [r for path in (self.flushing_path, self.journal_path)
+                  for r in self._read_journal(path) if r.get("seq", 0) > base_seq]
+        for record in replay:
+            try:
+                self._apply(record)
+            except Exception as e:
+                logger.error(f"Skipping journal record {record['seq']} that no longer applies: {e}")
+            self.seq = record["seq"]
+
+        # rewrite the unflushed tail as the new journal, dropping any torn record
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w") as f:
+            for record in replay:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        if os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+        self._journal = open(self.journal_path, "a")
+        self.synced_seq = self.seq
+        logger.info(f"Ledger recovered {len(self.holdings)} portfolios, replayed {len(replay)} journal records")
+
+    @staticmethod
+    def _write(records: List[dict], holdings: Dict[str, Dict[str, float]], seq: int):
+        with Session(engine) as session:
+            owners = list(holdings)
+            existing = set(session.exec(select(Portfolio.owner).where(Portfolio.owner.in_(owners))).all())
+            session.add_all([Portfolio(owner=owner) for owner in owners if owner not in existing])
+            session.flush()
+            session.execute(delete(Holding).where(Holding.owner.in_(owners))
+                            .execution_options(synchronize_session=False))
+            rows = [{"owner": o, "asset": a, "amount": v} for o, h in holdings.items() for a, v in h.items()]
+            if rows:
+                session.execute(insert(Holding), rows)
+
+            trades = [r for r in records if r["op"] == "trade"]
+            trade_ids = {}
+            if trades:
+                ids = session.execute(insert(Trade).returning(Trade.id, sort_by_parameter_order=True), [{
+                    "owner": r["owner"], "strategy_id": r["strategy_id"], "symbol": r["symbol"].upper(),
+                    "side": r["side"], "price": r["price"], "qty": r["qty"], "notional": r["notional"],
+                    "meta_json": r["meta"], "created_at": datetime.fromisoformat(r["ts"]),
+                } for r in trades]).scalars().all()
+                trade_ids = {r["seq"]: trade_id for r, trade_id in zip(trades, ids)}
+            events: Dict[str, list] = {}
+            for r in records:
+                if r["op"] == "trade":
+                    changes = trade_changes(r["symbol"], r["side"], r["price"], r["qty"], r["base"])
+                    event = ("trade", changes, trade_ids[r["seq"]], datetime.fromisoformat(r["ts"]))
+                else:
+                    event = ("set", dict(r["holdings"]), None, datetime.fromisoformat(r["ts"]))
+                events.setdefault(r["owner"], []).append(event)
+            for owner, owner_events in events.items():
+                record_events(session, owner, owner_events)
+
+            checkpoint = session.get(LedgerCheckpoint, 1) or LedgerCheckpoint(id=1)
+            checkpoint.seq = seq
+            checkpoint.updated_at = datetime.now(timezone.utc)
+            session.add(checkpoint)
+            session.commit()
+        return len(trades)
+
+    async def flush(self) -> int:
+        """Write everything journaled so far to the DB; returns the number of trades written"""
+        if self.seq == self.flushed_seq:
+            return 0
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # snapshot and rotate without awaiting, so no mutation slips in between
+        async with self._io_lock:
+            records, self.pending = self.pending, []
+            owners, self.dirty = self.dirty, set()
+            holdings = {o: dict(self.holdings[o]) for o in owners}
+            seq = self.seq
+            self._rotate()
+        try:
+            written = await asyncio.to_thread(self._write, records, holdings, seq)
+        except Exception:
+            self.pending = records + self.pending
+            self.dirty |= owners
+            raise
+        os.remove(self.flushing_path)
+        self.flushed_seq = seq
+        settlement_seconds.observe(loop.time() - started)
+        return written
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(LEDGER_FSYNC_SECONDS)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Ledger journal fsync failed: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(LEDGER_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ledger flush failed, will retry: {e}")
+
+ledger = Ledger(LEDGER_JOURNAL_PATH)
+
+def start_ledger():
+    """Rebuild the ledger and start its fsync and flush tasks"""
+    ledger.recover()
+    ledger.active = True
+    ledger._tasks = [asyncio.create_task(ledger._sync_loop()), asyncio.create_task(ledger._flush_loop())]
+    logger.info(f"Ledger started - journal {ledger.journal_path}, flushing every {LEDGER_FLUSH_SECONDS} seconds")
+
+async def stop_ledger():
+    """Stop background tasks and write out everything still pending"""
+    for task in ledger._tasks:
+        task.cancel()
+    ledger._tasks = []
+    if ledger._journal is None:
+        return
+    try:
+        await ledger.flush()
+    except Exception as e:
+        logger.error(f"Final ledger flush failed, the journal will be replayed on restart: {e}")
+    await ledger.sync()
+    ledger._journal.close()
+    ledger._journal = None
+    ledger.active = False
+    logger.info("Ledger stopped")
@@ -1,7 +1,12 @@
-from fastapi import FastAPI
-from app.db import init_db
-from app.routes import strategies, portfolio, trades
+from fastapi import FastAPI, Response
+from app.db import async_engine, init_db
+from app.routes import strategies, portfolio, trades, prices
 from app.cron import start_cron, stop_cron
+from app.price_feed import start_price_feed, stop_price_feed
+from app.metrics import metrics
+from app.ledger import start_ledger, stop_ledger
+from app.optimizer import stop_pool
+from app.config import EMBEDDED_CRON, SETTLEMENT_MODE
 import asyncio
 import logging
 
@@ -34,9 +39,17 @@ async def startup_event():
         init_db()
         logger.info("Database initialized")
         
-        # Start cron scheduler
-        start_cron()
-        logger.info("Cron scheduler started")
+        # Ledger mode keeps balances in memory; it must be up before anything trades
+        if SETTLEMENT_MODE == "ledger":
+            start_ledger()
+        
+        # Start price feed and cron scheduler (unless sharded workers run the ticks)
+        start_price_feed()
+        if EMBEDDED_CRON:
+            start_cron()
+            logger.info("Cron scheduler started")
+        else:
+            logger.info("Cron scheduler skipped (EMBEDDED_CRON=false, ticks run in app.worker)")
         
         # Start MCP server in background (if available)
         if MCP_AVAILABLE:
@@ -55,8 +68,14 @@ async def shutdown_event():
     """Clean shutdown of services"""
     try:
         logger.info("Shutting down Bitmax AI Server...")
-        stop_cron()
-        logger.info("Cron scheduler stopped")
+        if EMBEDDED_CRON:
+            stop_cron()
+            logger.info("Cron scheduler stopped")
+        stop_price_feed()
+        stop_pool()
+        await async_engine.dispose()
+        if SETTLEMENT_MODE == "ledger":
+            await stop_ledger()
         logger.info("Shutdown completed")
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
@@ -77,12 +96,18 @@ async def start_mcp_server():
 app.include_router(strategies.router)
 app.include_router(portfolio.router)
 app.include_router(trades.router)
+app.include_router(prices.router)
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "bitmax-ai-server"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/")
 async def root():
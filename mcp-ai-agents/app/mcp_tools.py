@@ -3,10 +3,18 @@
 
 try:
     from modelcontextprotocol import Server as MCPServer
-    from sqlmodel import Session, select
-    from app.db import engine
-    from app.models import Strategy
-    import json
+    from sqlmodel import select
+    from app.db import async_session
+    from app.models import Strategy, hash_owner
+    from app.price_feed import price_feed
+    from app.registry import registry
+    from app.bots import compile_params
+    from app.bulk import check_strategy, create_strategies, set_statuses
+    from app.defi import get_historical_prices
+    from app.models import DEFAULT_HOLDINGS
+    from app.optimizer import candidates, optimize
+    from app.backtest import check_prices
+    from datetime import datetime, timezone
     from app.config import OPENAI_API_KEY
     from openai import OpenAI
     
@@ -21,11 +29,11 @@ try:
     @mcp.tool()
     async def mcp_list_strategies(owner: str = None):
         """List all trading strategies, optionally filtered by owner"""
-        with Session(engine) as session:
+        async with async_session() as session:
             query = select(Strategy)
             if owner:
                 query = query.where(Strategy.owner == owner)
-            strategies = session.exec(query).all()
+            strategies = (await session.exec(query)).all()
             
             return {
                 "strategies": [
@@ -35,7 +43,7 @@ try:
                         "bot_type": strategy.bot_type,
                         "symbol": strategy.symbol,
                         "status": strategy.status,
-                        "params": json.loads(strategy.params_json or "{}")
+                        "params": strategy.params_json or {}
                     }
                     for strategy in strategies
                 ]
@@ -65,19 +73,28 @@ try:
         return {"summary": text}
     
     @mcp.tool()
-    async def mcp_create_strategy(name: str, owner: str, bot_type: str, symbol: str, params: dict = None):
-        """Create a new trading strategy"""
-        with Session(engine) as session:
+    async def mcp_create_strategy(name: str, owner: str, bot_type: str, symbol: str, params: dict = None,
+                                  interval_seconds: int = None, cron: str = None):
+        """Create a new trading strategy, optionally on its own interval or cron schedule"""
+        try:
+            check_strategy({"bot_type": bot_type, "params": params, "interval_seconds": interval_seconds, "cron": cron})
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        
+        async with async_session() as session:
             strategy = Strategy(
                 name=name,
                 owner=owner,
+                owner_hash=hash_owner(owner),
                 bot_type=bot_type,
                 symbol=symbol,
-                params_json=json.dumps(params or {})
+                params_json=params or {},
+                interval_seconds=interval_seconds,
+                cron=cron
             )
             session.add(strategy)
-            session.commit()
-            session.refresh(strategy)
+            await session.commit()
+            await session.refresh(strategy)
             
             return {
                 "success": True,
@@ -88,14 +105,16 @@ try:
     @mcp.tool()
     async def mcp_start_strategy(strategy_id: int):
         """Start a trading strategy (set status to live)"""
-        with Session(engine) as session:
-            strategy = session.get(Strategy, strategy_id)
+        async with async_session() as session:
+            strategy = await session.get(Strategy, strategy_id)
             if not strategy:
                 return {"success": False, "message": "Strategy not found"}
             
             strategy.status = "live"
+            strategy.updated_at = datetime.now(timezone.utc)
             session.add(strategy)
-            session.commit()
+            await session.commit()
+            registry.upsert(strategy)
             
             return {
                 "success": True,
@@ -106,14 +125,16 @@ try:
     @mcp.tool()
     async def mcp_stop_strategy(strategy_id: int):
         """Stop a trading strategy (set status to paused)"""
-        with Session(engine) as session:
-            strategy = session.get(Strategy, strategy_id)
+        async with async_session() as session:
+            strategy = await session.get(Strategy, strategy_id)
             if not strategy:
                 return {"success": False, "message": "Strategy not found"}
             
             strategy.status = "paused"
+            strategy.updated_at = datetime.now(timezone.utc)
             session.add(strategy)
-            session.commit()
+            await session.commit()
+            registry.remove(strategy_id)
             
             return {
                 "success": True,
@@ -121,6 +142,80 @@ try:
                 "message": f"Strategy '{strategy.name}' has been paused"
             }
     
+    def _bulk_result(results: list):
+        failed = [{"index": r["index"], "id": r["id"], "error": r["error"]} for r in results if not r["ok"]]
+        return {
+            "success": not failed,
+            "succeeded": len(results) - len(failed),
+            "strategy_ids": [r["id"] for r in results if r["ok"]],
+            "failed": failed
+        }
+    
+    @mcp.tool()
+    async def mcp_create_strategies(strategies: list, status: str = "draft"):
+        """Create many strategies in one transaction; each item takes the fields of mcp_create_strategy.
+        
+        With status="live" every valid strategy starts right away.
+        """
+        try:
+            async with async_session() as session:
+                return _bulk_result(await session.run_sync(create_strategies, strategies, status))
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+    
+    @mcp.tool()
+    async def mcp_set_strategies_status(strategy_ids: list, status: str):
+        """Set many strategies to live, paused or draft in one transaction"""
+        try:
+            async with async_session() as session:
+                return _bulk_result(await session.run_sync(set_statuses, strategy_ids, status))
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+    
+    @mcp.tool()
+    async def mcp_get_price(symbol: str, window: int = 0):
+        """Get the latest streamed price for a symbol, plus up to `window` recent ticks"""
+        tick = price_feed.tick(symbol)
+        if tick is None:
+            price_feed.watch(symbol)
+            return {"success": False, "message": f"No streamed price for {symbol} yet"}
+        
+        ts, px = price_feed.window(symbol, window)
+        return {
+            "success": True,
+            "symbol": symbol,
+            "price": tick[1],
+            "timestamp": tick[0],
+            "window": [{"timestamp": t, "price": p} for t, p in zip(ts.tolist(), px.tolist())]
+        }
+    
+    @mcp.tool()
+    async def mcp_optimize_strategy(bot_type: str, symbol: str, ranges: dict, params: dict = None,
+                                    samples: int = None, hours: int = 24 * 30, base_asset: str = "USDC"):
+        """Backtest a sweep of parameter ranges and return the Pareto-best sets (PnL vs. max drawdown)"""
+        try:
+            compile_params(bot_type, params or {})
+            param_sets, total = candidates(bot_type, params or {}, ranges, samples)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        if not param_sets:
+            return {"success": False, "message": f"None of the {total} parameter combinations is valid"}
+        
+        _, prices = await get_historical_prices(symbol, max(1, hours))
+        try:
+            prices = check_prices(prices)
+        except ValueError as e:
+            return {"success": False, "message": f"Price history for {symbol} cannot be backtested: {e}"}
+        result = None
+        async for event in optimize(bot_type, prices, param_sets, DEFAULT_HOLDINGS.get(base_asset, 0.0)):
+            result = event
+        return {
+            "success": True,
+            "evaluated": result["evaluated"],
+            "bars": len(prices),
+            "front": result["front"]
+        }
+    
     print("✅ MCP tools initialized successfully")
     
 except ImportError as e:
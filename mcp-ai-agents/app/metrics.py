@@ -0,0 +1,107 @@
+"""Minimal Prometheus instrumentation.
+
+Recording is a dict lookup plus a bisect, and nothing is formatted until
+`/metrics` is scraped, so instrumented paths pay next to nothing when no one
+is watching.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in list(self.values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, values)} {total}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _label_str(self.labels, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, values)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, values)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+tick_seconds = metrics.histogram(
+    "bitmax_tick_duration_seconds", "Wall time to price and run one batch of strategies", ["mode"])
+price_fetch_seconds = metrics.histogram(
+    "bitmax_price_fetch_seconds", "Upstream price request latency, per symbol in the request", ["symbol"])
+trade_execute_seconds = metrics.histogram(
+    "bitmax_trade_execute_seconds", "TradeExecutor.execute latency by phase: read (guarded balance updates), write, commit", ["phase"])
+bot_eval_seconds = metrics.histogram(
+    "bitmax_bot_eval_seconds", "Time to evaluate one strategy", ["bot_type"])
+kernel_eval_seconds = metrics.histogram(
+    "bitmax_kernel_eval_seconds", "Time to evaluate one (bot_type, symbol) group in a vectorized pass", ["bot_type"])
+settlement_seconds = metrics.histogram(
+    "bitmax_settlement_seconds", "Time to write one tick's batched trades and portfolios")
+trades_total = metrics.counter(
+    "bitmax_trades_total", "Trades executed", ["side"])
+trade_failures_total = metrics.counter(
+    "bitmax_trade_failures_total", "Trades rejected or failed", ["reason"])
+strategy_failures_total = metrics.counter(
+    "bitmax_strategy_failures_total", "Strategy evaluations that raised", ["bot_type"])
+skipped_ticks_total = metrics.counter(
+    "bitmax_skipped_ticks_total", "Scheduled runs skipped because the previous one overran", ["job"])
@@ -1,27 +1,93 @@
+import zlib
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Dict, Optional
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, String
+from sqlalchemy import JSON, Column, DateTime, Index, String
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON documents: JSONB on Postgres, JSON text on SQLite; dicts on the Python side
+JsonDoc = JSON().with_variant(JSONB(), "postgresql")
+
+class UtcDateTime(TypeDecorator):
+    """TIMESTAMP WITH TIME ZONE holding UTC; naive values are taken to be UTC already.
+
+    asyncpg rejects aware datetimes for a plain TIMESTAMP column, and SQLite
+    keeps no offset at all, so values go in as UTC and always come back aware.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    @staticmethod
+    def _utc(value: Optional[datetime]) -> Optional[datetime]:
+        if value is None:
+            return None
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+    def process_bind_param(self, value, dialect):
+        return self._utc(value)
+
+    def process_result_value(self, value, dialect):
+        return self._utc(value)
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _timestamp(nullable: bool = False) -> Column:
+    return Column(UtcDateTime, nullable=nullable)
+
+def hash_owner(owner: str) -> int:
+    """Stable 31-bit hash of an owner; sharded workers split strategies by `owner_hash % WORKER_SHARDS`"""
+    return zlib.crc32(owner.encode()) & 0x7FFFFFFF
 
 class Strategy(SQLModel, table=True):
+    # the registry's backstop sync polls `updated_at >= :hw` and counts `status = 'live'`
+    __table_args__ = (
+        Index("ix_strategy_updated_at", "updated_at"),
+        Index("ix_strategy_status", "status"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     owner: str
+    owner_hash: Optional[int] = Field(default=None, index=True)  # hash_owner(owner), set on insert
     bot_type: str = Field(sa_column=Column(String(20)))
     symbol: str
     base_asset: str = "USDC"
-    params_json: str = "{}"
+    params_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JsonDoc))
     status: str = Field(default="draft", sa_column=Column(String(20)))
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    interval_seconds: Optional[int] = None  # None runs on the global CRON_SECONDS cadence
+    cron: Optional[str] = None  # 5-field crontab, takes precedence over interval_seconds
+    created_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+    updated_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+DEFAULT_HOLDINGS = {"USDC": 10000.0}
 
 class Portfolio(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     owner: str
-    holdings_json: str = '{"USDC": 10000.0}'
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # legacy; balances live in Holding and init_db migrates this column
+    holdings_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JsonDoc))
+    event_seq: Optional[int] = 0  # sequence of the owner's last BalanceEvent
+    updated_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+class Holding(SQLModel, table=True):
+    __table_args__ = (Index("ix_holding_owner_asset", "owner", "asset", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    owner: str
+    asset: str = Field(index=True)
+    amount: float = 0.0
 
 class Trade(SQLModel, table=True):
+    # newest-first keyset pages: (filter, created_at, id) lets every listing read straight from an index
+    __table_args__ = (
+        Index("ix_trade_owner_created", "owner", "created_at", "id"),
+        Index("ix_trade_strategy_created", "strategy_id", "created_at", "id"),
+        Index("ix_trade_symbol_created", "symbol", "created_at", "id"),
+        Index("ix_trade_created", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     owner: str
     strategy_id: int
@@ -30,5 +96,41 @@ class Trade(SQLModel, table=True):
     price: float
     qty: float
     notional: float
-    meta_json: str = "{}"
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    meta_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JsonDoc))
+    created_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+class WorkerHeartbeat(SQLModel, table=True):
+    worker_id: str = Field(primary_key=True)
+    heartbeat_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+class ShardLease(SQLModel, table=True):
+    shard: int = Field(primary_key=True)
+    worker_id: Optional[str] = None
+    expires_at: Optional[datetime] = Field(default=None, sa_column=_timestamp(nullable=True))
+
+class BalanceEvent(SQLModel, table=True):
+    """Append-only record of one change to an owner's balances"""
+    __table_args__ = (Index("ix_balanceevent_owner_seq", "owner", "seq", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    owner: str
+    seq: int  # per-owner, gap-free
+    kind: str = Field(sa_column=Column(String(20)))  # "trade": changes are deltas, "set": absolute holdings
+    changes_json: Dict[str, float] = Field(default_factory=dict, sa_column=Column(JsonDoc))
+    trade_id: Optional[int] = None
+    created_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+class HoldingsSnapshot(SQLModel, table=True):
+    """Holdings of an owner right after their event `seq`"""
+    __table_args__ = (Index("ix_holdingssnapshot_owner_seq", "owner", "seq", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    owner: str
+    seq: int
+    holdings_json: Dict[str, float] = Field(default_factory=dict, sa_column=Column(JsonDoc))
+    created_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
+
+class LedgerCheckpoint(SQLModel, table=True):
+    id: int = Field(default=1, primary_key=True)  # single row
+    seq: int = 0  # last journal record whose effects are in the DB
+    updated_at: datetime = Field(default_factory=_now, sa_column=_timestamp())
@@ -0,0 +1,155 @@
+"""Parameter sweeps of the backtest across a process pool.
+
+The price series is copied once into a shared memory segment; workers attach
+to it by name and backtest batches of parameter sets against a zero-copy
+NumPy view, so only the small parameter dicts and result rows cross process
+boundaries. Results are folded into a Pareto front (highest PnL, lowest max
+drawdown) as batches finish, and every parameter set that enters the front
+is reported straight away.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+from app.bots import compile_params
+from app.config import OPTIMIZER_WORKERS, OPTIMIZER_BATCH_SIZE, OPTIMIZER_MAX_COMBINATIONS
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# worker side: shared segments attached so far, by name
+_segments: Dict[str, shared_memory.SharedMemory] = {}
+
+def _attach(name: str, length: int) -> np.ndarray:
+    shm = _segments.get(name)
+    if shm is None:
+        for old in list(_segments)[:-3]:  # keep the few most recent sweeps attached
+            _segments.pop(old).close()
+        # spawned workers share the parent's resource tracker, and the parent unlinks the segment
+        shm = shared_memory.SharedMemory(name=name)
+        _segments[name] = shm
+    return np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+
+def _evaluate_batch(shm_name: str, length: int, bot_type: str, batch: List[Dict[str, Any]],
+                    cash: float, qty: float) -> List[Tuple[Dict[str, Any], dict]]:
+    from app.backtest import run_backtest
+    prices = _attach(shm_name, length)
+    return [(params, run_backtest(bot_type, compile_params(bot_type, params), prices, cash, qty))
+            for params in batch]
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared worker pool, started on first use with spawned (not forked) workers"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=OPTIMIZER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def expand_ranges(ranges: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """{param: values}; a range is a list of values or {"min", "max", "steps"} (ints stay ints)"""
+    axes = {}
+    for name, spec in ranges.items():
+        if isinstance(spec, list):
+            values = spec
+        elif isinstance(spec, dict) and {"min", "max"} <= spec.keys():
+            steps = int(spec.get("steps", 10))
+            if steps < 1:
+                raise ValueError(f"{name}: steps must be at least 1")
+            values = np.linspace(spec["min"], spec["max"], steps).tolist() if steps > 1 else [spec["min"]]
+            if all(isinstance(spec[k], int) for k in ("min", "max")):
+                values = sorted({int(round(v)) for v in values})
+        else:
+            raise ValueError(f"{name}: expected a list of values or {{\"min\", \"max\", \"steps\"}}")
+        if not values:
+            raise ValueError(f"{name}: no values to try")
+        axes[name] = values
+    return axes
+
+def candidates(bot_type: str, base: Dict[str, Any], ranges: Dict[str, Any],
+               samples: Optional[int] = None, seed: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Valid parameter sets of the full grid, or of a random sample of it; also returns the grid size"""
+    if samples is not None and samples < 1:
+        raise ValueError("samples must be at least 1")
+    axes = expand_ranges(ranges)
+    names = list(axes)
+    sizes = [len(axes[n]) for n in names]
+    total = int(np.prod(sizes)) if sizes else 1
+    if samples is not None and samples < total:
+        # decode sampled flat indices instead of materializing the whole product
+        picks = []
+        for index in sorted(random.Random(seed).sample(range(total), samples)):
+            combo = []
+            for size in reversed(sizes):
+                index, i = divmod(index, size)
+                combo.append(i)
+            picks.append(tuple(reversed(combo)))
+    else:
+        if total > OPTIMIZER_MAX_COMBINATIONS:
+            raise ValueError(f"{total} combinations exceed OPTIMIZER_MAX_COMBINATIONS ({OPTIMIZER_MAX_COMBINATIONS}), "
+                             f"narrow the ranges or set samples")
+        picks = itertools.product(*(range(s) for s in sizes))
+
+    valid = []
+    for combo in picks:
+        params = dict(base, **{n: axes[n][i] for n, i in zip(names, combo)})
+        try:
+            compile_params(bot_type, params)
+        except ValueError:
+            continue  # e.g. lower above upper
+        valid.append(params)
+    return valid, total
+
+def _dominates(a: dict, b: dict) -> bool:
+    return (a["pnl"] >= b["pnl"] and a["max_drawdown_pct"] <= b["max_drawdown_pct"]
+            and (a["pnl"] > b["pnl"] or a["max_drawdown_pct"] < b["max_drawdown_pct"]))
+
+def _summary(params: Dict[str, Any], result: dict) -> dict:
+    return {"params": params, "pnl": result["pnl"], "pnl_pct": result["pnl_pct"],
+            "max_drawdown_pct": result["max_drawdown_pct"], "turnover": result["turnover"],
+            "trade_count": result["trade_count"]}
+
+async def optimize(bot_type: str, prices: np.ndarray, param_sets: List[Dict[str, Any]],
+                   cash: float, qty: float = 0.0) -> AsyncIterator[dict]:
+    """Backtest every parameter set in the pool.
+
+    Yields {"event": "pareto", ...} whenever a set enters the current Pareto
+    front, then a final {"event": "done", "front": [...]} sorted by PnL.
+    """
+    from app.backtest import check_prices
+    prices = check_prices(prices)
+    shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+        loop = asyncio.get_running_loop()
+        pool = get_pool()
+        futures = [loop.run_in_executor(pool, _evaluate_batch, shm.name, len(prices), bot_type,
+                                        param_sets[i:i + OPTIMIZER_BATCH_SIZE], cash, qty)
+                   for i in range(0, len(param_sets), OPTIMIZER_BATCH_SIZE)]
+        front: List[dict] = []
+        evaluated = 0
+        try:
+            for done in asyncio.as_completed(futures):
+                for params, result in await done:
+                    evaluated += 1
+                    point = _summary(params, result)
+                    if any(_dominates(f, point) or (f["pnl"], f["max_drawdown_pct"]) ==
+                           (point["pnl"], point["max_drawdown_pct"]) for f in front):
+                        continue
+                    front = [f for f in front if not _dominates(point, f)] + [point]
+                    yield {"event": "pareto", "evaluated": evaluated, **point}
+        finally:
+            for future in futures:
+                future.cancel()
+        front.sort(key=lambda f: f["pnl"], reverse=True)
+        yield {"event": "done", "evaluated": evaluated, "front": front}
+    finally:
+        shm.close()
+        shm.unlink()
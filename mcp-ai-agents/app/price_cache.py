@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+Loader = Callable[[List[str]], Awaitable[Dict[str, float]]]
+
+class PriceCache:
+    """In-process LRU price cache with single-flight loads and stale-while-revalidate.
+
+    Entries younger than `ttl` are served directly. Entries younger than
+    `ttl + stale_ttl` are served as-is while one background refresh runs.
+    Concurrent callers asking for a key that is already being loaded wait on
+    the same in-flight future instead of issuing another upstream request.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_size: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (price, fetched_at)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: set = set()
+        self._epoch = 0  # bumped by clear() so loads started before it do not repopulate the cache
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, key: str, loader: Loader) -> float:
+        prices, errors = await self._get_many([key], loader)
+        if key in errors:
+            raise errors[key]
+        return prices[key]
+
+    async def get_many(self, keys: Iterable[str], loader: Loader) -> Dict[str, float]:
+        """Prices for every key that could be resolved; failed keys are left out"""
+        prices, _ = await self._get_many(keys, loader)
+        return prices
+
+    async def _get_many(self, keys: Iterable[str], loader: Loader):
+        now = time.monotonic()
+        prices: Dict[str, float] = {}
+        pending: Dict[str, asyncio.Future] = {}
+        to_load, to_refresh = [], []
+
+        for key in dict.fromkeys(keys):
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry else None
+            if entry and age <= self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                prices[key] = entry[0]
+            elif entry and age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                prices[key] = entry[0]
+                if key not in self._inflight:
+                    to_refresh.append(key)
+            elif key in self._inflight:
+                self.coalesced += 1
+                pending[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                to_load.append(key)
+
+        if to_refresh:
+            self._start(to_refresh, loader)
+        if to_load:
+            pending.update(self._start(to_load, loader))
+
+        errors: Dict[str, Exception] = {}
+        for key, fut in pending.items():
+            try:
+                # shield so a cancelled caller does not cancel the load other callers share
+                prices[key] = await asyncio.shield(fut)
+            except Exception as e:
+                errors[key] = e
+        return prices, errors
+
+    def _start(self, keys: List[str], loader: Loader) -> Dict[str, asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._inflight.update(futures)
+        task = asyncio.create_task(self._load(futures, loader, self._epoch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return futures
+
+    async def _load(self, futures: Dict[str, asyncio.Future], loader: Loader, epoch: int):
+        error = None
+        try:
+            loaded = await loader(list(futures))
+        except Exception as e:
+            loaded, error = {}, e
+
+        now = time.monotonic()
+        for key, fut in futures.items():
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            if key in loaded:
+                if epoch == self._epoch:
+                    self.put(key, loaded[key], now)
+                fut.set_result(loaded[key])
+            else:
+                fut.set_exception(error or LookupError(f"No price for {key}"))
+                fut.exception()  # background refreshes have no waiter; mark as retrieved
+
+    def put(self, key: str, price: float, fetched_at: float = None):
+        self._entries[key] = (price, time.monotonic() if fetched_at is None else fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry and forget in-flight loads; callers already waiting still get their result"""
+        self._entries.clear()
+        self._inflight.clear()
+        self._epoch += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+import numpy as np
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlmodel import select
+from app.db import async_session
+from app.models import Strategy
+from app.defi import _coin_id, _load_prices, price_cache
+from app.config import PRICE_FEED_ENABLED, PRICE_FEED_SECONDS, PRICE_FEED_WINDOW
+
+logger = logging.getLogger(__name__)
+
+class RingBuffer:
+    """Fixed-size ring of (timestamp, price) ticks for one symbol"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.px = np.zeros(capacity, dtype=np.float64)
+        self.count = 0  # ticks ever appended; the write slot is count % capacity
+
+    def append(self, ts: float, px: float):
+        i = self.count % self.capacity
+        self.ts[i] = ts
+        self.px[i] = px
+        self.count += 1
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        if not self.count:
+            return None
+        i = (self.count - 1) % self.capacity
+        return float(self.ts[i]), float(self.px[i])
+
+    def window(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to the last `n` ticks, oldest first"""
+        size = min(self.count, self.capacity)
+        n = size if n is None else max(0, min(n, size))
+        end = self.count % self.capacity
+        idx = (np.arange(end - n, end)) % self.capacity
+        return self.ts[idx], self.px[idx]
+
+class PriceFeed:
+    """Polls the price source for every live symbol and keeps recent ticks in memory.
+
+    Readers (bots, MCP tools, the prices API) only touch the ring buffers, so
+    reading a price never waits on upstream. Symbols are case-insensitive,
+    as in the price store: every entry point maps them to one key.
+    """
+
+    def __init__(self, interval: float, capacity: int):
+        self.interval = interval
+        self.capacity = capacity
+        self.buffers: Dict[str, RingBuffer] = {}
+        self.watched: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(symbol: str) -> str:
+        return symbol.strip().lower()
+
+    def watch(self, symbol: str):
+        """Keep polling a symbol even when no live strategy references it"""
+        self.watched.add(self._key(symbol))
+
+    async def _symbols(self) -> Set[str]:
+        async with async_session() as session:
+            live = (await session.exec(select(Strategy.symbol).where(Strategy.status == "live").distinct())).all()
+        return {self._key(s) for s in live} | self.watched
+
+    async def poll_once(self) -> int:
+        symbols = await self._symbols()
+        if not symbols:
+            return 0
+        by_coin = {_coin_id(s): s for s in symbols}
+        prices = await _load_prices(list(by_coin))
+        now = time.time()
+        for cid, price in prices.items():
+            symbol = by_coin[cid]
+            if symbol not in self.buffers:
+                self.buffers[symbol] = RingBuffer(self.capacity)
+            self.buffers[symbol].append(now, price)
+            price_cache.put(cid, price)  # on-demand callers see the polled price too
+        return len(prices)
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Price feed poll failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def tick(self, symbol: str) -> Optional[Tuple[float, float]]:
+        """Latest (timestamp, price) tick for a symbol"""
+        buf = self.buffers.get(self._key(symbol))
+        return buf.latest() if buf else None
+
+    def latest(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        tick = self.tick(symbol)
+        if tick is None or (max_age is not None and time.time() - tick[0] > max_age):
+            return None
+        return tick[1]
+
+    def snapshot(self, symbols: Iterable[str], max_age: Optional[float] = None) -> Dict[str, float]:
+        """Latest price of every symbol with a fresh enough tick"""
+        prices = {}
+        for symbol in symbols:
+            price = self.latest(symbol, max_age)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def window(self, symbol: str, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        buf = self.buffers.get(self._key(symbol))
+        if not buf:
+            return np.empty(0), np.empty(0)
+        return buf.window(n)
+
+price_feed = PriceFeed(interval=PRICE_FEED_SECONDS, capacity=PRICE_FEED_WINDOW)
+
+def start_price_feed():
+    """Start the background price feed task"""
+    if not PRICE_FEED_ENABLED:
+        logger.info("Price feed disabled")
+        return
+    if price_feed._task is None or price_feed._task.done():
+        price_feed._task = asyncio.create_task(price_feed.run())
+        logger.info(f"Price feed started - polling every {PRICE_FEED_SECONDS} seconds")
+
+def stop_price_feed():
+    """Stop the background price feed task"""
+    if price_feed._task is not None:
+        price_feed._task.cancel()
+        price_feed._task = None
+        logger.info("Price feed stopped")
@@ -0,0 +1,154 @@
+import abc
+import asyncio
+import csv
+import logging
+import time
+import httpx
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLAMA_URL = "https://coins.llama.fi"
+LOCAL_URL = "http://127.0.0.1:9100"
+
+def _coin_id(symbol: str) -> str:
+    return f"coin:{symbol}"
+
+class PriceSource(abc.ABC):
+    """Where prices come from. Everything in app.defi prices through one of these."""
+
+    @abc.abstractmethod
+    async def current(self, coin_ids: List[str]) -> Dict[str, float]:
+        """Latest price per coin id; unknown coins are left out"""
+
+    @abc.abstractmethod
+    async def chart(self, coin_id: str, start: int) -> List[Dict[str, float]]:
+        """[{"timestamp", "price"}] points from `start` (unix seconds) up to now"""
+
+    async def close(self):
+        pass
+
+class DefiLlamaSource(PriceSource):
+    """coins.llama.fi, batching current prices into comma-joined requests"""
+
+    def __init__(self, base_url: str = LLAMA_URL, timeout: float = 25, chunk_size: int = 100):
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.http_client = httpx.AsyncClient(timeout=timeout)
+
+    async def _fetch_chunk(self, coin_ids: List[str]) -> Dict[str, float]:
+        url = f"{self.base_url}/prices/current/{','.join(coin_ids)}"
+        r = await self.http_client.get(url)
+        r.raise_for_status()
+        coins = r.json().get("coins", {})
+        return {cid: float(coins[cid]["price"]) for cid in coin_ids if cid in coins}
+
+    async def current(self, coin_ids: List[str]) -> Dict[str, float]:
+        chunks = [coin_ids[i:i + self.chunk_size] for i in range(0, len(coin_ids), self.chunk_size)]
+        results = await asyncio.gather(*(self._fetch_chunk(c) for c in chunks), return_exceptions=True)
+
+        prices: Dict[str, float] = {}
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures and len(failures) == len(results):
+            raise failures[0]
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Price fetch failed for {len(chunk)} coins: {result}")
+                continue
+            prices.update(result)
+        return prices
+
+    async def chart(self, coin_id: str, start: int) -> List[Dict[str, float]]:
+        url = f"{self.base_url}/chart/{coin_id}?start={start}"
+        r = await self.http_client.get(url)
+        r.raise_for_status()
+        return r.json().get("coins", {}).get(coin_id, {}).get("prices", [])
+
+    async def close(self):
+        await self.http_client.aclose()
+
+class LocalHTTPSource(DefiLlamaSource):
+    """A DefiLlama-compatible server on this box, e.g. `uvicorn app.price_stub:app --port 9100`"""
+
+    def __init__(self, base_url: str = LOCAL_URL, timeout: float = 5, chunk_size: int = 100):
+        super().__init__(base_url=base_url, timeout=timeout, chunk_size=chunk_size)
+
+class ReplaySource(PriceSource):
+    """Replays a recorded price file on a clock running `speed` times faster than real time.
+
+    The file is CSV with `timestamp,coin,price` rows (header optional); `coin`
+    is a coin id or a bare symbol. Timestamps handed out by `chart` are shifted
+    so the current replay position reads as "now", which keeps hour-based
+    windows meaningful. With `loop` the recording restarts when it runs out.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.series: Dict[str, Tuple[np.ndarray, np.ndarray]] = self._load(path)
+        starts = [ts[0] for ts, _ in self.series.values() if len(ts)]
+        ends = [ts[-1] for ts, _ in self.series.values() if len(ts)]
+        self.rec_start = min(starts) if starts else 0
+        self.rec_end = max(ends) if ends else 0
+        self.started_at = time.time()
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        rows: Dict[str, List[Tuple[int, float]]] = {}
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 3 or not row[0].strip().lstrip("-").isdigit():
+                    continue  # header or blank line
+                coin = row[1].strip()
+                coin = coin if ":" in coin else _coin_id(coin)
+                rows.setdefault(coin, []).append((int(row[0]), float(row[2])))
+        series = {}
+        for coin, points in rows.items():
+            points.sort()
+            series[coin] = (np.array([p[0] for p in points], dtype=np.int64),
+                            np.array([p[1] for p in points], dtype=np.float64))
+        return series
+
+    def clock(self) -> float:
+        """Current position in recording time"""
+        elapsed = (time.time() - self.started_at) * self.speed
+        span = self.rec_end - self.rec_start
+        if self.loop and span > 0:
+            elapsed %= span
+        return self.rec_start + elapsed
+
+    async def current(self, coin_ids: List[str]) -> Dict[str, float]:
+        now = self.clock()
+        prices = {}
+        for cid in coin_ids:
+            if cid not in self.series:
+                continue
+            ts, px = self.series[cid]
+            i = int(np.searchsorted(ts, now, side="right")) - 1
+            if i >= 0:
+                prices[cid] = float(px[i])
+        return prices
+
+    async def chart(self, coin_id: str, start: int) -> List[Dict[str, float]]:
+        if coin_id not in self.series:
+            return []
+        now = self.clock()
+        shift = time.time() - now
+        ts, px = self.series[coin_id]
+        lo = int(np.searchsorted(ts, start - shift, side="left"))
+        hi = int(np.searchsorted(ts, now, side="right"))
+        return [{"timestamp": int(t + shift), "price": float(p)} for t, p in zip(ts[lo:hi], px[lo:hi])]
+
+def make_price_source(kind: str, url: Optional[str] = None, replay_file: Optional[str] = None,
+                      replay_speed: float = 1.0, chunk_size: int = 100) -> PriceSource:
+    if kind == "defillama":
+        return DefiLlamaSource(base_url=url or LLAMA_URL, chunk_size=chunk_size)
+    if kind == "local":
+        return LocalHTTPSource(base_url=url or LOCAL_URL, chunk_size=chunk_size)
+    if kind == "replay":
+        if not replay_file:
+            raise ValueError("PRICE_REPLAY_FILE must be set for the replay price source")
+        return ReplaySource(replay_file, speed=replay_speed)
+    raise ValueError(f"Unknown price source: {kind}")
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import re
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+TS_DTYPE = np.dtype("<i8")
+PX_DTYPE = np.dtype("<f8")
+
+class PriceStore:
+    """Per-symbol price history kept as two append-only binary columns on disk.
+
+    `<symbol>.ts` holds int64 unix timestamps and `<symbol>.px` the float64
+    prices, both sorted by time. Reads memory-map the files, so windows
+    returned by `window` are NumPy views into the page cache, not copies.
+    Symbols are case-insensitive: every entry point maps them to one key,
+    which names the files as well as the cached maps and locks.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._covered: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(symbol: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", symbol.lower())
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, key)
+        return base + ".ts", base + ".px"
+
+    def lock(self, symbol: str) -> asyncio.Lock:
+        """Serializes refreshes of one symbol so concurrent readers fetch each gap once"""
+        symbol = self._key(symbol)
+        if symbol not in self._locks:
+            self._locks[symbol] = asyncio.Lock()
+        return self._locks[symbol]
+
+    def series(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Full stored (timestamps, prices) columns as read-only memory maps"""
+        symbol = self._key(symbol)
+        if symbol in self._maps:
+            return self._maps[symbol]
+        ts_path, px_path = self._paths(symbol)
+        # a crash between the two column writes can leave one column longer; trust the shorter
+        n = min(
+            os.path.getsize(ts_path) // TS_DTYPE.itemsize if os.path.exists(ts_path) else 0,
+            os.path.getsize(px_path) // PX_DTYPE.itemsize if os.path.exists(px_path) else 0,
+        )
+        if n == 0:
+            cols = (np.empty(0, TS_DTYPE), np.empty(0, PX_DTYPE))
+        else:
+            cols = (np.memmap(ts_path, dtype=TS_DTYPE, mode="r", shape=(n,)),
+                    np.memmap(px_path, dtype=PX_DTYPE, mode="r", shape=(n,)))
+        self._maps[symbol] = cols
+        return cols
+
+    def first_timestamp(self, symbol: str) -> Optional[int]:
+        ts, _ = self.series(symbol)
+        return int(ts[0]) if len(ts) else None
+
+    def covered_from(self, symbol: str) -> Optional[int]:
+        """Earliest time history has been fetched from (the first point may lie later)"""
+        symbol = self._key(symbol)
+        return self._covered.get(symbol, self.first_timestamp(symbol))
+
+    def mark_covered(self, symbol: str, start: int):
+        symbol = self._key(symbol)
+        covered = self.covered_from(symbol)
+        self._covered[symbol] = start if covered is None else min(covered, start)
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        ts, _ = self.series(symbol)
+        return int(ts[-1]) if len(ts) else None
+
+    def window(self, symbol: str, start: int, end: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, prices) views for start <= t < end"""
+        ts, px = self.series(symbol)
+        lo = int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="left"))
+        return ts[lo:hi], px[lo:hi]
+
+    def merge(self, symbol: str, timestamps, prices) -> int:
+        """Add points to a symbol's history; returns how many new points were stored.
+
+        Points newer than the last stored one are appended in place. Anything
+        older (a backfill) triggers a one-off rewrite of both columns.
+        """
+        ts_new = np.asarray(timestamps, dtype=TS_DTYPE)
+        px_new = np.asarray(prices, dtype=PX_DTYPE)
+        if len(ts_new) == 0:
+            return 0
+        order = np.argsort(ts_new, kind="stable")
+        ts_new, px_new = ts_new[order], px_new[order]
+
+        symbol = self._key(symbol)
+        ts_old, px_old = self.series(symbol)
+        ts_path, px_path = self._paths(symbol)
+        os.makedirs(self.root, exist_ok=True)  # on first write, not when the store is created
+        self._maps.pop(symbol, None)
+
+        if len(ts_old) == 0 or ts_new[0] > ts_old[-1]:
+            keep = np.concatenate(([True], ts_new[1:] != ts_new[:-1]))
+            ts_new, px_new = ts_new[keep], px_new[keep]
+            for path, col, n_old in ((px_path, px_new, len(px_old)), (ts_path, ts_new, len(ts_old))):
+                with open(path, "ab") as f:
+                    f.truncate(n_old * col.dtype.itemsize)  # drop a torn tail from an interrupted append
+                    f.write(col.tobytes())
+            return len(ts_new)
+
+        ts_all = np.concatenate((ts_old, ts_new))
+        px_all = np.concatenate((px_old, px_new))
+        ts_merged, idx = np.unique(ts_all, return_index=True)  # keeps stored points on conflict
+        px_merged = px_all[idx]
+        # write aside and swap in, so maps still held by readers keep their old file
+        for path, col in ((px_path, px_merged), (ts_path, ts_merged)):
+            with open(path + ".new", "wb") as f:
+                f.write(col.tobytes())
+            os.replace(path + ".new", path)
+        return len(ts_merged) - len(ts_old)
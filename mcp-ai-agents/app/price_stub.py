@@ -0,0 +1,26 @@
+"""Local DefiLlama stand-in for offline runs.
+
+Serves `/prices/current/{coins}` and `/chart/{coin}` in the coins.llama.fi
+response shape from a recorded price file, so the app can be pointed at it
+with PRICE_SOURCE=local:
+
+    PRICE_REPLAY_FILE=prices.csv PRICE_REPLAY_SPEED=60 uvicorn app.price_stub:app --port 9100
+"""
+from fastapi import FastAPI
+from app.config import PRICE_REPLAY_FILE, PRICE_REPLAY_SPEED
+from app.price_sources import ReplaySource
+
+app = FastAPI(title="Local price stand-in")
+
+source = ReplaySource(PRICE_REPLAY_FILE, speed=PRICE_REPLAY_SPEED) if PRICE_REPLAY_FILE else None
+
+@app.get("/prices/current/{coins}")
+async def current_prices(coins: str):
+    prices = await source.current(coins.split(",")) if source else {}
+    now = int(source.clock()) if source else 0
+    return {"coins": {cid: {"price": price, "timestamp": now, "confidence": 1.0} for cid, price in prices.items()}}
+
+@app.get("/chart/{coin}")
+async def chart(coin: str, start: int = 0):
+    points = await source.chart(coin, start) if source else []
+    return {"coins": {coin: {"prices": points}}}
@@ -0,0 +1,163 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.models import Strategy, hash_owner
+from app.config import REGISTRY_SYNC_MARGIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class LiveStrategy:
+    """Detached copy of a live Strategy row with its params already decoded"""
+
+    __slots__ = ("id", "name", "owner", "bot_type", "symbol", "base_asset",
+                 "params", "compiled", "interval_seconds", "cron", "updated_at")
+
+    def __init__(self, st: Strategy, params: Dict[str, Any], compiled: Any = None):
+        self.id = st.id
+        self.name = st.name
+        self.owner = st.owner
+        self.bot_type = st.bot_type
+        self.symbol = st.symbol
+        self.base_asset = st.base_asset
+        self.params = params
+        self.compiled = compiled  # the bot type's validated params object
+        self.interval_seconds = st.interval_seconds
+        self.cron = st.cron
+        self.updated_at = st.updated_at
+
+    @classmethod
+    def from_row(cls, st: Strategy) -> "LiveStrategy":
+        """Decode and check params; raises ValueError for anything a bot could not run"""
+        params = st.params_json if st.params_json is not None else {}
+        if not isinstance(params, dict):
+            raise ValueError("params must be a JSON object")
+        from app.bots import compile_params
+        return cls(st, params, compile_params(st.bot_type, params))
+
+Listener = Callable[[int, Optional[LiveStrategy]], None]
+
+class StrategyRegistry:
+    """In-memory set of live strategies, kept current by the write paths.
+
+    Routes and MCP tools call `upsert`/`remove` after they commit. `sync` is the
+    backstop for writes made by other processes: it re-reads only rows whose
+    `updated_at` is within `margin_seconds` of the high-water mark, and falls
+    back to a full reload when the live count disagrees (which is how
+    deletions elsewhere show up). `updated_at` comes from the writer's clock,
+    so a write can commit after a newer row was synced while carrying an
+    older timestamp; the margin catches it, and rows whose timestamp has not
+    moved since they were last applied are skipped.
+
+    A sharded worker narrows the registry with `set_shards`; every query then
+    reads only strategies of owners whose `owner_hash % shard_count` is in
+    its shards, so a worker never loads or decodes the rest.
+    """
+
+    def __init__(self, margin_seconds: float = REGISTRY_SYNC_MARGIN_SECONDS):
+        self.margin = timedelta(seconds=margin_seconds)
+        self.strategies: Dict[int, LiveStrategy] = {}
+        self.invalid: Set[int] = set()  # live in the DB but with params no bot can run
+        self.high_water: Optional[datetime] = None
+        self._applied: Dict[int, datetime] = {}  # updated_at of the row last applied, per id
+        self.loaded = False
+        self.last_sync = 0.0
+        self.shards: Optional[Set[int]] = None  # None: every strategy
+        self.shard_count = 1
+        self._listeners: List[Listener] = []
+
+    def set_shards(self, shards: Optional[Set[int]], shard_count: int = 1):
+        """Track only the given owner shards; a change takes effect with a full reload on the next sync"""
+        shards = set(shards) if shards is not None else None
+        if shards != self.shards or shard_count != self.shard_count:
+            self.shards, self.shard_count = shards, shard_count
+            self.loaded = False
+
+    def owns(self, owner: str) -> bool:
+        return self.shards is None or hash_owner(owner) % self.shard_count in self.shards
+
+    def _scoped(self, query):
+        if self.shards is None:
+            return query
+        return query.where((Strategy.owner_hash % self.shard_count).in_(self.shards))
+
+    def subscribe(self, listener: Listener):
+        """Call `listener(id, live_strategy_or_None)` on every change"""
+        self._listeners.append(listener)
+
+    def _notify(self, sid: int, entry: Optional[LiveStrategy]):
+        for listener in self._listeners:
+            try:
+                listener(sid, entry)
+            except Exception as e:
+                logger.error(f"Registry listener failed for strategy {sid}: {e}")
+
+    def _bump(self, updated_at: Optional[datetime]):
+        if updated_at is not None and (self.high_water is None or updated_at > self.high_water):
+            self.high_water = updated_at
+
+    def upsert(self, st: Strategy):
+        """Track a strategy after a write; drops it unless its status is live"""
+        self._applied[st.id] = st.updated_at
+        if st.status != "live" or not self.owns(st.owner):
+            self.remove(st.id)
+            return
+        try:
+            entry = LiveStrategy.from_row(st)
+        except ValueError as e:
+            logger.error(f"Strategy {st.id} ({st.name}) not scheduled: {e}")
+            self.remove(st.id)
+            self.invalid.add(st.id)
+            return
+        self.invalid.discard(st.id)
+        self.strategies[st.id] = entry
+        self._notify(st.id, entry)
+
+    def remove(self, sid: int):
+        self.invalid.discard(sid)
+        if self.strategies.pop(sid, None) is not None:
+            self._notify(sid, None)
+
+    def load(self, session: Session):
+        """Full reload of every live strategy in this registry's shards"""
+        rows = session.exec(self._scoped(select(Strategy).where(Strategy.status == "live"))).all()
+        for sid in (set(self.strategies) | self.invalid) - {st.id for st in rows}:
+            self.remove(sid)
+        for st in rows:
+            self.upsert(st)
+        newest = session.exec(select(func.max(Strategy.updated_at))).one()
+        self.high_water = newest
+        self.loaded = True
+        self.last_sync = time.monotonic()
+
+    def sync(self, session: Session):
+        """Cheap consistency backstop against writes this process did not see"""
+        if not self.loaded or self.high_water is None:
+            self.load(session)
+            return
+        floor = self.high_water - self.margin
+        changed = session.exec(self._scoped(select(Strategy).where(Strategy.updated_at >= floor))).all()
+        for st in changed:
+            if self._applied.get(st.id) != st.updated_at:
+                self.upsert(st)
+            self._bump(st.updated_at)
+        self._applied = {sid: at for sid, at in self._applied.items() if at is not None and at >= floor}
+        live_count = session.exec(self._scoped(select(func.count()).select_from(Strategy)
+                                               .where(Strategy.status == "live"))).one()
+        if live_count != len(self.strategies) + len(self.invalid):
+            self.load(session)
+        self.last_sync = time.monotonic()
+
+    def maybe_sync(self, session: Session, max_age: float):
+        if not self.loaded or time.monotonic() - self.last_sync >= max_age:
+            self.sync(session)
+
+    def get(self, sid: int) -> Optional[LiveStrategy]:
+        return self.strategies.get(sid)
+
+    def live(self) -> List[LiveStrategy]:
+        return list(self.strategies.values())
+
+registry = StrategyRegistry()
@@ -1,56 +1,172 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Optional
 from sqlmodel import Session, select
-from app.db import get_session
-from app.models import Portfolio
-from app.schemas import PortfolioOut, PortfolioUpdateIn
-import json
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import engine, get_async_session
+from app.models import Holding, Portfolio
+from app.holdings import ensure_portfolio, get_holdings, holdings_for, set_holdings
+from app.ledger import ledger
+from app.events import rebuild
+from app.valuation import Valuator
+from app.schemas import PortfolioAtOut, PortfolioAuditOut, PortfolioOut, PortfolioUpdateIn, PortfolioValuationOut
+from app.config import EXPORT_BATCH_SIZE
 from datetime import datetime, timezone
+import csv
+import io
+import json
+import orjson
 
 router = APIRouter(prefix="/api/portfolio", tags=["portfolio"])
 
-def _to_out(p: Portfolio) -> PortfolioOut:
-    return PortfolioOut(
-        owner=p.owner,
-        holdings=json.loads(p.holdings_json),
-        updated_at=p.updated_at.isoformat()
-    )
+def _row(p: Portfolio, holdings: dict) -> dict:
+    """PortfolioOut's fields as plain data; orjson encodes updated_at exactly like isoformat()"""
+    return {"owner": p.owner, "holdings": holdings, "updated_at": p.updated_at}
+
+def _ledger_row(owner: str) -> dict:
+    """Ledger mode: balances come from memory, which is always ahead of the DB"""
+    return {"owner": owner, "holdings": ledger.portfolio(owner), "updated_at": ledger.updated_at[owner]}
+
+def _to_out(p: Portfolio, holdings: dict) -> PortfolioOut:
+    return PortfolioOut(**{**_row(p, holdings), "updated_at": p.updated_at.isoformat()})
+
+def _ledger_out(owner: str) -> PortfolioOut:
+    return PortfolioOut(**{**_ledger_row(owner), "updated_at": ledger.updated_at[owner].isoformat()})
+
+def _holding_rows(owner: Optional[str]) -> Iterator[list]:
+    """Batches of (owner, asset, amount) in owner order, from memory in ledger mode or a server-side cursor"""
+    if ledger.active:
+        owners = [owner] if owner is not None else sorted(ledger.owners())
+        rows = [(o, asset, amount) for o in owners for asset, amount in (ledger.portfolio(o) or {}).items()]
+        for i in range(0, len(rows), EXPORT_BATCH_SIZE):
+            yield rows[i:i + EXPORT_BATCH_SIZE]
+        return
+    query = select(Holding.owner, Holding.asset, Holding.amount)
+    if owner is not None:
+        query = query.where(Holding.owner == owner)
+    with Session(engine) as session:
+        result = session.execute(query.order_by(Holding.owner, Holding.asset)
+                                 .execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+
+def _portfolios_ndjson(owner: Optional[str]) -> Iterator[str]:
+    """One {"owner", "holdings"} line per owner; an owner's rows may span batches"""
+    current, holdings = None, {}
+    for batch in _holding_rows(owner):
+        lines = []
+        for row_owner, asset, amount in batch:
+            if row_owner != current:
+                if current is not None:
+                    lines.append(json.dumps({"owner": current, "holdings": holdings}) + "\n")
+                current, holdings = row_owner, {}
+            holdings[asset] = amount
+        if lines:
+            yield "".join(lines)
+    if current is not None:
+        yield json.dumps({"owner": current, "holdings": holdings}) + "\n"
+
+def _portfolios_csv(owner: Optional[str]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(("owner", "asset", "amount"))
+    for batch in _holding_rows(owner):
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+@router.get("/export")
+def export_portfolios(format: str = "ndjson", owner: Optional[str] = None):
+    """Stream every portfolio's balances as NDJSON (one owner per line) or CSV (one asset per line)"""
+    if format == "csv":
+        return StreamingResponse(_portfolios_csv(owner), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="portfolios.csv"'})
+    if format != "ndjson":
+        raise HTTPException(400, "format must be 'ndjson' or 'csv'")
+    return StreamingResponse(_portfolios_ndjson(owner), media_type="application/x-ndjson")
 
 @router.get("/{owner}", response_model=PortfolioOut)
-def get_portfolio(owner: str, session: Session = Depends(get_session)):
+async def get_portfolio(owner: str, session: AsyncSession = Depends(get_async_session)):
     """Get portfolio for a specific owner"""
-    p = session.exec(select(Portfolio).where(Portfolio.owner == owner)).first()
+    if ledger.active:
+        ledger.create(owner)
+        return _ledger_out(owner)
+    p = (await session.exec(select(Portfolio).where(Portfolio.owner == owner))).first()
     if not p:
         # Create default portfolio if it doesn't exist
-        p = Portfolio(owner=owner, holdings_json='{"USDC": 10000.0}')
-        session.add(p)
-        session.commit()
-        session.refresh(p)
-    return _to_out(p)
+        p = await session.run_sync(ensure_portfolio, owner)
+        await session.commit()
+        await session.refresh(p)
+    return _to_out(p, await session.run_sync(get_holdings, owner) or {})
+
+@router.get("/{owner}/at", response_model=PortfolioAtOut)
+async def get_portfolio_at(owner: str, at: Optional[datetime] = None, session: AsyncSession = Depends(get_async_session)):
+    """Rebuild a portfolio as of `at` (default: now) from balance events"""
+    if at is not None and at.tzinfo is not None:
+        at = at.astimezone(timezone.utc)
+    state = await session.run_sync(rebuild, owner, at)
+    if state is None:
+        raise HTTPException(404, "No balance history for this owner at that time")
+    as_of = state.pop("as_of")
+    return PortfolioAtOut(owner=owner, as_of=as_of.isoformat() if as_of else None, **state)
+
+@router.get("/{owner}/audit", response_model=PortfolioAuditOut)
+async def audit_portfolio(owner: str, session: AsyncSession = Depends(get_async_session)):
+    """Check stored balances against the ones rebuilt from balance events"""
+    state = await session.run_sync(rebuild, owner)
+    stored = await session.run_sync(get_holdings, owner)
+    if state is None or stored is None:
+        raise HTTPException(404, "Portfolio not found")
+    differences = {}
+    for asset in set(stored) | set(state["holdings"]):
+        a, b = stored.get(asset, 0.0), state["holdings"].get(asset, 0.0)
+        if abs(a - b) > 1e-9 * max(1.0, abs(a), abs(b)):
+            differences[asset] = {"holdings": a, "events": b}
+    return PortfolioAuditOut(owner=owner, consistent=not differences, seq=state["seq"], differences=differences)
+
+@router.get("/{owner}/valuation", response_model=PortfolioValuationOut)
+async def get_valuation(owner: str, base_asset: str = "USDC", session: AsyncSession = Depends(get_async_session)):
+    """Current value of every asset and the portfolio NAV, priced in one batch"""
+    holdings = ledger.portfolio(owner) if ledger.active else await session.run_sync(get_holdings, owner)
+    if holdings is None:
+        raise HTTPException(404, "Portfolio not found")
+    return await Valuator().value(owner, holdings, base_asset)
 
 @router.post("/{owner}", response_model=PortfolioOut)
-def set_portfolio(owner: str, body: PortfolioUpdateIn, session: Session = Depends(get_session)):
+async def set_portfolio(owner: str, body: PortfolioUpdateIn, session: AsyncSession = Depends(get_async_session)):
     """Set/update portfolio for a specific owner"""
-    p = session.exec(select(Portfolio).where(Portfolio.owner == owner)).first()
+    if ledger.active:
+        ledger.set(owner, body.holdings)
+        return _ledger_out(owner)
+    p = (await session.exec(select(Portfolio).where(Portfolio.owner == owner))).first()
     
     if p:
         # Update existing portfolio
-        p.holdings_json = json.dumps(body.holdings)
         p.updated_at = datetime.now(timezone.utc)
     else:
         # Create new portfolio
         p = Portfolio(
             owner=owner,
-            holdings_json=json.dumps(body.holdings),
             updated_at=datetime.now(timezone.utc)
         )
         session.add(p)
+    await session.run_sync(set_holdings, owner, body.holdings)
     
-    session.commit()
-    session.refresh(p)
-    return _to_out(p)
+    await session.commit()
+    await session.refresh(p)
+    return _to_out(p, await session.run_sync(get_holdings, owner))
 
 @router.get("/", response_model=list[PortfolioOut])
-def list_portfolios(session: Session = Depends(get_session)):
+async def list_portfolios(session: AsyncSession = Depends(get_async_session)):
     """List all portfolios"""
-    portfolios = session.exec(select(Portfolio)).all()
-    return [_to_out(p) for p in portfolios]
\ No newline at end of file
+    # straight to JSON bytes; PortfolioOut stays the documented schema
+    if ledger.active:
+        rows = [_ledger_row(owner) for owner in ledger.owners()]
+        return Response(orjson.dumps(rows), media_type="application/json")
+    portfolios = (await session.exec(select(Portfolio.owner, Portfolio.updated_at))).all()
+    holdings = await session.run_sync(holdings_for, {p.owner for p in portfolios})
+    rows = [_row(p, holdings.get(p.owner, {})) for p in portfolios]
+    return Response(orjson.dumps(rows), media_type="application/json")
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from app.defi import price_cache
+from app.price_feed import price_feed
+
+router = APIRouter(prefix="/api/prices", tags=["prices"])
+
+@router.get("/cache")
+def get_cache_stats():
+    """Price cache size and hit/miss/coalesce counters"""
+    return price_cache.stats()
+
+@router.get("/{symbol}")
+def get_price(symbol: str, window: int = 0):
+    """Latest streamed price for a symbol, plus up to `window` recent ticks"""
+    symbol = symbol.strip().lower()
+    tick = price_feed.tick(symbol)
+    if tick is None:
+        price_feed.watch(symbol)
+        raise HTTPException(404, f"No streamed price for {symbol} yet")
+    ts, px = price_feed.window(symbol, window)
+    return {
+        "symbol": symbol,
+        "price": tick[1],
+        "timestamp": tick[0],
+        "window": [{"timestamp": t, "price": p} for t, p in zip(ts.tolist(), px.tolist())],
+    }
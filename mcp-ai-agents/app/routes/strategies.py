@@ -1,111 +1,240 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.db import get_session
-from app.models import Strategy
-from app.schemas import CreateStrategyIn, StrategyOut, StrategyStatusUpdate
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_async_session
+from app.models import Strategy, hash_owner
+from app.schemas import (BacktestIn, BacktestOut, BulkCreateIn, BulkItemOut, BulkOut, BulkStatusIn,
+                         CreateStrategyIn, OptimizeIn, StrategyOut, StrategyStatusUpdate)
+from app.cron import timer_scheduler
+from app.registry import registry
+from app.bots import BOT_TYPES, compile_params
+from app.bulk import check_strategy, create_strategies, set_statuses
+from app.backtest import check_prices, run_backtest
+from app.optimizer import candidates, optimize
+from app.defi import get_historical_prices
+from app.models import DEFAULT_HOLDINGS
+import asyncio
 import json
+import orjson
+import numpy as np
 from datetime import datetime, timezone
 from typing import List
 
 router = APIRouter(prefix="/api/strategies", tags=["strategies"])
 
-def _to_out(st: Strategy) -> StrategyOut:
-    return StrategyOut(
+def _row(st: Strategy) -> dict:
+    """StrategyOut's fields as plain data; orjson encodes the datetimes exactly like isoformat()"""
+    return dict(
         id=st.id, name=st.name, owner=st.owner,
         bot_type=st.bot_type, symbol=st.symbol, base_asset=st.base_asset,
-        params=json.loads(st.params_json or "{}"),
+        params=st.params_json or {},
         status=st.status,
-        created_at=st.created_at.isoformat(),
-        updated_at=st.updated_at.isoformat()
+        interval_seconds=st.interval_seconds,
+        cron=st.cron,
+        created_at=st.created_at,
+        updated_at=st.updated_at
     )
 
+def _to_out(st: Strategy) -> StrategyOut:
+    return StrategyOut(**{**_row(st), "created_at": st.created_at.isoformat(),
+                          "updated_at": st.updated_at.isoformat()})
+
+def _validate(body: CreateStrategyIn):
+    try:
+        check_strategy(body.model_dump())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _bulk_out(results: List[dict]) -> BulkOut:
+    items = [BulkItemOut(**{**r, "strategy": _to_out(r["strategy"]) if r.get("strategy") else None})
+             for r in results]
+    succeeded = sum(item.ok for item in items)
+    return BulkOut(succeeded=succeeded, failed=len(items) - succeeded, results=items)
+
 @router.post("/", response_model=StrategyOut)
-def create_strategy(body: CreateStrategyIn, session: Session = Depends(get_session)):
+async def create_strategy(body: CreateStrategyIn, session: AsyncSession = Depends(get_async_session)):
+    _validate(body)
     st = Strategy(
-        name=body.name, owner=body.owner, bot_type=body.bot_type,
+        name=body.name, owner=body.owner, owner_hash=hash_owner(body.owner), bot_type=body.bot_type,
         symbol=body.symbol, base_asset=body.base_asset,
-        params_json=json.dumps(body.params)
+        params_json=body.params,
+        interval_seconds=body.interval_seconds, cron=body.cron
     )
     session.add(st)
-    session.commit()
-    session.refresh(st)
+    await session.commit()
+    await session.refresh(st)
     return _to_out(st)
 
 @router.get("/", response_model=List[StrategyOut])
-def list_strategies(owner: str = None, session: Session = Depends(get_session)):
+async def list_strategies(owner: str = None, session: AsyncSession = Depends(get_async_session)):
     """List all strategies, optionally filtered by owner"""
     query = select(Strategy)
     if owner:
         query = query.where(Strategy.owner == owner)
-    strategies = session.exec(query).all()
-    return [_to_out(st) for st in strategies]
+    strategies = (await session.exec(query)).all()
+    # straight to JSON bytes; StrategyOut stays the documented schema
+    return Response(orjson.dumps([_row(st) for st in strategies]), media_type="application/json")
+
+@router.get("/schedules")
+def list_schedules():
+    """Per-strategy schedule, lag and jitter metrics (SCHEDULER_MODE=timer)"""
+    return timer_scheduler.metrics()
+
+@router.get("/bot_types")
+def list_bot_types():
+    """Registered bot types and the JSON schema of their params"""
+    return {name: bot.params_cls.model_json_schema() for name, bot in BOT_TYPES.items()}
+
+@router.post("/bulk", response_model=BulkOut)
+async def bulk_create_strategies(body: BulkCreateIn, session: AsyncSession = Depends(get_async_session)):
+    """Create many strategies in one transaction; invalid items are reported and skipped"""
+    try:
+        results = await session.run_sync(create_strategies, [item.model_dump() for item in body.strategies],
+                                         body.status)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return _bulk_out(results)
+
+@router.post("/bulk_status", response_model=BulkOut)
+async def bulk_update_status(body: BulkStatusIn, session: AsyncSession = Depends(get_async_session)):
+    """Set the status of many strategies in one transaction; unknown ids are reported"""
+    try:
+        results = await session.run_sync(set_statuses, body.ids, body.status)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return _bulk_out(results)
+
+@router.post("/optimize")
+async def optimize_strategy(body: OptimizeIn):
+    """Backtest a parameter sweep in the worker pool; streams the Pareto front as NDJSON"""
+    try:
+        compile_params(body.bot_type, body.params)
+        param_sets, total = candidates(body.bot_type, body.params, body.ranges, body.samples, body.seed)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not param_sets:
+        raise HTTPException(400, f"None of the {total} parameter combinations is valid")
+
+    if body.prices is not None:
+        prices = np.asarray(body.prices, dtype=np.float64)
+    else:
+        _, prices = await get_historical_prices(body.symbol, max(1, body.hours))
+    try:
+        prices = check_prices(prices)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    base = body.base_balance if body.base_balance is not None else DEFAULT_HOLDINGS.get(body.base_asset, 0.0)
+
+    async def lines():
+        yield json.dumps({"event": "start", "combinations": total, "candidates": len(param_sets),
+                          "bars": len(prices)}) + "\n"
+        async for event in optimize(body.bot_type, prices, param_sets, base, body.asset_balance):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/{sid}", response_model=StrategyOut)
-def get_strategy(sid: int, session: Session = Depends(get_session)):
+async def get_strategy(sid: int, session: AsyncSession = Depends(get_async_session)):
     """Get a specific strategy by ID"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
     return _to_out(st)
 
 @router.put("/{sid}", response_model=StrategyOut)
-def update_strategy(sid: int, body: CreateStrategyIn, session: Session = Depends(get_session)):
+async def update_strategy(sid: int, body: CreateStrategyIn, session: AsyncSession = Depends(get_async_session)):
     """Update a strategy"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
+    _validate(body)
     
     st.name = body.name
     st.bot_type = body.bot_type
     st.symbol = body.symbol
     st.base_asset = body.base_asset
-    st.params_json = json.dumps(body.params)
+    st.params_json = body.params
+    st.interval_seconds = body.interval_seconds
+    st.cron = body.cron
     st.updated_at = datetime.now(timezone.utc)
     
     session.add(st)
-    session.commit()
-    session.refresh(st)
+    await session.commit()
+    await session.refresh(st)
+    registry.upsert(st)
     return _to_out(st)
 
 @router.delete("/{sid}")
-def delete_strategy(sid: int, session: Session = Depends(get_session)):
+async def delete_strategy(sid: int, session: AsyncSession = Depends(get_async_session)):
     """Delete a strategy"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
     
-    session.delete(st)
-    session.commit()
+    await session.delete(st)
+    await session.commit()
+    registry.remove(sid)
     return {"ok": True, "id": sid, "message": "Strategy deleted"}
 
+@router.post("/{sid}/backtest", response_model=BacktestOut)
+async def backtest_strategy(sid: int, body: BacktestIn, session: AsyncSession = Depends(get_async_session)):
+    """Replay a strategy over its price history (or the given prices) before going live"""
+    st = await session.get(Strategy, sid)
+    if not st:
+        raise HTTPException(404, "Strategy not found")
+    try:
+        params = compile_params(st.bot_type, body.params if body.params is not None
+                                else st.params_json or {})
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    timestamps = None
+    if body.prices is not None:
+        prices = np.asarray(body.prices, dtype=np.float64)
+    else:
+        if body.hours < 1:
+            raise HTTPException(400, "hours must be at least 1")
+        timestamps, prices = await get_historical_prices(st.symbol, body.hours)
+    base = body.base_balance if body.base_balance is not None else DEFAULT_HOLDINGS.get(st.base_asset, 0.0)
+    try:
+        # off the event loop: long histories take a noticeable fraction of a second
+        result = await asyncio.to_thread(run_backtest, st.bot_type, params, prices, base,
+                                         body.asset_balance, timestamps)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return BacktestOut(strategy_id=sid, bot_type=st.bot_type, symbol=st.symbol, **result)
+
 @router.post("/{sid}/go_live")
-def go_live(sid: int, session: Session = Depends(get_session)):
+async def go_live(sid: int, session: AsyncSession = Depends(get_async_session)):
     """Set strategy status to live"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
     st.status = "live"
     st.updated_at = datetime.now(timezone.utc)
     session.add(st)
-    session.commit()
+    await session.commit()
+    registry.upsert(st)
     return {"ok": True, "id": sid, "status": "live"}
 
 @router.post("/{sid}/pause")
-def pause_strategy(sid: int, session: Session = Depends(get_session)):
+async def pause_strategy(sid: int, session: AsyncSession = Depends(get_async_session)):
     """Set strategy status to paused"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
     st.status = "paused"
     st.updated_at = datetime.now(timezone.utc)
     session.add(st)
-    session.commit()
+    await session.commit()
+    registry.remove(sid)
     return {"ok": True, "id": sid, "status": "paused"}
 
 @router.post("/{sid}/status")
-def update_strategy_status(sid: int, status_update: StrategyStatusUpdate, session: Session = Depends(get_session)):
+async def update_strategy_status(sid: int, status_update: StrategyStatusUpdate, session: AsyncSession = Depends(get_async_session)):
     """Update strategy status (live, paused, draft)"""
-    st = session.get(Strategy, sid)
+    st = await session.get(Strategy, sid)
     if not st:
         raise HTTPException(404, "Strategy not found")
     
@@ -115,5 +244,6 @@ def update_strategy_status(sid: int, status_update: StrategyStatusUpdate, sessio
     st.status = status_update.status
     st.updated_at = datetime.now(timezone.utc)
     session.add(st)
-    session.commit()
+    await session.commit()
+    registry.upsert(st)
     return {"ok": True, "id": sid, "status": status_update.status}
\ No newline at end of file
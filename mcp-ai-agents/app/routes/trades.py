@@ -1,35 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Text, cast, tuple_
 from sqlmodel import Session, select
-from app.db import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import engine, get_async_session
 from app.models import Trade
 from app.schemas import TradeOut
+from app.config import EXPORT_BATCH_SIZE
+import base64
+import csv
+import io
 import json
-from typing import List, Optional
+import orjson
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
 
 router = APIRouter(prefix="/api/trades", tags=["trades"])
 
+def _row(t: Trade) -> dict:
+    """TradeOut's fields as plain data; orjson encodes created_at exactly like isoformat()"""
+    return {
+        "id": t.id,
+        "strategy_id": t.strategy_id,
+        "symbol": t.symbol,
+        "side": t.side,
+        "price": t.price,
+        "qty": t.qty,
+        "notional": t.notional,
+        "meta": t.meta_json or {},
+        "created_at": t.created_at
+    }
+
 def _to_out(t: Trade) -> TradeOut:
-    return TradeOut(
-        id=t.id,
-        strategy_id=t.strategy_id,
-        symbol=t.symbol,
-        side=t.side,
-        price=t.price,
-        qty=t.qty,
-        notional=t.notional,
-        meta=json.loads(t.meta_json or "{}"),
-        created_at=t.created_at.isoformat()
-    )
+    return TradeOut(**{**_row(t), "created_at": t.created_at.isoformat()})
+
+def _list_out(trades: List[Trade], response: Response) -> Response:
+    """A page encoded straight to JSON bytes, skipping TradeOut validation; keeps the cursor headers"""
+    return Response(orjson.dumps([_row(t) for t in trades]), media_type="application/json",
+                    headers=dict(response.headers))
+
+def encode_cursor(t: Trade) -> str:
+    """Opaque keyset position of a trade: base64 of [created_at, id]"""
+    raw = json.dumps([t.created_at.isoformat(), t.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, trade_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(trade_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+async def _page(session: AsyncSession, query, response: Response, limit: int,
+                after: Optional[str], before: Optional[str]) -> List[Trade]:
+    """One newest-first page of `query` by keyset on (created_at, id).
+
+    `after` continues with older trades than the cursor, `before` with newer
+    ones. Cursors for the neighbouring pages go in the X-Next-Cursor (older)
+    and X-Prev-Cursor (newer) headers when such a page exists.
+    """
+    if after and before:
+        raise HTTPException(400, "Use either after or before, not both")
+    if limit < 1:
+        raise HTTPException(400, "limit must be at least 1")
+    key = tuple_(Trade.created_at, Trade.id)
+    if before:
+        query = query.where(key > decode_cursor(before)).order_by(Trade.created_at.asc(), Trade.id.asc())
+    else:
+        if after:
+            query = query.where(key < decode_cursor(after))
+        query = query.order_by(Trade.created_at.desc(), Trade.id.desc())
+    trades = list((await session.exec(query.limit(limit + 1))).all())
+    more = len(trades) > limit
+    trades = trades[:limit]
+
+    if before:
+        trades.reverse()
+        newer, older = more, True
+    else:
+        newer, older = bool(after), more
+    if trades and older:
+        response.headers["X-Next-Cursor"] = encode_cursor(trades[-1])
+    if trades and newer:
+        response.headers["X-Prev-Cursor"] = encode_cursor(trades[0])
+    return trades
 
 @router.get("/", response_model=List[TradeOut])
-def list_trades(
+async def list_trades(
+    response: Response,
     owner: Optional[str] = None,
     strategy_id: Optional[int] = None,
     symbol: Optional[str] = None,
     limit: int = 100,
-    session: Session = Depends(get_session)
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
 ):
-    """List trades with optional filters"""
+    """List trades with optional filters, most recent first; page with the after/before cursors"""
     query = select(Trade)
     
     if owner:
@@ -39,33 +106,92 @@ def list_trades(
     if symbol:
         query = query.where(Trade.symbol == symbol)
     
-    # Order by most recent first
-    query = query.order_by(Trade.created_at.desc())
-    
-    # Limit results
-    query = query.limit(limit)
-    
-    trades = session.exec(query).all()
-    return [_to_out(t) for t in trades]
+    trades = await _page(session, query, response, limit, after, before)
+    return _list_out(trades, response)
+
+EXPORT_COLUMNS = ("id", "owner", "strategy_id", "symbol", "side", "price", "qty", "notional", "created_at")
+
+def _export_rows(query) -> Iterator[list]:
+    """Batches of rows from a server-side cursor, on a session of the generator's own"""
+    with Session(engine) as session:
+        result = session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+
+def _ndjson(query) -> Iterator[str]:
+    for batch in _export_rows(query):
+        lines = []
+        for row in batch:
+            # meta_json is already JSON: splice it in instead of parsing and re-encoding it
+            record = json.dumps({**{c: row[i] for i, c in enumerate(EXPORT_COLUMNS[:-1])},
+                                 "created_at": row[8].isoformat()})
+            lines.append(f'{record[:-1]}, "meta": {row[9] or "{}"}}}\n')
+        yield "".join(lines)
+
+def _csv(query) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS + ("meta",))
+    for batch in _export_rows(query):
+        writer.writerows((*row[:8], row[8].isoformat(), row[9]) for row in batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+def _utc(at: Optional[datetime]) -> Optional[datetime]:
+    return at.astimezone(timezone.utc) if at is not None and at.tzinfo is not None else at
+
+@router.get("/export")
+def export_trades(
+    format: str = "ndjson",
+    owner: Optional[str] = None,
+    strategy_id: Optional[int] = None,
+    symbol: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Stream every matching trade, oldest first, as NDJSON or CSV"""
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(400, "format must be 'ndjson' or 'csv'")
+    # meta as stored text, so it can be spliced in without decoding
+    query = select(*(getattr(Trade, c) for c in EXPORT_COLUMNS), cast(Trade.meta_json, Text))
+    if owner:
+        query = query.where(Trade.owner == owner)
+    if strategy_id:
+        query = query.where(Trade.strategy_id == strategy_id)
+    if symbol:
+        query = query.where(Trade.symbol == symbol)
+    if since:
+        query = query.where(Trade.created_at >= _utc(since))
+    if until:
+        query = query.where(Trade.created_at < _utc(until))
+    query = query.order_by(Trade.created_at, Trade.id)
+
+    if format == "csv":
+        return StreamingResponse(_csv(query), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="trades.csv"'})
+    return StreamingResponse(_ndjson(query), media_type="application/x-ndjson")
 
 @router.get("/{trade_id}", response_model=TradeOut)
-def get_trade(trade_id: int, session: Session = Depends(get_session)):
+async def get_trade(trade_id: int, session: AsyncSession = Depends(get_async_session)):
     """Get a specific trade by ID"""
-    trade = session.get(Trade, trade_id)
+    trade = await session.get(Trade, trade_id)
     if not trade:
         raise HTTPException(404, "Trade not found")
     return _to_out(trade)
 
 @router.get("/owner/{owner}", response_model=List[TradeOut])
-def get_trades_by_owner(owner: str, limit: int = 100, session: Session = Depends(get_session)):
+async def get_trades_by_owner(owner: str, response: Response, limit: int = 100, after: Optional[str] = None,
+                              before: Optional[str] = None, session: AsyncSession = Depends(get_async_session)):
     """Get all trades for a specific owner"""
-    query = select(Trade).where(Trade.owner == owner).order_by(Trade.created_at.desc()).limit(limit)
-    trades = session.exec(query).all()
-    return [_to_out(t) for t in trades]
+    trades = await _page(session, select(Trade).where(Trade.owner == owner), response, limit, after, before)
+    return _list_out(trades, response)
 
 @router.get("/strategy/{strategy_id}", response_model=List[TradeOut])
-def get_trades_by_strategy(strategy_id: int, limit: int = 100, session: Session = Depends(get_session)):
+async def get_trades_by_strategy(strategy_id: int, response: Response, limit: int = 100, after: Optional[str] = None,
+                                 before: Optional[str] = None, session: AsyncSession = Depends(get_async_session)):
     """Get all trades for a specific strategy"""
-    query = select(Trade).where(Trade.strategy_id == strategy_id).order_by(Trade.created_at.desc()).limit(limit)
-    trades = session.exec(query).all()
-    return [_to_out(t) for t in trades]
\ No newline at end of file
+    trades = await _page(session, select(Trade).where(Trade.strategy_id == strategy_id), response, limit, after, before)
+    return _list_out(trades, response)
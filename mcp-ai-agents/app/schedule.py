@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from apscheduler.triggers.cron import CronTrigger
+from app.metrics import skipped_ticks_total
+
+logger = logging.getLogger(__name__)
+
+def parse_cron(expr: str) -> CronTrigger:
+    """Validate a 5-field crontab expression; raises ValueError when malformed"""
+    return CronTrigger.from_crontab(expr, timezone=timezone.utc)
+
+class _Entry:
+    """Schedule and timing stats for one strategy"""
+
+    def __init__(self, sid: int, interval: float, cron: Optional[str]):
+        self.sid = sid
+        self.interval = interval
+        self.cron = cron
+        self.trigger = parse_cron(cron) if cron else None
+        self.due = 0.0
+        self.generation = 0  # unique per scheduler; heap items of an older generation are stale
+        self.runs = 0
+        self.skipped = 0
+        self.missed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.mean_lag = 0.0
+        self.jitter = 0.0
+
+    def next_after(self, t: float) -> float:
+        if self.trigger:
+            # the trigger returns `now` itself when it matches, so ask strictly after t
+            nxt = self.trigger.get_next_fire_time(None, datetime.fromtimestamp(t + 0.001, timezone.utc))
+            return nxt.timestamp() if nxt else float("inf")
+        return t + self.interval
+
+    def first_due(self, now: float) -> float:
+        if self.trigger:
+            return self.next_after(now)
+        # spread strategies over their interval instead of firing all at startup
+        return now + self.interval * ((self.sid * 0.6180339887) % 1.0)
+
+    def record(self, lag: float):
+        # jitter as in RFC 3550: smoothed mean of lag-to-lag differences
+        if self.runs:
+            self.jitter += (abs(lag - self.last_lag) - self.jitter) / 16
+        self.runs += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.mean_lag += (lag - self.mean_lag) / self.runs
+
+    def metrics(self) -> dict:
+        return {
+            "strategy_id": self.sid,
+            "interval_seconds": None if self.trigger else self.interval,
+            "cron": self.cron,
+            "next_due": datetime.fromtimestamp(self.due, timezone.utc).isoformat() if self.due != float("inf") else None,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "missed": self.missed,
+            "last_lag": self.last_lag,
+            "mean_lag": self.mean_lag,
+            "max_lag": self.max_lag,
+            "jitter": self.jitter,
+        }
+
+class TimerScheduler:
+    """Wakes each strategy on its own interval or cron schedule.
+
+    Due times live in a min-heap, so a wake-up pops only the strategies that
+    are due (O(due * log n)) instead of scanning every live strategy. Due
+    strategies are handed to `runner` as one batch; a strategy whose previous
+    run has not finished is skipped rather than queued.
+    """
+
+    def __init__(self, runner: Callable[[List[int]], Awaitable[None]], default_interval: float,
+                 accept: Optional[Callable[[int], bool]] = None):
+        self.runner = runner
+        self.default_interval = default_interval
+        self.accept = accept
+        self.entries: Dict[int, _Entry] = {}
+        self.running: Set[int] = set()
+        self._heap: List[Tuple[float, int, int]] = []  # (due, sid, generation)
+        # never reused, so a heap item left behind by unschedule cannot match a later schedule of the same sid
+        self._generations = itertools.count(1)
+        self._wake = asyncio.Event()
+        self._tasks: set = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def schedule(self, sid: int, interval_seconds: Optional[int] = None, cron: Optional[str] = None):
+        """Add a strategy or update its schedule; unchanged schedules keep their due time"""
+        interval = float(interval_seconds or self.default_interval)
+        entry = self.entries.get(sid)
+        if entry and entry.interval == interval and entry.cron == cron:
+            return
+        try:
+            new = _Entry(sid, interval, cron)
+        except ValueError as e:
+            logger.error(f"Strategy {sid} has an invalid cron '{cron}': {e}")
+            return
+        new.generation = next(self._generations)
+        if entry:
+            for stat in ("runs", "skipped", "missed", "last_lag", "max_lag", "mean_lag", "jitter"):
+                setattr(new, stat, getattr(entry, stat))
+        new.due = new.first_due(time.time())
+        self.entries[sid] = new
+        heapq.heappush(self._heap, (new.due, sid, new.generation))
+        self._wake.set()
+
+    def unschedule(self, sid: int):
+        self.entries.pop(sid, None)
+
+    def sync(self, live: Dict[int, Tuple[Optional[int], Optional[str]]]):
+        """Reconcile with the full set of live strategies: {id: (interval_seconds, cron)}"""
+        for sid in set(self.entries) - set(live):
+            self.unschedule(sid)
+        for sid, (interval_seconds, cron) in live.items():
+            self.schedule(sid, interval_seconds, cron)
+
+    def _pop_due(self, now: float) -> List[int]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, sid, generation = heapq.heappop(self._heap)
+            entry = self.entries.get(sid)
+            if entry is None or entry.generation != generation:
+                continue  # unscheduled or rescheduled since this item was pushed
+
+            nxt = entry.next_after(at)
+            if nxt <= now:
+                # fell behind by whole periods: count them and resume from now
+                while nxt <= now:
+                    entry.missed += 1
+                    nxt = entry.next_after(nxt)
+            entry.due = nxt
+            heapq.heappush(self._heap, (nxt, sid, generation))
+
+            if self.accept and not self.accept(sid):
+                continue
+            if sid in self.running:
+                entry.skipped += 1
+                skipped_ticks_total.inc("timer")
+                continue
+            entry.record(now - at)
+            due.append(sid)
+        return due
+
+    async def _run_batch(self, sids: List[int]):
+        self.running.update(sids)
+        try:
+            await self.runner(sids)
+        except Exception as e:
+            logger.error(f"Scheduled run of {len(sids)} strategies failed: {e}")
+        finally:
+            self.running.difference_update(sids)
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            due = self._pop_due(time.time())
+            if due:
+                task = asyncio.create_task(self._run_batch(due))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            delay = self._heap[0][0] - time.time() if self._heap else self.default_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self) -> List[dict]:
+        return [entry.metrics() for entry in self.entries.values()]
@@ -9,6 +9,8 @@ class CreateStrategyIn(BaseModel):
     symbol: str
     base_asset: str = "USDC"
     params: Dict[str, Any] = {}
+    interval_seconds: Optional[int] = None
+    cron: Optional[str] = None
 
 class StrategyOut(BaseModel):
     id: int
@@ -19,6 +21,8 @@ class StrategyOut(BaseModel):
     base_asset: str
     params: Dict[str, Any]
     status: str
+    interval_seconds: Optional[int] = None
+    cron: Optional[str] = None
     created_at: str
     updated_at: str
 
@@ -27,6 +31,33 @@ class PortfolioOut(BaseModel):
     holdings: Dict[str, float]
     updated_at: str
 
+class PortfolioAtOut(BaseModel):
+    owner: str
+    holdings: Dict[str, float]
+    as_of: Optional[str] = None  # time of the last event applied
+    seq: int
+    snapshot_seq: int
+    events_replayed: int
+
+class PortfolioAuditOut(BaseModel):
+    owner: str
+    consistent: bool
+    seq: int
+    differences: Dict[str, Dict[str, float]]  # asset -> {"holdings": ..., "events": ...}
+
+class AssetValueOut(BaseModel):
+    amount: float
+    price: Optional[float] = None  # None when the asset could not be priced
+    value: Optional[float] = None
+    allocation: Optional[float] = None  # share of nav
+
+class PortfolioValuationOut(BaseModel):
+    owner: str
+    base_asset: str
+    nav: float
+    assets: Dict[str, AssetValueOut]
+    unpriced: List[str]
+
 class PortfolioUpdateIn(BaseModel):
     owner: str
     holdings: Dict[str, float]
@@ -42,5 +73,68 @@ class TradeOut(BaseModel):
     meta: Dict[str, Any]
     created_at: str
 
+class BacktestIn(BaseModel):
+    hours: int = 24 * 30  # history to replay when no prices are given
+    prices: Optional[List[float]] = None  # replay these instead of the stored history
+    params: Optional[Dict[str, Any]] = None  # try other params without saving them
+    base_balance: Optional[float] = None  # default: the base asset of DEFAULT_HOLDINGS
+    asset_balance: float = 0.0
+
+class BacktestOut(BaseModel):
+    strategy_id: int
+    bot_type: str
+    symbol: str
+    bars: int
+    start: Optional[int] = None
+    end: Optional[int] = None
+    initial_value: float
+    final_value: float
+    pnl: float
+    pnl_pct: float
+    buy_and_hold_pnl: float
+    max_drawdown_pct: float
+    turnover: float  # traded notional / initial value
+    traded_notional: float
+    trade_count: int
+    buys: int
+    sells: int
+    final_base: float
+    final_asset: float
+    elapsed_ms: float
+
+class OptimizeIn(BaseModel):
+    bot_type: str
+    symbol: str
+    base_asset: str = "USDC"
+    ranges: Dict[str, Any]  # param -> list of values, or {"min", "max", "steps"}
+    params: Dict[str, Any] = {}  # fixed params shared by every candidate
+    samples: Optional[int] = None  # evaluate a random sample of the grid instead of all of it
+    seed: Optional[int] = None
+    hours: int = 24 * 30
+    prices: Optional[List[float]] = None
+    base_balance: Optional[float] = None
+    asset_balance: float = 0.0
+
 class StrategyStatusUpdate(BaseModel):
-    status: str  # "live", "paused", "draft"
\ No newline at end of file
+    status: str  # "live", "paused", "draft"
+
+class BulkCreateIn(BaseModel):
+    strategies: List[CreateStrategyIn]
+    status: str = "draft"  # "live" creates and starts every valid strategy in one call
+
+class BulkStatusIn(BaseModel):
+    ids: List[int]
+    status: str  # "live", "paused", "draft"
+
+class BulkItemOut(BaseModel):
+    index: int  # position in the request
+    ok: bool
+    id: Optional[int] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    strategy: Optional[StrategyOut] = None
+
+class BulkOut(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemOut]
@@ -0,0 +1,171 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from app.models import DEFAULT_HOLDINGS, Portfolio, Trade
+from app.holdings import add_amounts, debit, ensure_portfolio, holdings_for
+from app.events import record, trade_changes
+from app.executor import TradeExecutor
+from app.metrics import settlement_seconds, trade_failures_total, trades_total
+
+logger = logging.getLogger(__name__)
+
+class TradeIntent:
+    """A fill a bot asked for during a tick, already checked against the owner's balances"""
+
+    __slots__ = ("owner", "strategy_id", "symbol", "side", "price", "qty", "notional", "base_asset",
+                 "meta", "created_at", "on_settled")
+
+    def __init__(self, owner: str, strategy_id: int, symbol: str, side: str,
+                 price: float, qty: float, notional: float, base_asset: str, meta: dict,
+                 on_settled: Optional[Callable[[], None]] = None):
+        self.owner = owner
+        self.strategy_id = strategy_id
+        self.symbol = symbol.upper()
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.notional = notional
+        self.base_asset = base_asset
+        self.meta = meta
+        self.created_at = datetime.now(timezone.utc)
+        self.on_settled = on_settled  # called once the trade is committed
+
+class Settlement:
+    """Collects a tick's trades and writes them in one transaction.
+
+    Holdings for every owner in the tick are read up front. `submit` applies
+    each intent to the in-memory holdings in the order bots emit them, with
+    the same balance checks as `TradeExecutor.execute`, so later strategies of
+    an owner see earlier fills. `flush` then bulk-inserts the Trade rows and
+    moves each owner's net balance change in the database: debits through
+    the same `amount >= :x` guard as `TradeExecutor`, credits added on top.
+    An owner whose balances changed since they were read (another process
+    traded them) has their intents replayed against the current rows, and
+    the ones that no longer fit are rejected rather than overdrawing.
+    """
+
+    def __init__(self):
+        self.holdings: Dict[str, dict] = {}
+        self.existing: set = set()  # owners that had a Portfolio row when loaded
+        self.initial: Dict[str, dict] = {}  # holdings of owners with intents, before their first one
+        self.intents: List[TradeIntent] = []
+
+    def load(self, session: Session, owners: Iterable[str]):
+        """Read the starting holdings of every owner in one query"""
+        owners = set(owners) - set(self.holdings)
+        if not owners:
+            return
+        self.holdings.update(holdings_for(session, owners))
+        self.existing.update(session.exec(select(Portfolio.owner).where(Portfolio.owner.in_(owners))).all())
+        for owner in owners - self.holdings.keys():
+            self.holdings[owner] = {} if owner in self.existing else dict(DEFAULT_HOLDINGS)
+
+    def portfolio(self, owner: str) -> Optional[dict]:
+        """Holdings as of the intents so far, or None if the owner has no portfolio yet"""
+        if owner not in self.existing and owner not in self.initial:
+            return None
+        return self.holdings.get(owner)
+
+    def submit(self, owner: str, strategy_id: int, symbol: str, side: str, price: float, qty: float,
+               base_asset: str = "USDC", meta: dict = None,
+               on_settled: Optional[Callable[[], None]] = None) -> TradeIntent:
+        """Accept a fill against in-memory holdings; raises like TradeExecutor on insufficient balance"""
+        holdings = self.holdings.get(owner)
+        if holdings is None:
+            holdings = self.holdings[owner] = dict(DEFAULT_HOLDINGS)
+        before = dict(holdings)
+        notional = TradeExecutor.apply(holdings, symbol, side, price, qty, base_asset)
+        self.initial.setdefault(owner, before)
+
+        intent = TradeIntent(owner, strategy_id, symbol, side, price, qty, notional, base_asset, meta or {},
+                             on_settled)
+        self.intents.append(intent)
+        return intent
+
+    @staticmethod
+    def _move(session: Session, owner: str, initial: dict, final: dict) -> bool:
+        """Move an owner's balances from `initial` to `final` in the DB; False, with nothing moved, if a debit is not covered"""
+        debited = []
+        for asset, amount in final.items():
+            start = initial.get(asset, 0.0)
+            if amount < start:
+                # start - amount, not a sum of per-trade deltas: it never exceeds the balance it was checked against
+                if not debit(session, owner, asset, start - amount):
+                    add_amounts(session, [(owner, a, x) for a, x in debited])
+                    return False
+                debited.append((asset, start - amount))
+        add_amounts(session, [(owner, asset, amount - initial.get(asset, 0.0))
+                              for asset, amount in final.items() if amount > initial.get(asset, 0.0)])
+        return True
+
+    def _settle_owner(self, session: Session, owner: str, intents: List[TradeIntent]) -> List[TradeIntent]:
+        """Apply one owner's intents to the DB; returns the ones that were accepted"""
+        if self._move(session, owner, self.initial[owner], self.holdings[owner]):
+            return intents
+        # balances moved under us: replay in order against the current rows
+        current = holdings_for(session, [owner]).get(owner, {})
+        holdings, accepted = dict(current), []
+        for intent in intents:
+            try:
+                TradeExecutor.apply(holdings, intent.symbol, intent.side, intent.price, intent.qty, intent.base_asset)
+            except HTTPException:
+                continue
+            accepted.append(intent)
+        if not accepted or not self._move(session, owner, current, holdings):
+            accepted, holdings = [], current
+        self.holdings[owner] = holdings
+        return accepted
+
+    def flush(self, session: Session) -> int:
+        """Write every accepted intent in a single transaction; returns the number of trades"""
+        if not self.intents:
+            return 0
+        started = time.perf_counter()
+        by_owner: Dict[str, List[TradeIntent]] = defaultdict(list)
+        for intent in self.intents:
+            by_owner[intent.owner].append(intent)
+        try:
+            for owner in set(by_owner) - self.existing:
+                ensure_portfolio(session, owner)
+            session.flush()
+            settled = []
+            for owner, intents in by_owner.items():
+                settled += self._settle_owner(session, owner, intents)
+            rejected = len(self.intents) - len(settled)
+            if rejected:
+                trade_failures_total.inc("insufficient_balance", amount=rejected)
+                logger.warning(f"Settlement rejected {rejected} trades no longer covered by current balances")
+
+            if settled:
+                trade_ids = session.execute(insert(Trade).returning(Trade.id, sort_by_parameter_order=True), [{
+                    "owner": i.owner, "strategy_id": i.strategy_id, "symbol": i.symbol, "side": i.side,
+                    "price": i.price, "qty": i.qty, "notional": i.notional,
+                    "meta_json": i.meta, "created_at": i.created_at,
+                } for i in settled]).scalars().all()
+                events = defaultdict(list)
+                for intent, trade_id in zip(settled, trade_ids):
+                    changes = trade_changes(intent.symbol, intent.side, intent.price, intent.qty, intent.base_asset)
+                    events[intent.owner].append(("trade", changes, trade_id, intent.created_at))
+                for owner, owner_events in events.items():
+                    record(session, owner, owner_events)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            trade_failures_total.inc("settlement", amount=len(self.intents))
+            logger.error(f"Settlement of {len(self.intents)} trades failed: {e}")
+            raise
+
+        settlement_seconds.observe(time.perf_counter() - started)
+        for intent in settled:
+            trades_total.inc(intent.side)
+            if intent.on_settled is not None:
+                intent.on_settled()
+        self.existing.update(by_owner)
+        self.intents = []
+        self.initial.clear()
+        return len(settled)
@@ -0,0 +1,67 @@
+"""Portfolio valuation against a price snapshot.
+
+A `Valuator` wraps one snapshot of prices (a tick's, or an empty one for API
+requests). Assets missing from it are looked up in the price feed and then
+fetched in a single batched call, and the result is added to the snapshot.
+NAV is memoized per owner and holdings, so every rebalance strategy of an
+owner in a tick shares a single valuation until a fill changes the balances.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.defi import get_current_prices
+from app.price_feed import price_feed
+from app.config import PRICE_FEED_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+class Valuator:
+    def __init__(self, prices: Optional[Dict[str, float]] = None):
+        self.prices: Dict[str, float] = dict(prices or {})  # lower-case symbol -> price
+        self.unpriced: Set[str] = set()  # symbols the feed and upstream could not price
+        self._navs: Dict[Tuple[str, str], Tuple[tuple, dict]] = {}
+
+    async def price(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """Prices for `symbols`, fetching whatever the snapshot and the feed lack in one call"""
+        symbols = set(symbols)
+        missing = symbols - self.prices.keys() - self.unpriced
+        if missing:
+            fresh = price_feed.snapshot(missing, max_age=PRICE_FEED_MAX_AGE)
+            if missing - fresh.keys():
+                try:
+                    fresh.update(await get_current_prices(missing - fresh.keys()))
+                except Exception as e:
+                    logger.warning(f"Could not price {', '.join(sorted(missing - fresh.keys()))}: {e}")
+            self.prices.update(fresh)
+            self.unpriced |= missing - fresh.keys()
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+    async def value(self, owner: str, holdings: Dict[str, float], base_asset: str = "USDC") -> dict:
+        """NAV in `base_asset` with per-asset amount, price, value and allocation.
+
+        Assets that cannot be priced are listed under "unpriced" and left out of the NAV.
+        """
+        key = tuple(sorted(holdings.items()))
+        cached = self._navs.get((owner, base_asset))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        prices = await self.price(asset.lower() for asset in holdings if asset != base_asset)
+        assets: Dict[str, dict] = {}
+        unpriced: List[str] = []
+        nav = 0.0
+        for asset, amount in holdings.items():
+            price = 1.0 if asset == base_asset else prices.get(asset.lower())
+            if price is None:
+                unpriced.append(asset)
+                assets[asset] = {"amount": amount, "price": None, "value": None, "allocation": None}
+                continue
+            assets[asset] = {"amount": amount, "price": price, "value": amount * price, "allocation": None}
+            nav += amount * price
+        if nav:
+            for entry in assets.values():
+                if entry["value"] is not None:
+                    entry["allocation"] = entry["value"] / nav
+
+        valuation = {"owner": owner, "base_asset": base_asset, "nav": nav, "assets": assets, "unpriced": unpriced}
+        self._navs[(owner, base_asset)] = (key, valuation)
+        return valuation
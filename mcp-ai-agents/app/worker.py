@@ -0,0 +1,171 @@
+"""Sharded strategy worker.
+
+Run any number of these against the same DB_URL (with EMBEDDED_CRON=false on
+the API) to spread live strategies over processes and hosts:
+
+    python -m app.worker
+
+Live strategies are split into WORKER_SHARDS shards by a stable hash of their
+owner (`Strategy.owner_hash % WORKER_SHARDS`), so one owner's strategies always
+tick in the same process, in order, against the same balances. Each worker heartbeats, holds a fair share of shards through expiring rows in
+the `shardlease` table, and loads and ticks only the strategies in its shards. Leases
+of a worker that stops heartbeating expire after WORKER_LEASE_SECONDS and are
+claimed by the survivors.
+"""
+import asyncio
+import logging
+import math
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Set
+from sqlalchemy import delete, func, or_, update
+from sqlmodel import Session, select
+from app.db import engine, init_db
+from app.models import ShardLease, WorkerHeartbeat
+from app.cron import run_tick, run_due, sync_schedules, follow_registry
+from app.schedule import TimerScheduler
+from app.registry import registry
+from app.price_feed import start_price_feed, stop_price_feed
+from app.config import (CRON_SECONDS, SCHEDULER_MODE, SCHEDULER_SYNC_SECONDS, SETTLEMENT_MODE,
+                        WORKER_SHARDS, WORKER_LEASE_SECONDS)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ShardLeases:
+    """Claims, renews and releases this worker's shard leases"""
+
+    def __init__(self, worker_id: str, shard_count: int, lease_seconds: int):
+        self.worker_id = worker_id
+        self.shard_count = shard_count
+        self.lease_seconds = lease_seconds
+        self.shards: Set[int] = set()
+
+    def ensure_rows(self):
+        """Create a lease row per shard; safe to race with other workers"""
+        with Session(engine) as session:
+            existing = set(session.exec(select(ShardLease.shard)).all())
+            missing = [ShardLease(shard=s) for s in range(self.shard_count) if s not in existing]
+            if missing:
+                session.add_all(missing)
+                try:
+                    session.commit()
+                except Exception:
+                    session.rollback()  # another worker created them first
+
+    def heartbeat(self) -> Set[int]:
+        """Renew held leases and rebalance towards ceil(shards / live workers)"""
+        now = datetime.now(timezone.utc)
+        expires = now + timedelta(seconds=self.lease_seconds)
+        with Session(engine) as session:
+            beat = session.get(WorkerHeartbeat, self.worker_id)
+            if beat:
+                beat.heartbeat_at = now
+            else:
+                session.add(WorkerHeartbeat(worker_id=self.worker_id, heartbeat_at=now))
+            session.execute(delete(WorkerHeartbeat).where(
+                WorkerHeartbeat.heartbeat_at < now - timedelta(seconds=self.lease_seconds * 10)))
+            session.flush()
+
+            live = session.exec(select(func.count()).select_from(WorkerHeartbeat).where(
+                WorkerHeartbeat.heartbeat_at > now - timedelta(seconds=self.lease_seconds))).one()
+            target = math.ceil(self.shard_count / max(live, 1))
+
+            session.execute(update(ShardLease)
+                            .where(ShardLease.worker_id == self.worker_id, ShardLease.expires_at > now)
+                            .values(expires_at=expires))
+            mine = sorted(session.exec(select(ShardLease.shard).where(
+                ShardLease.worker_id == self.worker_id, ShardLease.expires_at > now)).all())
+
+            if len(mine) > target:
+                extra = mine[target:]
+                session.execute(update(ShardLease)
+                                .where(ShardLease.shard.in_(extra), ShardLease.worker_id == self.worker_id)
+                                .values(worker_id=None, expires_at=None))
+                mine = mine[:target]
+            elif len(mine) < target:
+                free = session.exec(select(ShardLease.shard).where(
+                    or_(ShardLease.worker_id.is_(None), ShardLease.expires_at <= now))
+                    .limit(target - len(mine))).all()
+                for shard in free:
+                    # conditional update: only one racing worker sees rowcount == 1
+                    claimed = session.execute(update(ShardLease)
+                                              .where(ShardLease.shard == shard,
+                                                     or_(ShardLease.worker_id.is_(None), ShardLease.expires_at <= now))
+                                              .values(worker_id=self.worker_id, expires_at=expires))
+                    if claimed.rowcount == 1:
+                        mine.append(shard)
+            session.commit()
+
+        if set(mine) != self.shards:
+            logger.info(f"Worker {self.worker_id} holds {len(mine)}/{self.shard_count} shards ({live} live workers)")
+        self.shards = set(mine)
+        return self.shards
+
+    def release(self):
+        with Session(engine) as session:
+            session.execute(update(ShardLease).where(ShardLease.worker_id == self.worker_id)
+                            .values(worker_id=None, expires_at=None))
+            session.execute(delete(WorkerHeartbeat).where(WorkerHeartbeat.worker_id == self.worker_id))
+            session.commit()
+        self.shards = set()
+
+async def _heartbeat_loop(leases: ShardLeases):
+    while True:
+        try:
+            # a blocking DB round trip; keep it off the loop the ticks run on
+            await asyncio.to_thread(leases.heartbeat)
+        except Exception as e:
+            logger.error(f"Lease heartbeat failed: {e}")
+        await asyncio.sleep(leases.lease_seconds / 3)
+
+async def _tick_loop(leases: ShardLeases):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await run_tick(shards=set(leases.shards), shard_count=leases.shard_count)
+        await asyncio.sleep(max(0.0, CRON_SECONDS - (loop.time() - started)))
+
+async def _timer_loop(leases: ShardLeases):
+    """Per-strategy schedules, running only strategies in shards this worker holds"""
+    def accept(sid: int) -> bool:
+        st = registry.get(sid)
+        return st is not None and registry.owns(st.owner)
+
+    timer = TimerScheduler(run_due, default_interval=CRON_SECONDS, accept=accept)
+    follow_registry(timer)
+    runner = asyncio.create_task(timer.run())
+    try:
+        while True:
+            registry.set_shards(leases.shards, leases.shard_count)
+            await sync_schedules(timer)
+            await asyncio.sleep(SCHEDULER_SYNC_SECONDS)
+    finally:
+        runner.cancel()
+
+async def run_worker():
+    if SETTLEMENT_MODE == "ledger":
+        # balances of one owner may be traded from any shard, so they cannot live in one worker's memory
+        raise SystemExit("SETTLEMENT_MODE=ledger runs in a single process; use the API with EMBEDDED_CRON=true")
+    init_db()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    leases = ShardLeases(worker_id, WORKER_SHARDS, WORKER_LEASE_SECONDS)
+    leases.ensure_rows()
+    leases.heartbeat()
+    logger.info(f"Worker {worker_id} started - {WORKER_SHARDS} shards, ticking every {CRON_SECONDS} seconds")
+
+    start_price_feed()
+    try:
+        ticks = _timer_loop(leases) if SCHEDULER_MODE == "timer" else _tick_loop(leases)
+        await asyncio.gather(_heartbeat_loop(leases), ticks)
+    finally:
+        stop_price_feed()
+        leases.release()
+        logger.info(f"Worker {worker_id} stopped")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        pass
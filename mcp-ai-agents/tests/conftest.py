@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# app.config reads the environment at import time, so point everything at a scratch directory first
+_tmp = tempfile.mkdtemp(prefix="kagami-tests-")
+os.environ.setdefault("DB_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("PRICE_STORE_DIR", os.path.join(_tmp, "price_history"))
+os.environ.setdefault("LEDGER_JOURNAL_PATH", os.path.join(_tmp, "ledger.journal"))
+os.environ.setdefault("PRICE_FEED_ENABLED", "false")
+
+@pytest.fixture
+def db():
+    from sqlmodel import SQLModel
+    from app.db import engine, init_db
+    SQLModel.metadata.drop_all(engine)
+    init_db()
+    yield engine
+    SQLModel.metadata.drop_all(engine)
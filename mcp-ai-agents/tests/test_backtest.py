@@ -0,0 +1,36 @@
+import pytest
+
+from app.backtest import run_backtest
+from app.bots import DcaParams, GridParams
+
+def test_dca_pnl_and_drawdown():
+    # buys $100 every bar: 1, 2, 1 and 1.25 units
+    result = run_backtest("dca", DcaParams(amount_usd=100), [100.0, 50.0, 100.0, 80.0], cash=1000.0)
+
+    # equity per bar: 1000, 800 + 3 * 50 = 950, 700 + 4 * 100 = 1100, 600 + 5.25 * 80 = 1020
+    assert result["final_asset"] == pytest.approx(5.25)
+    assert result["final_base"] == pytest.approx(600.0)
+    assert result["pnl"] == pytest.approx(20.0)
+    assert result["pnl_pct"] == pytest.approx(2.0)
+    assert result["max_drawdown_pct"] == pytest.approx(80 / 1100 * 100)
+    assert (result["trade_count"], result["buys"], result["traded_notional"]) == (4, 4, pytest.approx(400.0))
+
+def test_grid_pnl_and_drawdown():
+    # levels 100, 125, 150, 175, 200 and $1500 per order; whole-unit fills keep the balances exact
+    params = GridParams(lower=100, upper=200, grid_count=4, order_size=1500)
+    result = run_backtest("grid", params, [160.0, 140.0, 110.0, 180.0, 130.0], cash=5000.0)
+
+    # 140: buy 10 at 150; 110: buy 12 at 125; 180: sell each one level up (12 at 150, 10 at 175);
+    # 130: buy 1500/175 at 175 and 10 at 150
+    equity = [5000, 3500 + 10 * 140, 2000 + 22 * 110, 5550, 2550 + (1500 / 175 + 10) * 130]
+    assert (result["trade_count"], result["buys"], result["sells"]) == (6, 4, 2)
+    assert result["final_base"] == pytest.approx(2550.0)
+    assert result["final_asset"] == pytest.approx(1500 / 175 + 10)
+    assert result["final_value"] == pytest.approx(equity[-1])
+    assert result["pnl"] == pytest.approx(equity[-1] - 5000)
+    assert result["max_drawdown_pct"] == pytest.approx((5000 - equity[2]) / 5000 * 100)
+    assert result["buy_and_hold_pnl"] == pytest.approx(5000 * (130 / 160 - 1))
+
+def test_flat_series_has_no_pnl_or_drawdown():
+    result = run_backtest("grid", GridParams(lower=90, upper=110, grid_count=4), [100.0] * 50, cash=1000.0)
+    assert (result["trade_count"], result["pnl"], result["max_drawdown_pct"]) == (0, 0.0, 0.0)
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.bots import BOT_TYPES, compile_params, register_bot, run_bot
+from app.models import Strategy
+from app.registry import LiveStrategy, StrategyRegistry
+
+class EchoParams(BaseModel):
+    size: float = Field(1, gt=0)
+
+async def _echo(bot, params: EchoParams, current_price: float):
+    return [{"action": "buy", "price": current_price, "qty": params.size, "params": params}]
+
+@pytest.fixture
+def echo_bot(monkeypatch):
+    monkeypatch.setitem(BOT_TYPES, "echo", None)
+    register_bot("echo", EchoParams, _echo)
+
+def _row(params: dict, bot_type: str = "echo") -> Strategy:
+    return Strategy(id=7, name="echo-7", owner="hana", bot_type=bot_type, symbol="eth",
+                    params_json=params, status="live")
+
+def test_compile_params_reports_readable_errors():
+    with pytest.raises(ValueError, match="Unknown bot type 'nope'"):
+        compile_params("nope", {})
+    with pytest.raises(ValueError, match="grid_count"):
+        compile_params("grid", {"grid_count": 0})
+    with pytest.raises(ValueError, match="lower must be below upper"):
+        compile_params("grid", {"lower": 2, "upper": 1})
+
+def test_registered_bot_runs_on_params_compiled_once(echo_bot):
+    st = LiveStrategy.from_row(_row({"size": 2.5}))
+    assert isinstance(st.compiled, EchoParams)
+
+    trades = asyncio.run(run_bot(st, None, prices={"eth": 10.0}))
+    assert trades[0]["qty"] == 2.5 and trades[0]["price"] == 10.0
+    assert trades[0]["params"] is st.compiled
+
+def test_registry_holds_back_strategies_with_invalid_params(echo_bot):
+    registry = StrategyRegistry()
+    registry.upsert(_row({"size": -1}))
+    assert registry.get(7) is None and 7 in registry.invalid
+
+    registry.upsert(_row({"size": 1}))
+    assert registry.get(7) is not None and 7 not in registry.invalid
@@ -0,0 +1,15 @@
+from sqlmodel import Session
+
+from app.bulk import create_strategies
+
+def test_create_results_line_up_with_items(db):
+    items = [{"name": f"s{i}", "owner": "carol", "bot_type": "dca", "symbol": "eth"} for i in range(5)]
+    items.insert(2, {"name": "bad", "owner": "carol", "bot_type": "dca", "symbol": "eth", "interval_seconds": 0})
+    with Session(db) as session:
+        results = create_strategies(session, items, status="live")
+
+    assert [r["ok"] for r in results] == [True, True, False, True, True, True]
+    assert results[2]["error"] == "interval_seconds must be at least 1"
+    created = [r for r in results if r["ok"]]
+    assert [r["strategy"].name for r in created] == ["s0", "s1", "s2", "s3", "s4"]
+    assert all(r["status"] == "live" and r["id"] == r["strategy"].id for r in created)
@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+from sqlmodel import Session, select
+
+from app.events import rebuild
+from app.executor import TradeExecutor
+from app.holdings import get_holdings
+from app.models import BalanceEvent
+
+def test_rebuild_replays_native_json_history(db, monkeypatch):
+    monkeypatch.setattr("app.events.SNAPSHOT_EVERY", 3)
+    with Session(db) as session:
+        for qty in (1.0, 2.0, 3.0, 4.0):
+            TradeExecutor.execute(session, "dave", 1, "eth", "buy", 100.0, qty)
+        current = get_holdings(session, "dave")
+        stored = session.exec(select(BalanceEvent.changes_json)
+                              .where(BalanceEvent.owner == "dave", BalanceEvent.seq == 2)).one()
+        state = rebuild(session, "dave", datetime.now(timezone.utc))
+
+    assert state["snapshot_seq"] == 3 and state["events_replayed"] == 2
+    assert state["holdings"] == current
+    assert stored == {"USDC": -100.0, "ETH": 1.0}
@@ -0,0 +1,14 @@
+from sqlmodel import Session
+
+from app.executor import TradeExecutor
+from app.metrics import trade_execute_seconds
+
+def _count(phase: str) -> int:
+    series = trade_execute_seconds.series.get((phase,))
+    return sum(series[:-1]) if series else 0
+
+def test_execute_observes_every_phase(db):
+    before = {phase: _count(phase) for phase in ("read", "write", "commit")}
+    with Session(db) as session:
+        TradeExecutor.execute(session, "ivan", 1, "eth", "buy", 100.0, 1.0)
+    assert {phase: _count(phase) - n for phase, n in before.items()} == {"read": 1, "write": 1, "commit": 1}
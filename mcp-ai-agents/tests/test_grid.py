@@ -0,0 +1,50 @@
+from app.grid import GridState
+
+def _fill(grid, orders):
+    for side, level in orders:
+        grid.mark(side, level)
+    return orders
+
+def test_multi_level_jump_crosses_every_level_between():
+    grid = GridState(90.0, 110.0, 4, 100.0)  # levels 90, 95, 100, 105, 110
+    assert grid.crossings(108.0) == []  # the first price only sets the position
+    assert _fill(grid, grid.crossings(91.0)) == [("buy", 3), ("buy", 2), ("buy", 1)]
+    # each sell sits one level above its buy, so only the buys at 100 and 105 are closed below 110
+    assert _fill(grid, grid.crossings(109.0)) == [("sell", 2), ("sell", 3)]
+    assert list(grid.filled) == [0, 0, 0, 1, 0]
+    assert _fill(grid, grid.crossings(111.0)) == [("sell", 4)]
+    assert not any(grid.filled)
+
+def test_price_on_a_level_counts_as_at_or_above_it():
+    grid = GridState(90.0, 110.0, 4, 100.0)
+    grid.crossings(102.0)
+    assert _fill(grid, grid.crossings(100.0)) == []  # still at level 2
+    assert _fill(grid, grid.crossings(99.99)) == [("buy", 2)]
+    assert _fill(grid, grid.crossings(95.0)) == []  # touched 95 without falling through it
+    assert _fill(grid, grid.crossings(105.0)) == [("sell", 3)]
+    assert grid.position == 3
+
+def test_direction_reversal_only_trades_filled_levels():
+    grid = GridState(90.0, 110.0, 4, 100.0)
+    grid.crossings(107.0)
+    assert _fill(grid, grid.crossings(96.0)) == [("buy", 3), ("buy", 2)]
+    assert _fill(grid, grid.crossings(102.0)) == []  # 100 was bought, it sells at 105
+    assert _fill(grid, grid.crossings(106.0)) == [("sell", 3)]  # releases level 2
+    # back down: level 2 is free again, level 3 was never sold
+    assert _fill(grid, grid.crossings(93.0)) == [("buy", 2), ("buy", 1)]
+    assert list(grid.filled) == [0, 1, 1, 1, 0]
+
+def test_unfilled_orders_are_offered_again():
+    grid = GridState(90.0, 110.0, 4, 100.0)
+    grid.crossings(102.0)
+    assert grid.crossings(97.0) == [("buy", 2)]  # not marked: the trade failed
+    grid.crossings(102.0)
+    assert grid.crossings(97.0) == [("buy", 2)]
+
+def test_leaving_the_grid_trades_only_inside_it():
+    grid = GridState(90.0, 110.0, 4, 100.0)
+    grid.crossings(120.0)
+    assert grid.position == 4
+    assert _fill(grid, grid.crossings(50.0)) == [("buy", 3), ("buy", 2), ("buy", 1), ("buy", 0)]
+    assert grid.position == -1
+    assert _fill(grid, grid.crossings(200.0)) == [("sell", 1), ("sell", 2), ("sell", 3), ("sell", 4)]
@@ -0,0 +1,70 @@
+import asyncio
+
+from sqlmodel import SQLModel
+
+from app.bots import run_bot
+from app.db import async_engine, async_session, init_db
+from app.grid import grid_engine
+from app.kernel import kernel
+from app.models import Strategy
+from app.registry import LiveStrategy
+from app.settlement import Settlement
+
+# falls through several levels at once, lands exactly on levels, reverses, and leaves the grid on both sides
+PRICES = [100.0, 97.0, 92.0, 90.0, 95.5, 101.0, 88.0, 84.9, 96.0, 112.0, 104.0, 80.0, 100.0]
+
+STRATEGIES = [
+    ("grid", {"lower": 85.0, "upper": 110.0, "grid_count": 5, "order_size": 300.0}),
+    ("grid", {"lower": 90.0, "upper": 100.0, "grid_count": 4, "order_size": 150.0}),
+    ("grid", {"grid_count": 8, "order_size": 200.0}),  # bounds anchored on the first price
+    ("dca", {"amount_usd": 50.0}),
+    ("dca", {"amount_usd": 125.0}),
+]
+
+def _strategies():
+    return [LiveStrategy.from_row(Strategy(id=i + 1, name=f"s{i + 1}", owner=f"owner{i % 2}", bot_type=bot_type,
+                                           symbol="eth", params_json=params, status="live"))
+            for i, (bot_type, params) in enumerate(STRATEGIES)]
+
+async def _per_bot(strategies, settlement, price):
+    async with async_session() as session:
+        for st in strategies:
+            await run_bot(st, session, {"eth": price}, settlement)
+
+async def _kernel(strategies, settlement, price):
+    async with async_session() as session:
+        for bot_type in ("grid", "dca"):
+            group = [st for st in strategies if st.bot_type == bot_type]
+            await session.run_sync(lambda s: kernel.run(bot_type, "eth", group, price, s, settlement))
+
+def _orders(evaluate):
+    """Every intent a path places over PRICES, settled tick by tick on a fresh database"""
+    grid_engine.states.clear()
+    kernel.invalidate()
+    strategies = _strategies()
+
+    async def run():
+        orders = []
+        for tick, price in enumerate(PRICES):
+            settlement = Settlement()
+            async with async_session() as session:
+                await session.run_sync(settlement.load, {st.owner for st in strategies})
+            await evaluate(strategies, settlement, price)
+            orders += [(tick, i.strategy_id, i.side, i.price, round(i.qty, 12), i.meta) for i in settlement.intents]
+            async with async_session() as session:
+                await session.run_sync(settlement.flush)
+        await async_engine.dispose()
+        return orders
+
+    return asyncio.run(run())
+
+def test_kernel_places_the_same_orders_as_the_bots(db):
+    bots = _orders(_per_bot)
+    SQLModel.metadata.drop_all(db)
+    init_db()
+    kernels = _orders(_kernel)
+
+    # strategies are listed grids first, the order the kernel evaluates its groups in
+    assert kernels == bots
+    assert {o[2] for o in bots} == {"buy", "sell"}
+    assert len({o[1] for o in bots if o[2] == "sell"}) == 3  # every grid bought and sold
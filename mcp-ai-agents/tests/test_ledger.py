@@ -0,0 +1,72 @@
+import asyncio
+import shutil
+
+import pytest
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.holdings import get_holdings
+from app.ledger import Ledger
+from app.models import Trade
+
+def _ledger(tmp_path) -> Ledger:
+    ledger = Ledger(str(tmp_path / "ledger.journal"))
+    ledger.recover()
+    return ledger
+
+def _crash(ledger: Ledger):
+    """Stop without a final flush, after whatever the journal already holds reached disk"""
+    asyncio.run(ledger.sync())
+    ledger._journal.close()
+
+def _trade_count(engine, owner: str) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Trade).where(Trade.owner == owner)).one()
+
+def test_unflushed_trades_are_replayed_after_a_crash(db, tmp_path):
+    ledger = _ledger(tmp_path)
+    ledger.trade("erin", 1, "eth", "buy", 100.0, 10.0)
+    ledger.trade("erin", 1, "eth", "sell", 110.0, 4.0)
+    expected = dict(ledger.portfolio("erin"))
+    _crash(ledger)
+
+    recovered = _ledger(tmp_path)
+    assert recovered.portfolio("erin") == pytest.approx(expected)
+    assert asyncio.run(recovered.flush()) == 2
+    with Session(db) as session:
+        assert get_holdings(session, "erin") == pytest.approx(expected)
+
+def test_crash_after_commit_does_not_apply_twice(db, tmp_path):
+    ledger = _ledger(tmp_path)
+    ledger.trade("frank", 1, "eth", "buy", 100.0, 10.0)
+    asyncio.run(ledger.sync())
+    # keep the journal as it was when the flush rotated it aside...
+    shutil.copy(ledger.journal_path, tmp_path / "rotated")
+    assert asyncio.run(ledger.flush()) == 1
+    expected = dict(ledger.portfolio("frank"))
+    _crash(ledger)
+    # ...and put it back, as if the process died between the commit and removing the file
+    shutil.copy(tmp_path / "rotated", ledger.flushing_path)
+
+    recovered = _ledger(tmp_path)
+    assert recovered.portfolio("frank") == pytest.approx(expected)
+    assert asyncio.run(recovered.flush()) == 0
+    assert _trade_count(db, "frank") == 1
+
+def test_torn_tail_is_dropped(db, tmp_path):
+    ledger = _ledger(tmp_path)
+    ledger.trade("gina", 1, "eth", "buy", 100.0, 1.0)
+    expected = dict(ledger.portfolio("gina"))
+    _crash(ledger)
+    with open(ledger.journal_path, "a") as f:
+        f.write('{"op":"trade","owner":"gina","sym')  # power cut mid-append
+
+    recovered = _ledger(tmp_path)
+    assert recovered.portfolio("gina") == pytest.approx(expected)
+    assert asyncio.run(recovered.flush()) == 1
+    recovered._journal.close()
+
+    # the rewritten journal is clean, so a second restart replays nothing new
+    again = _ledger(tmp_path)
+    assert again.portfolio("gina") == pytest.approx(expected)
+    assert asyncio.run(again.flush()) == 0
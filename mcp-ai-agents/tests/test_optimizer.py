@@ -0,0 +1,19 @@
+import math
+
+import pytest
+
+from app.backtest import check_prices
+from app.optimizer import candidates
+
+def test_candidates_rejects_zero_samples():
+    with pytest.raises(ValueError, match="samples"):
+        candidates("dca", {}, {}, samples=0)
+
+@pytest.mark.parametrize("prices", [[100.0], [100.0, 0.0, 101.0], [100.0, math.nan, 101.0], [100.0, math.inf]])
+def test_check_prices_rejects_unusable_history(prices):
+    with pytest.raises(ValueError):
+        check_prices(prices)
+
+def test_check_prices_returns_float_array():
+    prices = check_prices([100, 101, 102])
+    assert prices.dtype.name == "float64" and prices.tolist() == [100.0, 101.0, 102.0]
@@ -0,0 +1,19 @@
+import json
+
+from sqlmodel import Session
+
+from app.models import Holding
+from app.routes import portfolio
+
+def test_ndjson_export_skips_batches_that_complete_no_owner(db, monkeypatch):
+    monkeypatch.setattr(portfolio, "EXPORT_BATCH_SIZE", 2)
+    with Session(db) as session:
+        session.add_all([Holding(owner="ivy", asset=f"A{i}", amount=i) for i in range(5)] +
+                        [Holding(owner="jon", asset="USDC", amount=1.0)])
+        session.commit()
+
+    chunks = list(portfolio._portfolios_ndjson(None))
+    assert all(chunks)
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert lines == [{"owner": "ivy", "holdings": {f"A{i}": float(i) for i in range(5)}},
+                     {"owner": "jon", "holdings": {"USDC": 1.0}}]
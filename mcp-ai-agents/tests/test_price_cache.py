@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from app.price_cache import PriceCache
+
+def _loader(calls, prices, gate=None):
+    async def load(keys):
+        calls.append(list(keys))
+        if gate is not None:
+            await gate.wait()
+        return {key: prices[key] for key in keys if key in prices}
+    return load
+
+def test_concurrent_gets_share_one_load():
+    async def run():
+        cache, calls, gate = PriceCache(ttl=60, stale_ttl=60, max_size=10), [], asyncio.Event()
+        load = _loader(calls, {"btc": 100.0}, gate)
+        waiters = [asyncio.create_task(cache.get("btc", load)) for _ in range(10)]
+        await asyncio.sleep(0)
+        gate.set()
+        return cache, calls, await asyncio.gather(*waiters)
+
+    cache, calls, results = asyncio.run(run())
+    assert calls == [["btc"]]
+    assert results == [100.0] * 10
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 9
+
+def test_stale_entry_is_served_while_refreshing():
+    async def run():
+        cache, calls, gate = PriceCache(ttl=1, stale_ttl=60, max_size=10), [], asyncio.Event()
+        cache.put("btc", 100.0, fetched_at=time.monotonic() - 5)
+        load = _loader(calls, {"btc": 110.0}, gate)
+        stale = await cache.get("btc", load)
+        in_flight = cache.stats()["in_flight"]
+        gate.set()
+        await asyncio.gather(*cache._tasks)
+        return stale, in_flight, calls, await cache.get("btc", load)
+
+    stale, in_flight, calls, fresh = asyncio.run(run())
+    assert stale == 100.0 and in_flight == 1
+    assert calls == [["btc"]]
+    assert fresh == 110.0
+
+def test_least_recently_used_entry_is_evicted():
+    async def run():
+        cache, calls = PriceCache(ttl=60, stale_ttl=0, max_size=2), []
+        load = _loader(calls, {"btc": 1.0, "eth": 2.0, "sol": 3.0})
+        await cache.get("btc", load)
+        await cache.get("eth", load)
+        await cache.get("btc", load)  # eth is now the oldest
+        await cache.get("sol", load)
+        await cache.get("btc", load)
+        await cache.get("eth", load)
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert calls == [["btc"], ["eth"], ["sol"], ["eth"]]
+    assert cache.stats()["evictions"] == 2
+
+def test_clear_forgets_in_flight_loads():
+    async def run():
+        cache, calls, gate = PriceCache(ttl=60, stale_ttl=0, max_size=10), [], asyncio.Event()
+        old = asyncio.create_task(cache.get("btc", _loader(calls, {"btc": 100.0}, gate)))
+        await asyncio.sleep(0)
+        cache.clear()
+        new = await asyncio.wait_for(cache.get("btc", _loader(calls, {"btc": 120.0})), 1)
+        gate.set()
+        return await old, new, calls, await cache.get("btc", _loader(calls, {}))
+
+    old, new, calls, cached = asyncio.run(run())
+    assert old == 100.0 and new == 120.0
+    assert calls == [["btc"], ["btc"]]
+    assert cached == 120.0  # the load started before clear() did not overwrite the newer price
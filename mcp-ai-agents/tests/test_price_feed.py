@@ -0,0 +1,33 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import price_feed as feed_module
+from app.db import async_engine
+from app.routes import prices
+
+async def _fake_prices(coin_ids):
+    return {cid: 2000.0 for cid in coin_ids if cid == "coin:eth"}
+
+def test_symbols_are_case_insensitive(db, monkeypatch):
+    feed = feed_module.PriceFeed(interval=1, capacity=4)
+    monkeypatch.setattr(feed_module, "_load_prices", _fake_prices)
+    monkeypatch.setattr(prices, "price_feed", feed)
+
+    app = FastAPI()
+    app.include_router(prices.router)
+    with TestClient(app) as client:
+        assert client.get("/api/prices/ETH").status_code == 404
+        assert feed.watched == {"eth"}
+
+        async def poll():
+            await feed.poll_once()
+            await async_engine.dispose()
+        asyncio.run(poll())
+
+        r = client.get("/api/prices/ETH", params={"window": 4})
+        assert r.status_code == 200
+        assert r.json()["symbol"] == "eth" and r.json()["price"] == 2000.0
+        assert len(r.json()["window"]) == 1
+    assert feed.latest("Eth") == 2000.0
@@ -0,0 +1,18 @@
+from typing import Dict, List
+
+import pytest
+
+from app.price_sources import PriceSource, ReplaySource
+
+class CurrentOnly(PriceSource):
+    async def current(self, coin_ids: List[str]) -> Dict[str, float]:
+        return {}
+
+def test_half_implemented_source_fails_on_construction():
+    with pytest.raises(TypeError, match="chart"):
+        CurrentOnly()
+
+def test_replay_source_is_complete(tmp_path):
+    recording = tmp_path / "prices.csv"
+    recording.write_text("timestamp,coin,price\n1000,eth,10\n1060,eth,11\n")
+    assert isinstance(ReplaySource(str(recording)), PriceSource)
@@ -0,0 +1,24 @@
+import os
+
+from app.price_store import PriceStore
+
+def test_store_creates_its_directory_on_first_write(tmp_path):
+    root = tmp_path / "history"
+    store = PriceStore(str(root))
+    assert store.last_timestamp("eth") is None
+    assert not root.exists()
+    store.merge("eth", [1, 2], [10.0, 11.0])
+    assert root.is_dir()
+
+def test_symbol_case_shares_one_history(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.merge("BTC", [1, 2, 3], [1.0, 2.0, 3.0])
+    assert store.last_timestamp("btc") == 3  # maps the columns under one spelling
+    assert store.merge("BTC", [4, 5], [4.0, 5.0]) == 2  # appends under another
+    assert store.merge("btc", [6], [6.0]) == 1  # must not append to the 3-point map it saw before
+
+    ts, px = store.window("BTC", 0)
+    assert ts.tolist() == [1, 2, 3, 4, 5, 6]
+    assert px.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert store.lock("BTC") is store.lock("btc")
+    assert sorted(os.listdir(tmp_path)) == ["btc.px", "btc.ts"]
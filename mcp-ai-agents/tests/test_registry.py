@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.bulk import create_strategies
+from app.models import Strategy, hash_owner
+from app.registry import StrategyRegistry
+
+SHARDS = 8
+
+def _owners_in_distinct_shards():
+    owners, seen = [], set()
+    for n in range(100):
+        owner = f"owner-{n}"
+        if hash_owner(owner) % SHARDS not in seen:
+            seen.add(hash_owner(owner) % SHARDS)
+            owners.append(owner)
+        if len(owners) == 2:
+            return owners
+
+def test_sharded_registry_loads_whole_owners_of_its_shards(db):
+    mine, other = _owners_in_distinct_shards()
+    with Session(db) as session:
+        create_strategies(session, [{"name": f"{owner}-{i}", "owner": owner, "bot_type": "dca", "symbol": "eth"}
+                                    for owner in (mine, other) for i in range(3)], status="live")
+
+    registry = StrategyRegistry()
+    registry.set_shards({hash_owner(mine) % SHARDS}, SHARDS)
+    with Session(db) as session:
+        registry.sync(session)
+    assert sorted(st.name for st in registry.live()) == [f"{mine}-{i}" for i in range(3)]
+
+    # a second sync finds the scoped live count consistent and keeps the same set
+    with Session(db) as session:
+        registry.sync(session)
+    assert len(registry.live()) == 3
+
+    registry.set_shards({hash_owner(other) % SHARDS}, SHARDS)
+    assert not registry.loaded
+    with Session(db) as session:
+        registry.maybe_sync(session, max_age=60)
+    assert {st.owner for st in registry.live()} == {other}
+
+def test_sync_catches_late_writes_with_older_timestamps(db):
+    with Session(db) as session:
+        results = create_strategies(session, [{"name": n, "owner": "ivy", "bot_type": "dca", "symbol": "eth"}
+                                              for n in ("a", "b")], status="live")
+    a, b = (r["id"] for r in results)
+    registry = StrategyRegistry(margin_seconds=60)
+    changes = []
+    registry.subscribe(lambda sid, entry: changes.append(sid))
+    now = datetime.now(timezone.utc)
+    with Session(db) as session:
+        registry.sync(session)
+        # another process, its clock ahead, touches b; ours then edits a with an older timestamp
+        session.execute(update(Strategy).where(Strategy.id == b).values(updated_at=now + timedelta(seconds=20)))
+        session.commit()
+        registry.sync(session)
+        session.execute(update(Strategy).where(Strategy.id == a)
+                        .values(params_json={"amount_usd": 5}, updated_at=now + timedelta(seconds=5)))
+        session.commit()
+        changes.clear()
+        registry.sync(session)
+        registry.sync(session)
+
+    assert registry.get(a).compiled.amount_usd == 5
+    assert changes == [a]  # unchanged rows inside the margin are not re-applied
@@ -0,0 +1,51 @@
+import time
+
+from app.schedule import TimerScheduler
+
+async def _noop(sids):
+    pass
+
+def _fire_times(scheduler: TimerScheduler, start: float, until: float, step: float = 0.01):
+    fired = []
+    now = start
+    while now <= until:
+        fired += [(round(now, 2), sid) for sid in scheduler._pop_due(now)]
+        now += step
+    return fired
+
+def test_pause_then_go_live_fires_once_per_interval():
+    scheduler = TimerScheduler(_noop, default_interval=1)
+    scheduler.schedule(1, interval_seconds=1)
+    scheduler.unschedule(1)  # paused
+    scheduler.schedule(1, interval_seconds=1)  # live again
+
+    start = time.time()
+    fired = _fire_times(scheduler, start, start + 3)
+    assert len(fired) == 3
+    gaps = [b[0] - a[0] for a, b in zip(fired, fired[1:])]
+    assert all(abs(gap - 1) < 0.05 for gap in gaps)
+
+def test_reschedule_drops_the_old_heap_item():
+    scheduler = TimerScheduler(_noop, default_interval=1)
+    scheduler.schedule(1, interval_seconds=1)
+    scheduler.schedule(1, interval_seconds=2)
+
+    start = time.time()
+    fired = _fire_times(scheduler, start, start + 4)
+    assert len(fired) == 2
+
+def test_unscheduled_strategy_never_fires():
+    scheduler = TimerScheduler(_noop, default_interval=1)
+    scheduler.schedule(1, interval_seconds=1)
+    scheduler.schedule(2, interval_seconds=1)
+    scheduler.unschedule(1)
+
+    start = time.time()
+    assert {sid for _, sid in _fire_times(scheduler, start, start + 2)} == {2}
+
+def test_unchanged_schedule_keeps_due_time_and_stats():
+    scheduler = TimerScheduler(_noop, default_interval=1)
+    scheduler.schedule(1, interval_seconds=1)
+    entry = scheduler.entries[1]
+    scheduler.schedule(1, interval_seconds=1)
+    assert scheduler.entries[1] is entry
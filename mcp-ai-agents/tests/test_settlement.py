@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from app.executor import TradeExecutor
+from app.holdings import debit, get_holdings
+from app.ledger import Ledger
+from app.models import Trade
+from app.settlement import Settlement
+
+# (side, price, qty) fills of one owner in the order a tick emits them
+FILLS = [("buy", 100.0, 10.0), ("buy", 101.5, 20.0), ("sell", 103.0, 25.0), ("buy", 99.0, 3.3),
+         ("sell", 98.0, 5.0), ("buy", 1000.0, 100.0), ("sell", 97.5, 3.3)]
+
+def _immediate(engine, owner: str):
+    with Session(engine) as session:
+        for side, price, qty in FILLS:
+            try:
+                TradeExecutor.execute(session, owner, 1, "eth", side, price, qty)
+            except HTTPException:
+                pass
+
+def _batch(engine, owner: str):
+    settlement = Settlement()
+    with Session(engine) as session:
+        settlement.load(session, [owner])
+        for side, price, qty in FILLS:
+            try:
+                settlement.submit(owner, 1, "eth", side, price, qty)
+            except HTTPException:
+                pass
+        settlement.flush(session)
+
+def _ledger(tmp_path, owner: str):
+    ledger = Ledger(str(tmp_path / "ledger.journal"))
+    ledger.recover()
+    for side, price, qty in FILLS:
+        try:
+            ledger.trade(owner, 1, "eth", side, price, qty)
+        except HTTPException:
+            pass
+    asyncio.run(ledger.flush())
+    ledger._journal.close()
+
+def _state(engine, owner: str):
+    with Session(engine) as session:
+        holdings = get_holdings(session, owner)
+        trades = session.exec(select(Trade.side, Trade.price, Trade.qty).where(Trade.owner == owner)
+                              .order_by(Trade.id)).all()
+    return {a: pytest.approx(v) for a, v in holdings.items()}, [tuple(t) for t in trades]
+
+def test_batch_immediate_and_ledger_settle_alike(db, tmp_path):
+    _immediate(db, "immediate")
+    _batch(db, "batch")
+    _ledger(tmp_path, "ledger")
+
+    expected = _state(db, "immediate")
+    assert len(expected[1]) == len(FILLS) - 1  # the 100k buy is rejected everywhere
+    assert _state(db, "batch") == expected
+    assert _state(db, "ledger") == expected
+
+def test_flush_rejects_trades_no_longer_covered(db):
+    settlement = Settlement()
+    with Session(db) as session:
+        settlement.load(session, ["alice"])
+        settlement.submit("alice", 1, "eth", "buy", 100.0, 60.0)  # 6000 of the default 10000 USDC
+        settlement.submit("alice", 2, "btc", "buy", 1000.0, 3.0)  # 3000 more
+
+    # another worker spends 5000 of the same balance before this tick settles
+    with Session(db) as other:
+        TradeExecutor.execute(other, "alice", 3, "sol", "buy", 50.0, 100.0)
+
+    with Session(db) as session:
+        assert settlement.flush(session) == 1
+        holdings = get_holdings(session, "alice")
+    # replayed in order against the current 5000: the eth buy no longer fits, the btc buy does
+    assert holdings["USDC"] == pytest.approx(2000.0)
+    assert holdings["BTC"] == pytest.approx(3.0)
+    assert holdings.get("ETH", 0.0) == 0.0
+    with Session(db) as session:
+        assert session.exec(select(Trade.symbol).where(Trade.owner == "alice").order_by(Trade.id)).all() == ["SOL", "BTC"]
+
+def test_on_settled_runs_only_for_committed_trades(db):
+    with Session(db) as session:
+        TradeExecutor.execute(session, "bob", 1, "eth", "buy", 100.0, 1.0)  # creates bob's portfolio
+
+    settled = []
+    settlement = Settlement()
+    with Session(db) as session:
+        settlement.load(session, ["bob"])
+        settlement.submit("bob", 1, "eth", "buy", 100.0, 50.0, on_settled=lambda: settled.append("eth"))
+        settlement.submit("bob", 1, "btc", "buy", 100.0, 40.0, on_settled=lambda: settled.append("btc"))
+        assert settled == []
+
+        with Session(db) as other:  # leave room for the btc buy only
+            assert debit(other, "bob", "USDC", 5000.0)
+            other.commit()
+        assert settlement.flush(session) == 1
+    assert settled == ["btc"]
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.db import async_engine
+from app.models import Trade
+from app.routes import trades
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(trades.router)
+    with TestClient(app) as client:
+        yield client
+        # pooled async connections belong to this client's event loop
+        client.portal.call(async_engine.dispose)
+
+def _add(db, times):
+    with Session(db) as session:
+        rows = [Trade(owner="dave", strategy_id=1, symbol="eth", side="buy", price=1.0, qty=1.0, notional=1.0,
+                      created_at=at) for at in times]
+        session.add_all(rows)
+        session.commit()
+        return [t.id for t in rows]
+
+def _walk(client, header, param, cursor=None, limit=2):
+    """Every page reached by following `header` from the first page (or from `cursor`)"""
+    pages = []
+    params = {"owner": "dave", "limit": limit, **({param: cursor} if cursor else {})}
+    while True:
+        r = client.get("/api/trades/", params=params)
+        assert r.status_code == 200
+        pages.append([t["id"] for t in r.json()])
+        if header not in r.headers:
+            return pages, r
+        params = {"owner": "dave", "limit": limit, param: r.headers[header]}
+
+def test_next_and_prev_cursors_round_trip(db, client):
+    ids = _add(db, [T0 + timedelta(minutes=i) for i in range(5)])
+    newest_first = ids[::-1]
+
+    pages, last = _walk(client, "X-Next-Cursor", "after")
+    assert pages == [newest_first[0:2], newest_first[2:4], newest_first[4:5]]
+    assert "X-Prev-Cursor" in last.headers
+
+    back, first = _walk(client, "X-Prev-Cursor", "before", cursor=last.headers["X-Prev-Cursor"])
+    assert back == [newest_first[2:4], newest_first[0:2]]
+    assert "X-Next-Cursor" in first.headers
+
+def test_ties_on_created_at_are_broken_by_id(db, client):
+    newest_first = sorted(_add(db, [T0] * 5), reverse=True)
+
+    pages, _ = _walk(client, "X-Next-Cursor", "after")
+    assert pages == [newest_first[0:2], newest_first[2:4], newest_first[4:5]]
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJub3QgYSBkYXRlIiwxXQ"])
+def test_malformed_cursor_is_rejected(db, client, cursor):
+    for param in ("after", "before"):
+        r = client.get("/api/trades/", params={param: cursor})
+        assert r.status_code == 400
+        assert r.json()["detail"] == "Invalid cursor"